@@ -0,0 +1,203 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+
+from ehp2hdmap import MULTICAST_ADDR, open_packets, init_interval_file
+from multicast_routes import Route, RoutingTable
+from pacer import ReplayClock
+from playback_control import PlaybackControl, start_control_server, watch_interval_file, CONTROL_PORT
+
+"""
+asyncio replay engine.
+Many captures are replayed concurrently in one thread, each capture is a task
+with its own clock, speed and sockets. Task wakeups are grouped into timer
+wheel slots of `tick` seconds: all streams due in the same slot share one
+event loop timer, so the loop wakes once per slot instead of once per packet.
+"""
+
+# 定时轮槽宽, 即异步回放的调度精度
+TIMER_TICK = 0.001
+# 连续发送该数量的报文后让出事件循环, 防止突发阻塞其他流
+BURST_YIELD = 64
+
+
+class TimerWheel(object):
+    """
+    Wakeups bucketed by slot, one loop.call_at timer per non-empty slot.
+    """
+
+    def __init__(self, tick=TIMER_TICK) -> None:
+        self.tick_ns = int(tick * 1e9)
+        self.timers = 0
+        self._slots = {}
+        self._loop = None
+
+    def sleep_until(self, deadline_ns):
+        """
+        :return Future resolved in the slot nearest to the monotonic deadline,
+        done already if that slot has passed
+        """
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+        future = self._loop.create_future()
+        slot = (deadline_ns + self.tick_ns // 2) // self.tick_ns
+        delay_ns = slot * self.tick_ns - time.monotonic_ns()
+        if delay_ns <= 0:
+            future.set_result(None)
+            return future
+        waiters = self._slots.get(slot)
+        if waiters is None:
+            waiters = self._slots[slot] = []
+            self._loop.call_at(self._loop.time() + delay_ns / 1e9, self._fire, slot)
+            self.timers += 1
+        waiters.append(future)
+        return future
+
+    def _fire(self, slot):
+        for future in self._slots.pop(slot, ()):
+            if not future.done():
+                future.set_result(None)
+
+
+class ReplayStream(object):
+    """
+    One capture replayed as an asyncio task.
+    file_path:Capture path, or list of capture paths merged by timestamp
+    interval:Real seconds per capture second, see set_interval
+    routes:RoutingTable owned by the stream, default MULTICAST_ADDR
+    loops/packet_filter:see open_packets
+    """
+
+    def __init__(self, file_path, interval=1.0, routes=None, loops=None, packet_filter=None, name=None) -> None:
+        self.file_path = file_path
+        self.name = name or str(file_path)
+        self.routes = routes if routes is not None else RoutingTable(Route(MULTICAST_ADDR))
+        self.loops = loops
+        self.packet_filter = packet_filter
+        self.clock = ReplayClock(interval)
+        self.sent = 0
+        self._waiter = None
+
+    def set_interval(self, interval):
+        """
+        Change the speed, a pending wait is woken and rescheduled.
+        """
+        self.clock.set_scale(float(interval))
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+
+    async def run(self, wheel):
+        # 读取在事件循环线程内完成, 不使用读线程和环形缓冲
+        packets = open_packets(self.file_path, pipeline_depth=0, loops=self.loops, packet_filter=self.packet_filter)
+        self.routes.open()
+        resolve = self.routes.resolve
+        clock = self.clock
+        half_tick = wheel.tick_ns // 2
+        burst = 0
+        try:
+            for ts, dst_port, udp_data in packets:
+                deadline = clock.deadline_ns(ts)
+                # 落在当前槽内的报文直接发送
+                if deadline - time.monotonic_ns() > half_tick:
+                    burst = 0
+                    while deadline - time.monotonic_ns() > half_tick:
+                        self._waiter = wheel.sleep_until(deadline)
+                        await self._waiter
+                        deadline = clock.deadline_ns(ts)
+                    self._waiter = None
+                else:
+                    burst += 1
+                    if burst >= BURST_YIELD:
+                        burst = 0
+                        await asyncio.sleep(0)
+                sock, addr = resolve(dst_port, udp_data)
+                sock.sendto(udp_data, addr)
+                clock.record(ts)
+                self.sent += 1
+        finally:
+            packets.close()
+            self.routes.close()
+
+    def report(self):
+        return "%s: %d packets, %s" % (self.name, self.sent, self.clock.stats.report())
+
+
+class ReplayEngine(object):
+    """
+    Run replay streams concurrently on one event loop.
+    """
+
+    def __init__(self, tick=TIMER_TICK) -> None:
+        self.wheel = TimerWheel(tick)
+        self.streams = []
+
+    def add(self, stream):
+        self.streams.append(stream)
+        return stream
+
+    def set_interval(self, interval):
+        """
+        Change the speed of every stream, call it on the event loop thread
+        """
+        for stream in self.streams:
+            stream.set_interval(interval)
+
+    def _forward_speed(self, control, loop):
+        version = control.version
+        while True:
+            control.wait(1.0, version)
+            if control.version != version:
+                version = control.version
+                try:
+                    loop.call_soon_threadsafe(self.set_interval, control.interval)
+                except RuntimeError:
+                    # 事件循环已结束
+                    return
+
+    async def run(self, control=None):
+        if control is not None:
+            threading.Thread(target=self._forward_speed, args=(control, asyncio.get_running_loop()),
+                             daemon=True).start()
+        await asyncio.gather(*(stream.run(self.wheel) for stream in self.streams))
+
+    def replay(self, control=None):
+        """
+        Replay all streams to the end, blocking the calling thread.
+        control:Optional PlaybackControl, its speed changes apply to all streams
+        """
+        asyncio.run(self.run(control))
+
+    def report(self):
+        lines = [stream.report() for stream in self.streams]
+        lines.append("timer wheel: %d slot timers for %d packets" % (
+            self.wheel.timers, sum(stream.sent for stream in self.streams)))
+        return "\n".join(lines)
+
+
+def concurrent_replay(file_paths, interval_input, route_path=None, loops=None, packet_filter=None,
+                      control_port=CONTROL_PORT):
+    """
+    Replay every capture as an independent stream on one event loop.
+    route_path:Routing file, loaded once per stream so every stream owns its sockets
+    control_port:UDP control port, only speed commands apply, to all streams
+    :return The ReplayEngine after the replay
+    """
+    interval_path = os.path.dirname(sys.argv[0]) + "/interval.json"
+    init_interval_file(interval_path, interval_input)
+    # 各流独立推进, 无法统一暂停/单步/跳转, 只同步速度
+    control = PlaybackControl(interval_input, commands=("speed", "interval"))
+    threading.Thread(target=watch_interval_file, args=(interval_path, control), daemon=True).start()
+    control_server = start_control_server(control, control_port) if control_port else None
+    engine = ReplayEngine()
+    for path in file_paths:
+        routes = RoutingTable.load(route_path, MULTICAST_ADDR) if route_path else None
+        engine.add(ReplayStream(path, control.interval, routes, loops, packet_filter))
+    try:
+        engine.replay(control)
+    finally:
+        if control_server is not None:
+            control_server.close()
+    print(engine.report())
+    return engine
@@ -0,0 +1,165 @@
+from array import array
+
+from ehp_reassembly import Reassembler
+from ehp_signal_matrix_struct import EHPSignal, LAYOUTS, UINT32, numpy_dtype
+from pcap_reader import MmapPcapReader
+
+"""
+Columnar batch decoding.
+One pass over a capture copies the fixed part of every EHP message into one
+buffer per signal type and the repeated elements into one buffer per segment,
+numpy then views each buffer as a structured array. The result is a table per
+EHPSignal with one array per field plus the packet timestamp, repeated elements
+(curvature points, slope points, lanes, ...) are child tables with the row
+number of their parent message.
+"""
+
+
+class ColumnTable(object):
+    """
+    Columns of equal length.
+    name:Table name, e.g. "CURVATURE" or "CURVATURE.points"
+    columns:Dict of column name -> numpy array
+    children:Dict of segment name -> child ColumnTable with a "parent" column
+    malformed:Messages skipped because they were shorter than their layout
+    """
+
+    def __init__(self, name, columns, children=None, malformed=0) -> None:
+        self.name = name
+        self.columns = columns
+        self.children = children or {}
+        self.malformed = malformed
+
+    def __len__(self):
+        for column in self.columns.values():
+            return len(column)
+        return 0
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def __contains__(self, name):
+        return name in self.columns
+
+    def report(self):
+        text = "%s: %d rows, %d columns" % (self.name, len(self), len(self.columns))
+        if self.malformed:
+            text += ", %d malformed messages skipped" % self.malformed
+        for child in self.children.values():
+            text += "\n  " + child.report()
+        return text
+
+
+class _SignalBatch(object):
+    """
+    Raw bytes of one signal type collected during the pass
+    """
+
+    def __init__(self, layout) -> None:
+        self.layout = layout
+        self.timestamps = array("d")
+        self.fixed = bytearray()
+        # (段名, Repeated, 偏移量, 元素字节, 每条消息的元素个数)
+        self.repeated = [(name, segment, offset, bytearray(), array("I"))
+                         for name, (segment, offset) in layout.repeated.items()]
+        self.malformed = 0
+
+    def add(self, ts, udp_data):
+        layout = self.layout
+        size = len(udp_data)
+        if size < layout.fixed_size:
+            self.malformed += 1
+            return
+        if self.repeated:
+            spans = []
+            for name, segment, offset, _, _ in self.repeated:
+                count = max(layout.count(udp_data, name), 0)
+                end = offset + count * segment.layout.size
+                if end > size:
+                    self.malformed += 1
+                    return
+                spans.append((offset, end, count))
+            for (_, _, _, elements, counts), (offset, end, count) in zip(self.repeated, spans):
+                elements += udp_data[offset:end]
+                counts.append(count)
+        self.fixed += udp_data[:layout.fixed_size]
+        self.timestamps.append(ts)
+
+    def table(self):
+        import numpy
+        layout = self.layout
+        rows = len(self.timestamps)
+        fixed = numpy.frombuffer(self.fixed, layout.head_dtype(), rows)
+        columns = {"timestamp": numpy.frombuffer(self.timestamps, numpy.float64).copy()}
+        for column in fixed.dtype.names:
+            columns[column] = numpy.ascontiguousarray(fixed[column])
+        children = {}
+        for name, segment, _, elements, counts in self.repeated:
+            counts = numpy.frombuffer(counts, numpy.uint32)
+            items = numpy.frombuffer(elements, numpy_dtype(segment.layout, segment.names), int(counts.sum()))
+            child = {"parent": numpy.repeat(numpy.arange(rows, dtype=numpy.int64), counts)}
+            for field in segment.names:
+                child[field] = numpy.ascontiguousarray(items[field])
+            children[name] = ColumnTable(layout.signal.name + "." + name, child)
+        return ColumnTable(layout.signal.name, columns, children, self.malformed)
+
+
+def decode_chunks(file_path, chunk_rows=None, signals=None, packet_filter=None, reassemble=True):
+    """
+    Decode the EHP messages of a capture into columnar tables in one pass.
+    chunk_rows:Emit a table whenever a signal type has collected this many messages,
+    None for one table per signal type at the end
+    signals:Optional set of EHPSignal to decode, all signal types with a layout if None
+    packet_filter:Optional PacketFilter applied by the reader
+    reassemble:Join multi-part messages before decoding
+    :return Iterator of (EHPSignal, ColumnTable), the parent column of a child table
+    counts rows from the start of its chunk
+    """
+    wanted = None if signals is None else {int(signal) for signal in signals}
+    batches = {}
+    skipped = set()
+    with MmapPcapReader(file_path, packet_filter) as reader:
+        source = Reassembler().reassemble(reader) if reassemble else reader
+        for ts, dst_port, udp_data in source:
+            if len(udp_data) < 8:
+                continue
+            data_id = UINT32.unpack_from(udp_data, 4)[0]
+            batch = batches.get(data_id)
+            if batch is None:
+                if data_id in skipped:
+                    continue
+                layout = LAYOUTS.get(data_id)
+                if layout is None or (wanted is not None and data_id not in wanted):
+                    skipped.add(data_id)
+                    continue
+                batch = batches[data_id] = _SignalBatch(layout)
+            batch.add(ts, udp_data)
+            if chunk_rows and len(batch.timestamps) >= chunk_rows:
+                yield EHPSignal(data_id), batch.table()
+                batches[data_id] = _SignalBatch(batch.layout)
+    for data_id, batch in batches.items():
+        if batch.timestamps or batch.malformed:
+            yield EHPSignal(data_id), batch.table()
+
+
+def decode_capture(file_path, signals=None, packet_filter=None, reassemble=True):
+    """
+    Decode every EHP message of a capture into columnar tables.
+    :return Dict of EHPSignal -> ColumnTable, see decode_chunks for the arguments
+    """
+    return dict(decode_chunks(file_path, None, signals, packet_filter, reassemble))
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    if len(sys.argv) < 2:
+        print("[usage]: ./pcap_path")
+        sys.exit(1)
+    t0 = time.perf_counter()
+    tables = decode_capture(sys.argv[1])
+    elapsed = time.perf_counter() - t0
+    for table in tables.values():
+        print(table.report())
+    print("decoded %d messages in %.3f s" % (sum(len(table) for table in tables.values()), elapsed))
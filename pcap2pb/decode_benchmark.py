@@ -0,0 +1,224 @@
+import os
+import struct
+import subprocess
+import sys
+import time
+import types
+
+import ehp_signal_matrix_struct as signal_matrix
+from ehp_signal_matrix_struct import *
+from pcap_reader import MmapPcapReader
+
+"""
+Decoder micro-benchmark.
+Decodes every EHP message of a capture with the signal matrix accessors and
+reports decoded messages/second, once with the baseline ehp_signal_matrix_struct
+loaded from git (BASELINE_REVISION) and once with the current precompiled
+layouts. Without git the baseline is emulated by swapping the precompiled
+layouts for slice + struct.unpack stand-ins; that figure is labelled as an
+emulation and no speedup is claimed from it.
+Numbers are only meaningful on a real vehicle capture.
+"""
+
+# 优化前的提交, 作为对比基准
+BASELINE_REVISION = "91309b0"
+
+# 数据 ID -> 测量的访问方法
+ACCESSORS = {
+    EHPSignal.LOC: ("location_relative_pos", "location_absolute_pos", "location_geofence_info",
+                    "location_position_info", "location_fail_safe"),
+    EHPSignal.PATH_CONTROL: ("path_control_head", "path_control_path"),
+    EHPSignal.GLOBAL_DATA: ("global_drive_side", "global_country_code", "global_map_version"),
+    EHPSignal.PROFILE_CONTROL: ("profile_control_path",),
+    EHPSignal.PROFILE_NODE: ("profile_head", "node_info"),
+    EHPSignal.LANE_MODEL: ("profile_head", "lane_infoes"),
+    EHPSignal.LANE_CONNECTIVITY: ("profile_head", "lane_connection_info"),
+    EHPSignal.LINEAR_OBJECTS: ("profile_head", "linear_object_info"),
+    EHPSignal.LANES_GEOMETRY: ("profile_head", "get_geometry_info", "get_geometry_contents"),
+    EHPSignal.CURVATURE: ("profile_head", "profile_curvature"),
+    EHPSignal.SLOPE: ("profile_head", "slope_info"),
+    EHPSignal.EFFECTIVE_SPEED_LIMIT: ("profile_head", "speed_limit"),
+    EHPSignal.ROAD_GEOMETRY: ("profile_head", "road_geo_info"),
+    EHPSignal.NUMBER_OF_LANES_DRIVING_DIRECTION: ("profile_head", "number_of_lane"),
+    EHPSignal.LINK_IDENTIFIER: ("profile_head", "link_info"),
+    EHPSignal.FUNCTIONAL_ROAD_CLASS: ("profile_head", "link_fun_class"),
+    EHPSignal.FORM_OF_WAY: ("profile_head", "link_form_way"),
+    EHPSignal.TUNNEL: ("profile_head", "tunnel_info"),
+    EHPSignal.LANE_WIDTH: ("profile_head", "get_lane_width"),
+    EHPSignal.MERGE_POINT: ("profile_head", "merge_point_info"),
+}
+
+
+class _LegacyLayout(object):
+    """
+    Stand-in for a precompiled struct.Struct decoding the way the accessors
+    did before: slice copy plus struct.unpack with the format string.
+    Only an emulation of the baseline, used when git is not available.
+    """
+
+    def __init__(self, layout) -> None:
+        self.format = layout.format
+        self.size = layout.size
+
+    def unpack_from(self, buffer, offset=0):
+        return struct.unpack(self.format, buffer[offset:offset + self.size])
+
+    def iter_unpack(self, buffer):
+        # 逐个元素切片解码, 与批量解码之前的循环相同
+        for offset in range(0, len(buffer), self.size):
+            yield self.unpack_from(buffer, offset)
+
+
+def load_baseline(revision=BASELINE_REVISION):
+    """
+    Load ehp_signal_matrix_struct as it was at `revision` as a separate module.
+    :return The module, None if git or the revision is not available
+    """
+    directory = os.path.dirname(os.path.abspath(__file__))
+    try:
+        source = subprocess.run(["git", "show", "%s:./ehp_signal_matrix_struct.py" % revision],
+                                cwd=directory, capture_output=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    module = types.ModuleType("ehp_signal_matrix_struct_%s" % revision)
+    module.__file__ = "%s:ehp_signal_matrix_struct.py" % revision
+    exec(compile(source, module.__file__, "exec"), module.__dict__)
+    return module
+
+
+def baseline_decoder(baseline):
+    """
+    :return decode_messages function running the baseline decoder classes
+    """
+    # 基准版本没有 DECODERS, 按类名对应
+    classes = {data_id: getattr(baseline, DECODERS[data_id].__name__) for data_id in ACCESSORS}
+
+    def decode_baseline(messages):
+        decoded = 0
+        for udp_data in messages:
+            message = classes[struct.unpack("<I", udp_data[4:8])[0]](udp_data)
+            accessors = ACCESSORS[int(message.ehp_head()[2], 16)]
+            message.pay_load_ts_info()
+            message.pay_load_head_info()
+            message.pay_load_adasis_head(udp_data)
+            try:
+                for accessor in accessors:
+                    getattr(message, accessor)()
+            except struct.error:
+                continue
+            decoded += 1
+        return decoded
+    return decode_baseline
+
+
+def load_messages(file_path):
+    """
+    :return List of the EHP payloads of the capture that have a decoder
+    """
+    messages = []
+    with MmapPcapReader(file_path) as reader:
+        for _, _, udp_data in reader:
+            if len(udp_data) >= 44 and ehp_data_id(udp_data) in ACCESSORS:
+                messages.append(bytes(udp_data))
+    return messages
+
+
+def decode_all(messages):
+    decoded = 0
+    for udp_data in messages:
+        message = decode(udp_data)
+        accessors = ACCESSORS[message.data_id()]
+        message.pay_load_ts_info()
+        message.pay_load_head_info()
+        message.pay_load_adasis_head(udp_data)
+        try:
+            for accessor in accessors:
+                getattr(message, accessor)()
+        except struct.error:
+            continue
+        decoded += 1
+    return decoded
+
+
+def decode_layouts(messages):
+    """
+    Decode every message completely with the generated decoder of its layout
+    """
+    decoded = 0
+    for udp_data in messages:
+        layout = LAYOUTS.get(ehp_data_id(udp_data))
+        if layout is None:
+            continue
+        try:
+            layout.decode(udp_data)
+        except struct.error:
+            continue
+        decoded += 1
+    return decoded
+
+
+def measure(messages, repeat=3, decode_messages=decode_all):
+    """
+    :return Best decoded messages/second over `repeat` runs
+    """
+    best = 0.0
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        decoded = decode_messages(messages)
+        elapsed = time.perf_counter() - t0
+        best = max(best, decoded / elapsed if elapsed else 0.0)
+    return best
+
+
+def legacy_layouts():
+    """
+    Swap the precompiled layouts of the signal matrix for legacy stand-ins.
+    :return Dict of the replaced layouts, pass it to restore_layouts
+    """
+    replaced = {}
+    for name, value in vars(signal_matrix).items():
+        if isinstance(value, struct.Struct):
+            replaced[name] = value
+    for name, layout in replaced.items():
+        setattr(signal_matrix, name, _LegacyLayout(layout))
+    # 布局表的重复元素直接引用 Struct, 一并替换
+    for message_layout in LAYOUTS.values():
+        for segment, _ in message_layout.repeated.values():
+            replaced[segment] = segment.layout
+            segment.layout = _LegacyLayout(segment.layout)
+    return replaced
+
+
+def restore_layouts(replaced):
+    for key, layout in replaced.items():
+        if isinstance(key, str):
+            setattr(signal_matrix, key, layout)
+        else:
+            key.layout = layout
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("[usage]: ./pcap_path")
+        sys.exit(1)
+    messages = load_messages(sys.argv[1])
+    print("%d EHP messages with decoder" % len(messages))
+    baseline = load_baseline()
+    if baseline is not None:
+        before = measure(messages, decode_messages=baseline_decoder(baseline))
+    else:
+        replaced = legacy_layouts()
+        try:
+            before = measure(messages)
+        finally:
+            restore_layouts(replaced)
+    after = measure(messages)
+    generated = measure(messages, decode_messages=decode_layouts)
+    if baseline is not None:
+        print("baseline %-14s: %10.0f messages/s" % (BASELINE_REVISION, before))
+    else:
+        print("legacy, EMULATED       : %10.0f messages/s (git baseline not available)" % before)
+    print("precompiled unpack_from: %10.0f messages/s" % after)
+    print("layout table, complete : %10.0f messages/s" % generated)
+    if baseline is not None and before:
+        print("speedup over baseline %.2fx" % (after / before))
@@ -1,52 +1,33 @@
+import asyncio
 import os
-import socket
-import pyshark
-import time
 import threading
 import json
 import sys
 
 from ehp_signal_matrix_struct import *
+from pcap_reader import MmapPcapReader
+from pcap_index import PcapIndex
+from udp_sender import BatchSender
+from multicast_routes import Route, RoutingTable
+from pacer import ReplayClock
+from preload import PreloadedCapture
+from loop_replay import LoopedPackets
+from merge_replay import MergedPackets
+from replay_pipeline import PacketPipeline, PIPELINE_DEPTH
+from playback_control import PlaybackControl, start_control_server, watch_interval_file, CONTROL_PORT
 
 # 组播地址和端口
 MULTICAST_ADDR = '239.255.43.44'
 PORT = 12345
 
-interval:float = 1   #初始播放速度
-real_interval:float = 1 #实际播放速度
-current_sum_interval:float = 0
-update_interval = False
-last_pcap_ts = 0
-last_real_ts = 0
-
-def interval_watch(interval_path):
-    global interval
-    global real_interval
-    global update_interval
-    while 1:
-        with open(interval_path, 'r') as f:
-            # 读取JSON数据
-            data = json.load(f)
-        if float(data["interval"]) != interval:
-            interval = float(data["interval"])
-            real_interval = real_interval if interval>1000 else interval
-            update_interval = True
-        time.sleep(1)
-
-def time_prepare():
-    global interval
-    global current_sum_interval
-    global update_interval
-    if interval <=1000:
-        return True
-    if update_interval:
-        update_interval = False
-        current_sum_interval = 0
-    current_sum_interval+=1000
-    if current_sum_interval > interval:
-        current_sum_interval = 0
-        return True
-    return False
+def ehp_cycle_counter(udp_data):
+    """
+    ADASIS cyclic counter (byte 41) of an EHP packet, used to step cycle by cycle.
+    :return None if the payload is not an EHP message
+    """
+    if len(udp_data) < 44 or not is_ehp(udp_data):
+        return None
+    return udp_data[41]
 
 def init_interval_file(interval_path, init_interval):
     data = {"interval":str(init_interval)}
@@ -55,45 +36,213 @@ def init_interval_file(interval_path, init_interval):
     with open(interval_path, 'w') as f:
         f.write(json_str)
 
-def load_file(file_path ,interval_input):
-    global interval 
-    global last_pcap_ts
-    global last_real_ts
-    global real_interval
-    interval = interval_input
-    real_interval = interval
+def pyshark_packets(file_path, tshark_path, start_time=None, start_packet=None):
+    """
+    Fallback packet source dissecting the capture with tshark through pyshark.
+    start_time:Seconds since the first packet of the capture to start at
+    start_packet:Packet number to start at
+    :return Iterator of (timestamp, dst_port, udp_payload)
+    """
+    import pyshark
+    loop = None
+    if threading.current_thread() is not threading.main_thread():
+        # 在读线程中运行时(回放流水线), pyshark 在 Windows 上不会为非主线程创建事件循环
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+    # 跳转交给 tshark 的显示过滤器, 之前的报文不再逐个解析成 Python 对象
+    conditions = []
+    if start_time is not None:
+        conditions.append("frame.time_relative >= %.9f" % start_time)
+    if start_packet:
+        conditions.append("frame.number > %d" % start_packet)
+    try:
+        cap = pyshark.FileCapture(file_path, tshark_path=tshark_path,
+                                  display_filter=" && ".join(conditions) or None)
+        try:
+            for packet in cap:
+                udp_data = bytes.fromhex(packet.udp.payload.replace(':', ''))
+                yield float(packet.sniff_timestamp), int(packet.udp.dstport), udp_data
+        finally:
+            cap.close()
+    finally:
+        if loop is not None:
+            asyncio.set_event_loop(None)
+            loop.close()
+
+def indexed_packets(file_path, start_time=None, start_packet=None, packet_filter=None):
+    """
+    Packet source reading through the sidecar index, built on first use.
+    start_time:Seconds since the first packet of the capture to start at
+    start_packet:Packet number to start at
+    packet_filter:Optional PacketFilter
+    :return Iterator of (timestamp, dst_port, udp_payload)
+    """
+    index = PcapIndex.open(file_path)
+    start = start_packet or 0
+    if start_time is not None:
+        start = index.find_offset(start_time)
+    try:
+        yield from index.packets(start, packet_filter)
+    finally:
+        index.close()
+
+def open_packets(file_path, tshark_path=None, use_pyshark=False, use_index=False, start_time=None, start_packet=None,
+                 pipeline_depth=PIPELINE_DEPTH, preloaded=None, loops=None, rewrite_counter=False, packet_filter=None):
+    """
+    Open the packet source of one or more captures, read by a background thread
+    into a ring buffer of `pipeline_depth` packets unless it is 0.
+    file_path:Capture path, or list of capture paths merged by timestamp
+    start_time:Seconds since the first packet of the (earliest) capture
+    start_packet:Packet number in the (merged) stream
+    preloaded:Dict of capture path to PreloadedCapture, replayed from memory
+    without reader thread
+    loops:Replay the captures this many times with rebased timestamps, 0 forever,
+    None once
+    rewrite_counter:Continue the EHP head counter across loops
+    packet_filter:Optional PacketFilter applied by the readers, start_packet
+    still counts unfiltered packets of a single capture
+    :return Closable iterable of (timestamp, dst_port, udp_payload)
+    """
+    paths = [file_path] if isinstance(file_path, str) else list(file_path)
+
+    def open_one(path, start_time=None, start_packet=None):
+        if preloaded is not None:
+            capture = preloaded[path]
+            start = start_packet or 0
+            if start_time is not None:
+                start = capture.find_offset(start_time)
+            return capture.packets(start, packet_filter)
+        if use_pyshark:
+            packets = pyshark_packets(path, tshark_path, start_time, start_packet)
+            if packet_filter is not None:
+                return packet_filter.filter(packets)
+            return packets
+        if use_index or start_time is not None or start_packet is not None:
+            return indexed_packets(path, start_time, start_packet, packet_filter)
+        return MmapPcapReader(path, packet_filter)
+
+    first_timestamps = {}
+
+    def open_source(start_time=None, start_packet=None):
+        if len(paths) == 1:
+            return open_one(paths[0], start_time, start_packet)
+        if start_time is None:
+            return MergedPackets([open_one(path) for path in paths], start_packet or 0)
+        # 跳转时间以最早开始的抓包为准, 换算为各文件自身的偏移
+        if not first_timestamps:
+            for path in paths:
+                with MmapPcapReader(path) as reader:
+                    first_timestamps[path] = reader.first_timestamp()
+        begin = min(ts for ts in first_timestamps.values() if ts is not None)
+        return MergedPackets([open_one(path, begin + start_time - (first_timestamps[path] or begin))
+                              for path in paths], start_packet or 0)
+
+    if loops is None:
+        packets = open_source(start_time, start_packet)
+    else:
+        packets = LoopedPackets(open_source, loops, rewrite_counter, start_time, start_packet)
+    if pipeline_depth and preloaded is None:
+        packets = PacketPipeline(packets, pipeline_depth)
+    return packets
+
+def load_file(file_path ,interval_input, use_pyshark=False, use_index=False, start_time=None, start_packet=None,
+              batch_window=None, control_port=CONTROL_PORT, pipeline_depth=PIPELINE_DEPTH, preload=False,
+              loops=None, rewrite_counter=False, packet_filter=None, routes=None):
     interval_path=os.path.dirname(sys.argv[0]) + "/interval.json"
     print("interval_path=="+interval_path)
     tsharkpath = os.path.dirname(sys.argv[0]) + "/tshark.exe"
-    # 创建 UDP 套接字
-    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM) 
-    # 设置组播选项
-    sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 255)
-    sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 1)
-
-    if os.path.exists(file_path):
-        cap = pyshark.FileCapture(file_path,tshark_path= tsharkpath)
+    # 组播路由表, 每条路由一个预先配置好的套接字
+    if routes is None:
+        routes = RoutingTable(Route(MULTICAST_ADDR))
+    routes.open()
+    resolve = routes.resolve
+
+    paths = [file_path] if isinstance(file_path, str) else list(file_path)
+    if all(os.path.exists(path) for path in paths):
+        preloaded = None
+        if preload:
+            preloaded = {}
+            for path in paths:
+                preloaded[path] = PreloadedCapture.load(path)
+                print(path, preloaded[path].report())
+        packets = open_packets(file_path, tsharkpath, use_pyshark, use_index, start_time, start_packet, pipeline_depth,
+                               preloaded, loops, rewrite_counter, packet_filter)
         init_interval_file(interval_path,interval_input)
-        watch_thread = threading.Thread(target=interval_watch,args=(interval_path,))
+        # 调速/暂停/单步/跳转指令统一经由 control 下发, 状态变化立即唤醒回放循环
+        control = PlaybackControl(interval_input)
+        watch_thread = threading.Thread(target=watch_interval_file,args=(interval_path, control))
         watch_thread.daemon = True
         watch_thread.start()
-        for packet in cap:
-            udp_payload = packet.udp.payload
-            udp_data = bytes.fromhex(udp_payload.replace(':', ''))
-            ts = float(packet.sniff_timestamp)
-            if(last_pcap_ts == 0):
-                last_pcap_ts = ts
-                last_real_ts = time.time()
+        control_server = start_control_server(control, control_port) if control_port else None
+        # 以抓包起点为锚点计算每个报文的发送时刻, 睡眠误差不累积
+        # 慢放直接按倍数拉长报文间隔, 调速/暂停指令到达时立即唤醒
+        clock = ReplayClock(control.interval)
+        # 发送时间落在同一窗口内的报文合并为一次系统调用, 迟滞在实际发出后记录
+        queued = []
+
+        def record_sent(count):
+            clock.sent(queued[:count])
+            del queued[:count]
+
+        sender = BatchSender(routes.default.sock, batch_window, on_flush=record_sent) if batch_window else None
+        version = control.version
+
+        def interrupt(timeout):
+            # 读取回放循环最后处理的 version, 比较之后才到达的指令也会立即唤醒
+            return control.wait(timeout, version)
+
+        packet_iter = iter(packets)
+        packet = None
+        while True:
+            if packet is None:
+                packet = next(packet_iter, None)
+                if packet is None:
+                    break
+            ts, dst_port, udp_data = packet
+            resync = control.wait_turn(ehp_cycle_counter(udp_data) if control.paused else None)
+            if control.version != version:
+                version = control.version
+                clock.set_scale(control.interval)
+                seek_to = control.take_seek()
+                if seek_to is not None:
+                    packets.close()
+                    packets = open_packets(file_path, tsharkpath, use_pyshark, use_index, seek_to, None, pipeline_depth,
+                                           preloaded, loops, rewrite_counter, packet_filter)
+                    packet_iter = iter(packets)
+                    packet = None
+                    clock.reset()
+                    continue
+            if resync:
+                if sender is not None:
+                    sender.flush()
+                clock.reset()
+            deadline = clock.deadline_ns(ts)
+            if sender is None or sender.open_window(deadline / 1e9):
+                if clock.wait(ts, interrupt, record=sender is None) is None:
+                    # 等待期间收到指令, 重新处理同一个报文
+                    continue
+            else:
+                clock.schedule(ts)
+
+            sock, addr = resolve(dst_port, udp_data)
+            if sender is None:
+                sock.sendto(udp_data, addr)
             else:
-                cur_real_ts = time.time()
-                dist = (ts - last_pcap_ts) * real_interval - (cur_real_ts - last_real_ts)
-                if dist > 0:
-                    time.sleep(dist)
-                last_pcap_ts = ts
-                last_real_ts = cur_real_ts
-
-            sock.sendto(udp_data, (MULTICAST_ADDR, int(packet.udp.dstport)))    
-            while(time_prepare() != True):
-                time.sleep(1)
+                queued.append(deadline)
+                sender.add(udp_data, addr, sock)
+            packet = None
         
-        sock.close()
+        if isinstance(packets, PacketPipeline):
+            print(packets.report())
+        packets.close()
+        if sender is not None:
+            sender.flush()
+            print("batched send: %d datagrams in %d syscalls, ratio %.2f%s" % (
+                sender.datagrams, sender.syscalls, sender.batch_ratio,
+                "" if sender.uses_sendmmsg else " (sendmmsg unavailable)"))
+        print(clock.stats.report())
+        if packet_filter is not None:
+            print(packet_filter.report())
+        if control_server is not None:
+            control_server.close()
+    routes.close()
@@ -0,0 +1,341 @@
+import os
+import sys
+from collections import OrderedDict
+from pathlib import Path
+
+from ehp_reassembly import Reassembler
+from ehp_signal_matrix_struct import EHPSignal, SignalDispatcher
+from pcap_reader import MmapPcapReader
+
+directory = Path(__file__).resolve().parent
+sys.path.append(str(directory.parent))
+from generated import GEELY_HDM_PB_pb2 as hdm
+
+"""
+EHP -> HD map protobuf conversion.
+Profiles are collected per ADASIS path, keyed by profile type and instance ID so
+a retransmitted or changed profile replaces the earlier one. Every LINK_IDENTIFIER
+profile becomes a Link covering its [offset, endOffset) range on the path, the
+lane model, lane width, speed limit, curvature, slope and road geometry profiles
+overlapping that range are merged into the Link and its Lanes.
+A Segment (segment_id = path ID) is emitted with the links the vehicle position
+has passed, with all links of a path once PathControl no longer lists it, when
+the path got no profile for `path_timeout` seconds, or when more than
+`max_records` profiles are pending. Emitted profiles are dropped, memory stays
+bounded by the horizon instead of growing with the drive. The end of the last
+emitted link is kept per path, retransmitted profiles ending at or before it are
+ignored so a link is emitted once; the frontier is forgotten when PathControl
+no longer lists the path, as its ID may then be reused.
+"""
+
+# ADASIS 偏移量及宽度单位为 cm
+OFFSET_SCALE = 0.01
+WIDTH_SCALE = 0.01
+# ADASIS WGS84 坐标, 高度单位 cm
+COORDINATE_SCALE = 360.0 / 2 ** 32
+ALTITUDE_SCALE = 0.01
+PATH_TIMEOUT = 30.0
+MAX_RECORDS = 100000
+# 记住已发出 link 末端的 path 数
+EMITTED_PATHS = 1024
+
+# 数据 ID -> 取值方法
+PROFILE_VALUES = {
+    EHPSignal.LINK_IDENTIFIER: "link_info",
+    EHPSignal.LANE_MODEL: "lane_infoes",
+    EHPSignal.LANE_WIDTH: "get_lane_width",
+    EHPSignal.EFFECTIVE_SPEED_LIMIT: "speed_limit",
+    EHPSignal.CURVATURE: "profile_curvature",
+    EHPSignal.SLOPE: "slope_info",
+    EHPSignal.ROAD_GEOMETRY: "road_geo_info",
+}
+
+
+class _Profile(object):
+    __slots__ = ("data_id", "offset", "end_offset", "lane_number", "value")
+
+    def __init__(self, data_id, offset, end_offset, lane_number, value) -> None:
+        self.data_id = data_id
+        self.offset = offset
+        self.end_offset = end_offset
+        self.lane_number = lane_number
+        self.value = value
+
+
+class _PathProfiles(object):
+    __slots__ = ("path_id", "profiles", "last_ts")
+
+    def __init__(self, path_id, last_ts) -> None:
+        self.path_id = path_id
+        # (数据 ID, instance ID) -> _Profile
+        self.profiles = {}
+        self.last_ts = last_ts
+
+
+def _merge_samples(link_or_center_line, samples, start, end):
+    """
+    Write the curvature and slope samples within [start, end) as the parallel
+    adas_* arrays, a value missing at an offset holds the previous sample of its
+    kind, also from before the link start
+    samples:Dict of path offset -> [curvature, slope, cross_slope], None if unknown
+    """
+    last = [0.0, 0.0, 0.0]
+    for offset in sorted(samples):
+        if offset >= end:
+            break
+        for index, value in enumerate(samples[offset]):
+            if value is not None:
+                last[index] = value
+        if offset < start:
+            continue
+        link_or_center_line.adas_offset.append((offset - start) * OFFSET_SCALE)
+        link_or_center_line.adas_curvature.append(last[0])
+        link_or_center_line.adas_longitudinal_slope.append(last[1])
+        link_or_center_line.adas_cross_slope.append(last[2])
+
+
+class HdmapConverter(object):
+    """
+    on_segment:Callable(segment) called with every completed hdm.Segment
+    Counters: segments, links emitted, profiles pending, ignored:retransmitted
+    profiles of links already emitted
+    """
+
+    def __init__(self, on_segment, path_timeout=PATH_TIMEOUT, max_records=MAX_RECORDS) -> None:
+        self.on_segment = on_segment
+        self.path_timeout = path_timeout
+        self.max_records = max_records
+        self.segments = 0
+        self.links = 0
+        self.profiles = 0
+        self.ignored = 0
+        self._ts = 0.0
+        # path ID -> _PathProfiles, 最近更新的在末尾
+        self._paths = OrderedDict()
+        # path ID -> 已发出 link 的最大 endOffset
+        self._emitted = OrderedDict()
+        self.dispatcher = SignalDispatcher()
+        for data_id in PROFILE_VALUES:
+            self.dispatcher.subscribe(data_id, self._on_profile)
+        self.dispatcher.subscribe(EHPSignal.LOC, self._on_location)
+        self.dispatcher.subscribe(EHPSignal.PATH_CONTROL, self._on_path_control)
+
+    def _on_profile(self, message):
+        instance_id, _, _, _, path_id, lane_number, offset, end_offset = message.profile_head()[:8]
+        emitted = self._emitted.get(path_id)
+        if emitted is not None and end_offset <= emitted:
+            # 重传的 profile 落在已发出的 link 内
+            self.ignored += 1
+            return
+        data_id = message.data_id()
+        value = getattr(message, PROFILE_VALUES[data_id])()
+        path = self._paths.get(path_id)
+        if path is None:
+            path = self._paths[path_id] = _PathProfiles(path_id, self._ts)
+        else:
+            self._paths.move_to_end(path_id)
+            path.last_ts = self._ts
+        key = (data_id, instance_id)
+        if key not in path.profiles:
+            self.profiles += 1
+        path.profiles[key] = _Profile(data_id, offset, end_offset, lane_number, value)
+
+    def _on_location(self, message):
+        path_id, offset = message.location_position_info()[2:4]
+        path = self._paths.get(path_id)
+        if path is not None:
+            self._emit(path, offset)
+
+    def _on_path_control(self, message):
+        path_ids = {path_id for path_id, _, _ in message.path_control_path()}
+        if not path_ids:
+            return
+        for path_id in [path_id for path_id in self._paths if path_id not in path_ids]:
+            self._emit(self._paths[path_id])
+        for path_id in [path_id for path_id in self._emitted if path_id not in path_ids]:
+            del self._emitted[path_id]
+
+    def _expire(self):
+        paths = self._paths
+        oldest = self._ts - self.path_timeout
+        while paths:
+            path = next(iter(paths.values()))
+            if path.last_ts >= oldest and self.profiles <= self.max_records:
+                break
+            self._emit(path)
+
+    def _emit(self, path, passed=None):
+        """
+        Emit the links of a path as one Segment and drop their profiles
+        passed:Path offset of the vehicle, only links ending at or before it are
+        emitted, None emits all links and drops the path
+        """
+        profiles = path.profiles
+        links = sorted((profile for (data_id, _), profile in profiles.items()
+                        if data_id == EHPSignal.LINK_IDENTIFIER and (passed is None or profile.end_offset <= passed)),
+                       key=lambda profile: profile.offset)
+        segment = None
+        if links:
+            segment = hdm.Segment(segment_id=path.path_id)
+            for link in links:
+                self._build_link(segment.links.add(), link, profiles.values())
+            frontier = max(link.end_offset for link in links)
+            emitted = self._emitted
+            emitted[path.path_id] = max(frontier, emitted.pop(path.path_id, frontier))
+            if len(emitted) > EMITTED_PATHS:
+                emitted.popitem(last=False)
+        if passed is None:
+            del self._paths[path.path_id]
+            self.profiles -= len(profiles)
+        elif links:
+            # 只丢弃完全落在已发出 link 之前的 profile
+            for key in [key for key, profile in profiles.items() if profile.end_offset <= frontier]:
+                del profiles[key]
+                self.profiles -= 1
+        if segment is None:
+            return
+        self.segments += 1
+        self.links += len(links)
+        self.on_segment(segment)
+
+    def _build_link(self, link, link_profile, profiles):
+        start, end = link_profile.offset, link_profile.end_offset
+        # EHP link ID 为 64 位, HD map link ID 为 32 位
+        link.link_id = link_profile.value & 0xFFFFFFFF
+        link.length = (end - start) * OFFSET_SCALE
+        overlapping = [profile for profile in profiles
+                       if profile.offset <= start < profile.end_offset or start <= profile.offset < end]
+        lanes = {}
+        for profile in overlapping:
+            if profile.data_id == EHPSignal.LANE_MODEL and not lanes:
+                # lane model 不带车道 ID, lane_id 保持未设置
+                for lane_number, _, _, _, _, centerline, left_bound, right_bound in profile.value:
+                    lane = link.lanes.add(sequence=lane_number, left_marking_id=left_bound,
+                                          right_marking_id=right_bound)
+                    lane.center_line.center_line_id = centerline
+                    lanes[lane_number] = lane
+                link.lane_num = len(lanes)
+        samples = {}
+        for profile in overlapping:
+            data_id = profile.data_id
+            lane = lanes.get(profile.lane_number) if profile.lane_number else None
+            if data_id == EHPSignal.LANE_WIDTH and lane is not None:
+                min_width, max_width = profile.value
+                lane.min_width = min_width * WIDTH_SCALE
+                lane.max_width = max_width * WIDTH_SCALE
+                lane.average_width = (min_width + max_width) / 2 * WIDTH_SCALE
+            elif data_id == EHPSignal.EFFECTIVE_SPEED_LIMIT:
+                speed_high, speed_low, _ = profile.value
+                if lane is not None:
+                    lane.max_speed = speed_high
+                    lane.min_speed = speed_low
+                elif not profile.lane_number:
+                    link.limit_speed = speed_high
+            elif data_id == EHPSignal.ROAD_GEOMETRY:
+                for lat, lon, alt in profile.value:
+                    link.link_geometry.add(x=lon * COORDINATE_SCALE, y=lat * COORDINATE_SCALE,
+                                           z=alt * ALTITUDE_SCALE)
+            elif data_id in (EHPSignal.CURVATURE, EHPSignal.SLOPE):
+                target = samples.setdefault(profile.lane_number, {})
+                if data_id == EHPSignal.CURVATURE:
+                    for offset, curvature in profile.value:
+                        target.setdefault(offset, [None, None, None])[0] = curvature
+                else:
+                    for offset, slope, cross_slope in profile.value:
+                        target.setdefault(offset, [None, None, None])[1:] = slope, cross_slope
+        for lane_number, lane_samples in samples.items():
+            if not lane_number:
+                _merge_samples(link, lane_samples, start, end)
+            elif lane_number in lanes:
+                _merge_samples(lanes[lane_number].center_line, lane_samples, start, end)
+
+    def feed(self, ts, udp_data):
+        """
+        Convert one complete EHP message, completed Segments go to on_segment
+        """
+        self._ts = ts
+        self.dispatcher.dispatch(udp_data)
+        if self._paths:
+            self._expire()
+
+    def convert(self, source):
+        """
+        source:Iterable of (timestamp, dst_port, udp_payload), multi-part
+        messages are reassembled first
+        """
+        for ts, dst_port, message in Reassembler().reassemble(source):
+            self.feed(ts, message)
+        self.flush()
+
+    def flush(self):
+        """
+        Emit every pending path, e.g. at the end of the capture
+        """
+        while self._paths:
+            self._emit(next(iter(self._paths.values())))
+
+    def report(self):
+        return "%d segments, %d links emitted, %d profiles pending, %d retransmitted profiles ignored" % (
+            self.segments, self.links, self.profiles, self.ignored)
+
+
+def _varint(value):
+    data = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            data.append(byte | 0x80)
+        else:
+            data.append(byte)
+            return bytes(data)
+
+
+def convert_file(file_path, output_path, packet_filter=None):
+    """
+    Convert a capture into length delimited Segment messages (varint size + message,
+    the writeDelimitedTo format)
+    :return HdmapConverter with the counters
+    """
+    with open(output_path, "wb") as output:
+        def write_segment(segment):
+            data = segment.SerializeToString()
+            output.write(_varint(len(data)))
+            output.write(data)
+
+        converter = HdmapConverter(write_segment)
+        with MmapPcapReader(file_path, packet_filter) as reader:
+            converter.convert(reader)
+    return converter
+
+
+def read_segments(input_path):
+    """
+    :return Iterator of the hdm.Segment messages written by convert_file
+    """
+    with open(input_path, "rb") as f:
+        data = f.read()
+    position = 0
+    while position < len(data):
+        size = shift = 0
+        while True:
+            byte = data[position]
+            position += 1
+            size |= (byte & 0x7F) << shift
+            shift += 7
+            if not byte & 0x80:
+                break
+        segment = hdm.Segment()
+        segment.ParseFromString(data[position:position + size])
+        position += size
+        yield segment
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("[usage]: ./pcap_path [output_path]")
+        sys.exit(1)
+    pcap_path = sys.argv[1]
+    output_path = sys.argv[2] if len(sys.argv) > 2 else os.path.splitext(pcap_path)[0] + ".pb"
+    converter = convert_file(pcap_path, output_path)
+    print(output_path, ":", converter.report())
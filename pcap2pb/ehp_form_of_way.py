@@ -1,34 +1,30 @@
 from ehp_signal_matrix_struct import *
+from ehp_reassembly import Reassembler
+from ehp_views import FormOfWayView
+from pcap_reader import MmapPcapReader
 import json
-import dpkt
 
 def get_link_form_info(profiles_form_of_way):
     result = {}
-    for profile_form_of_way in profiles_form_of_way:
-        link_id = profile_form_of_way.profile_head()[0]
-        form_of_way = profile_form_of_way.link_form_way()[0]
+    for link_id, form_of_way in profiles_form_of_way:
         result[link_id] = form_of_way
     return result
 
 def load_file(file_path):
-    profiles_form_of_way = []
-    with open(file_path, "rb") as fp:
-        try:
-            pcp_data = dpkt.pcap.Reader(fp)
-            for timestamp, buffer in pcp_data:
-                eth_udp = dpkt.ethernet.Ethernet(buffer)
-                if (
-                        "udp" in dir(eth_udp.data)
-                        and eth_udp.data.p == dpkt.ip.IP_PROTO_UDP
-                ):
-                    ehp_obj = EhpHead(eth_udp.data.data.data)
-                    data_id = eval(ehp_obj.ehp_head()[-2])
-                    if data_id == 0x03000011:
-                        profiles_form_of_way.append(ProfileFormOfWay(eth_udp.data.data.data))
-            print(file_path, ": loaded")
-        except ValueError as e:
-            print(e, ": ", file_path)
-    return profiles_form_of_way
+    """
+    :return Iterator of (instance_id, form_of_way), one view is re-bound to
+    every packet and only the two fields are copied, no payload is kept
+    """
+    view = FormOfWayView()
+    try:
+        with MmapPcapReader(file_path) as reader:
+            for timestamp, dst_port, udp_data in Reassembler().reassemble(reader):
+                if ehp_data_id(udp_data) == EHPSignal.FORM_OF_WAY:
+                    yield view.bind(udp_data).detach("instance_id", "form_of_way")
+            view.bind(None)
+        print(file_path, ": loaded")
+    except (ValueError, struct.error) as e:
+        print(e, ": ", file_path)
 
 def generate_data(data, file_path):
     with open(file_path, mode="w", encoding='utf-8') as f:
@@ -0,0 +1,250 @@
+import struct
+from collections import OrderedDict
+
+from ehp_signal_matrix_struct import EHP_HEAD, PAYLOAD_HEAD, UINT32, decode, is_ehp
+
+"""
+Multi-part EHP message reassembly.
+A message longer than one datagram is sent as `partCount` fragments sharing a
+`bundleId`. Every fragment repeats the 40 bytes of EHP head, payload timestamp
+and payload head, the message body (ADASIS head and content) is split over the
+fragments in `partIndex` order, starting at 0.
+Fragments are copied into one buffer allocated for the whole bundle when its
+first fragment arrives, the complete message gets the head of part 0 with
+partCount 1, partIndex 0 and the summed length, the CRC is not recomputed.
+Single-part messages and datagrams that are not EHP messages (see is_ehp) are
+passed through without a copy.
+"""
+
+# EHP head 12 bytes + payload timestamp 20 bytes + payload head 8 bytes
+FRAGMENT_HEAD = 40
+# 未完成的 bundle 在该时长(抓包时间, 秒)后丢弃
+BUNDLE_TIMEOUT = 1.0
+MEMORY_BUDGET = 64 * 1024 * 1024
+# 记住最近完成的 bundle, 识别完成后才到达的重复分片
+COMPLETED_HISTORY = 1024
+
+_EHP_LENGTH = struct.Struct("<H")
+
+
+class _Bundle(object):
+    __slots__ = ("part_count", "slot", "buffer", "lengths", "received", "first_ts")
+
+    def __init__(self, part_count, slot, first_ts) -> None:
+        self.part_count = part_count
+        self.slot = slot
+        self.buffer = bytearray(FRAGMENT_HEAD + part_count * slot)
+        # 每个分片的正文长度, -1 表示尚未收到
+        self.lengths = [-1] * part_count
+        self.received = 0
+        self.first_ts = first_ts
+
+    def grow(self, slot):
+        """
+        Re-layout the buffer for a fragment longer than the slot size
+        """
+        buffer = bytearray(FRAGMENT_HEAD + self.part_count * slot)
+        buffer[:FRAGMENT_HEAD] = self.buffer[:FRAGMENT_HEAD]
+        for index, length in enumerate(self.lengths):
+            if length > 0:
+                src = FRAGMENT_HEAD + index * self.slot
+                dst = FRAGMENT_HEAD + index * slot
+                buffer[dst:dst + length] = self.buffer[src:src + length]
+        self.buffer = buffer
+        self.slot = slot
+
+    def message(self):
+        """
+        Join the part bodies in index order in place
+        :return bytearray of the complete message
+        """
+        buffer, slot = self.buffer, self.slot
+        end = FRAGMENT_HEAD
+        for index, length in enumerate(self.lengths):
+            src = FRAGMENT_HEAD + index * slot
+            if src != end:
+                buffer[end:end + length] = buffer[src:src + length]
+            end += length
+        del buffer[end:]
+        _EHP_LENGTH.pack_into(buffer, 0, end - EHP_HEAD.size)
+        PAYLOAD_HEAD.pack_into(buffer, 32, 1, 0, UINT32.unpack_from(buffer, 36)[0])
+        return buffer
+
+
+class Reassembler(object):
+    """
+    timeout:Capture seconds after the first fragment an incomplete bundle is dropped
+    memory_budget:Bytes of bundle buffers kept, the oldest bundles are dropped above it,
+    a bundle that alone would exceed it is rejected
+    Counters:
+    messages:complete messages emitted, single:those that were not fragmented
+    other:datagrams passed through because they are not EHP messages
+    fragments:fragments received, bundles:multi-part messages completed
+    duplicates:fragments received twice, invalid:fragments with a bad part index/count
+    or of a bundle larger than the memory budget
+    incomplete:bundles dropped with missing parts, evicted:those dropped for the budget
+    """
+
+    def __init__(self, timeout=BUNDLE_TIMEOUT, memory_budget=MEMORY_BUDGET) -> None:
+        self.timeout = timeout
+        self.memory_budget = memory_budget
+        self.messages = 0
+        self.single = 0
+        self.other = 0
+        self.fragments = 0
+        self.bundles = 0
+        self.duplicates = 0
+        self.invalid = 0
+        self.incomplete = 0
+        self.evicted = 0
+        self.memory = 0
+        # (data id, bundle id) -> _Bundle, 按首个分片到达顺序
+        self._pending = OrderedDict()
+        self._completed = OrderedDict()
+
+    def feed(self, ts, udp_data):
+        """
+        ts:Capture timestamp of the datagram
+        :return The complete message, udp_data itself if it is not fragmented,
+        None while the bundle misses parts or if the datagram was dropped
+        """
+        if len(udp_data) < FRAGMENT_HEAD:
+            self.messages += 1
+            self.single += 1
+            return udp_data
+        if not is_ehp(udp_data):
+            # 非 EHP 报文没有分片头, 不能按 partCount 解析
+            self.messages += 1
+            self.other += 1
+            return udp_data
+        data_id = UINT32.unpack_from(udp_data, 4)[0]
+        part_count, part_index, bundle_id = PAYLOAD_HEAD.unpack_from(udp_data, 32)
+        if part_count <= 1 and not part_index:
+            self.messages += 1
+            self.single += 1
+            return udp_data
+        self.fragments += 1
+        if part_index >= part_count:
+            self.invalid += 1
+            return None
+        pending = self._pending
+        if pending:
+            self._expire(ts)
+        key = (data_id, bundle_id)
+        bundle = pending.get(key)
+        if bundle is not None and bundle.part_count != part_count:
+            # bundleId 被新消息复用, 旧的 bundle 不会再完成
+            self._drop(key)
+            bundle = None
+        length = len(udp_data) - FRAGMENT_HEAD
+        if bundle is None:
+            if key in self._completed:
+                self.duplicates += 1
+                return None
+            if FRAGMENT_HEAD + part_count * length > self.memory_budget:
+                # 单个 bundle 超出内存预算, 不分配缓冲区
+                self.invalid += 1
+                return None
+            bundle = pending[key] = _Bundle(part_count, length, ts)
+            bundle.buffer[:32] = udp_data[:32]
+            self.memory += len(bundle.buffer)
+        elif bundle.lengths[part_index] >= 0:
+            self.duplicates += 1
+            return None
+        if length > bundle.slot:
+            if FRAGMENT_HEAD + part_count * length > self.memory_budget:
+                self._drop(key)
+                self.invalid += 1
+                return None
+            self.memory -= len(bundle.buffer)
+            bundle.grow(length)
+            self.memory += len(bundle.buffer)
+        if self.memory > self.memory_budget:
+            self._evict(key)
+        offset = FRAGMENT_HEAD + part_index * bundle.slot
+        bundle.buffer[offset:offset + length] = udp_data[FRAGMENT_HEAD:]
+        bundle.lengths[part_index] = length
+        if part_index == 0:
+            bundle.buffer[:32] = udp_data[:32]
+        bundle.received += 1
+        if bundle.received < part_count:
+            return None
+        del pending[key]
+        self.memory -= len(bundle.buffer)
+        completed = self._completed
+        completed[key] = None
+        if len(completed) > COMPLETED_HISTORY:
+            completed.popitem(last=False)
+        self.bundles += 1
+        self.messages += 1
+        return bundle.message()
+
+    def _drop(self, key):
+        bundle = self._pending.pop(key)
+        self.memory -= len(bundle.buffer)
+        self.incomplete += 1
+
+    def _expire(self, ts):
+        pending = self._pending
+        oldest = ts - self.timeout
+        while pending:
+            key, bundle = next(iter(pending.items()))
+            if bundle.first_ts >= oldest:
+                break
+            self._drop(key)
+
+    def _evict(self, keep):
+        """
+        Drop the oldest bundles other than `keep` until the budget is met,
+        `keep` alone always fits since larger bundles are rejected
+        """
+        for key in list(self._pending):
+            if self.memory <= self.memory_budget:
+                break
+            if key != keep:
+                self._drop(key)
+                self.evicted += 1
+
+    def flush(self):
+        """
+        Drop the bundles still pending at the end of the input
+        """
+        while self._pending:
+            self._drop(next(iter(self._pending)))
+
+    def reassemble(self, source):
+        """
+        source:Iterable of (timestamp, dst_port, udp_payload), e.g. a MmapPcapReader
+        :return Iterator of (timestamp, dst_port, message), the timestamp and port
+        of a multi-part message are those of its last fragment
+        """
+        feed = self.feed
+        for ts, dst_port, udp_data in source:
+            message = feed(ts, udp_data)
+            if message is not None:
+                yield ts, dst_port, message
+        self.flush()
+
+    def decoded(self, source):
+        """
+        :return Iterator of (timestamp, dst_port, decoder object) of the complete
+        messages with a registered decoder
+        """
+        for ts, dst_port, message in self.reassemble(source):
+            decoded = decode(message)
+            if decoded is not None:
+                yield ts, dst_port, decoded
+
+    def dispatch(self, source, dispatcher):
+        """
+        Pass every complete message to a SignalDispatcher
+        """
+        dispatch = dispatcher.dispatch
+        for ts, dst_port, message in self.reassemble(source):
+            dispatch(message)
+
+    def report(self):
+        return ("reassembly: %d messages (%d single part, %d not EHP, %d bundles from %d fragments), "
+                "%d duplicates, %d invalid, %d incomplete (%d evicted for memory)") % (
+            self.messages, self.single, self.other, self.bundles, self.fragments,
+            self.duplicates, self.invalid, self.incomplete, self.evicted)
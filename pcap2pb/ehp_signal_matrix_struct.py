@@ -51,22 +51,538 @@ class EHPSignal(IntFlag):
     DYNAMIC_INFO_METEOROLOGY = 0x03000018
 
 
+# 预编译的消息布局, 解码时用 unpack_from 原地读取, 不复制切片
+EHP_HEAD = struct.Struct("<HHII")  # length, counter, data id, crc
+PAYLOAD_TIMESTAMP = struct.Struct("<BBHQQ")  # reserve, utc valid, utc week, utc us, systime
+PAYLOAD_HEAD = struct.Struct("<HHI")  # partCount, partIndex, bundleId
+ADASIS_HEAD = struct.Struct("<BBBB")  # reserved, cyclic counter, message type, message count
+NOA_NAVIGATION_INFO = struct.Struct("<BBI")
+NOA_SWITCH_INFO = struct.Struct("<BBHHH")
+NOA_HD_INFO = struct.Struct("<IH")
+LOCATION_RELATIVE_POS = struct.Struct("<QQBLLff")
+LOCATION_ABSOLUTE_POS = struct.Struct("<llfffBffffff")
+LOCATION_POSITION_INFO = struct.Struct("<QQIIIlfffBI")
+LOCATION_FAIL_SAFE = struct.Struct("<BBBBBB")
+GLOBAL_BYTE_ATTRIBUTE = struct.Struct("<B?B")  # data type, available, value
+GLOBAL_INT_ATTRIBUTE = struct.Struct("<B?I")  # data type, available, value
+PATH_CONTROL_HEAD = struct.Struct("<IIBB")
+PATH_CONTROL_PATH = struct.Struct("<III")
+PROFILE_CONTROL_PATH = struct.Struct("<II")
+PROFILE_HEAD = struct.Struct("<I?BfIBII?BB?")
+CURVATURE_POINT = struct.Struct("<If")
+SPEED_LIMIT = struct.Struct("<BBB")
+GEO_FENCE = struct.Struct("<BbII")
+LANE_CONNECTION = struct.Struct("<BIBII")
+LANE_INFO = struct.Struct("<BBBIIIII")
+LANES_GEOMETRY_INFO = struct.Struct("<BIBB")
+LANE_WIDTH = struct.Struct("<HH")
+LINEAR_OBJECT = struct.Struct("<IBBBB")
+MERGE_POINT = struct.Struct("<II?")
+NODE_POINT = struct.Struct("<Iff?B")
+SLOPE_POINT = struct.Struct("<Iff")
+EVENT_INFO = struct.Struct("<HBB")
+EVENT_POSITION = struct.Struct("<Iii")  # offset, lat, lon
+METEOROLOGY_INFO = struct.Struct("<IBBB")
+POSITION_3D = struct.Struct("<iii")  # lat, lon, alt
+UINT8_PAIR = struct.Struct("<BB")
+UINT8 = struct.Struct("<B")
+UINT32 = struct.Struct("<I")
+UINT64 = struct.Struct("<Q")
+BOOL = struct.Struct("<?")
+
+_STRUCT_CACHE = {}
+
+
+def compiled_struct(decode_str):
+    """
+    :return struct.Struct of the decoding string, compiled once
+    """
+    layout = _STRUCT_CACHE.get(decode_str)
+    if layout is None:
+        layout = _STRUCT_CACHE[decode_str] = struct.Struct(decode_str)
+    return layout
+
+
 def decode_udp_bytes_content(eth_udp_bin_data, start_, end_, decode_str):
     """
     Decode EHP info from pcap package
-    eth_udp_bin_data:UDP data in pcap
+    eth_udp_bin_data:UDP data in pcap, bytes or memoryview (read in place without copying)
     start_:The start position of binary content of UDP data
     end_:The end position of binary content of UDP data
     decode_str:The decoding string change c++ type to python style,PS:'<IIB'
     """
-    ehp_decode_info = struct.unpack(decode_str, eth_udp_bin_data[start_:end_])
-    return ehp_decode_info
+    layout = compiled_struct(decode_str)
+    if layout.size != end_ - start_:
+        raise struct.error("unpack requires a buffer of %d bytes" % layout.size)
+    return layout.unpack_from(eth_udp_bin_data, start_)
+
+
+def unpack_array(layout, eth_udp_bin_data, offset, count):
+    """
+    Decode `count` consecutive elements of one layout with a single iter_unpack call
+    layout:struct.Struct of one element
+    offset:The start position of the first element in UDP data
+    :return List of element tuples
+    """
+    if count <= 0:
+        return []
+    end = offset + count * layout.size
+    elements = memoryview(eth_udp_bin_data)[offset:end]
+    if len(elements) != end - offset:
+        raise struct.error("unpack requires a buffer of %d bytes" % (end - offset))
+    return list(layout.iter_unpack(elements))
+
+
+# struct 类型码 -> numpy 类型码, 均为小端
+_NUMPY_TYPES = {"B": "u1", "b": "i1", "?": "?", "H": "<u2", "h": "<i2", "I": "<u4", "L": "<u4",
+                "i": "<i4", "l": "<i4", "Q": "<u8", "q": "<i8", "f": "<f4", "d": "<f8"}
+_NUMPY_DTYPES = {}
+
+
+def numpy_dtype(layout, names=None):
+    """
+    :return numpy dtype of a little endian struct layout, structured with the
+    given field names, a plain dtype for a single unnamed field
+    """
+    key = (layout.format, names)
+    dtype = _NUMPY_DTYPES.get(key)
+    if dtype is None:
+        import numpy
+        codes = [_NUMPY_TYPES[code] for code in layout.format.lstrip("<")]
+        if names is None and len(codes) == 1:
+            dtype = numpy.dtype(codes[0])
+        else:
+            dtype = numpy.dtype(list(zip(names or ["f%d" % i for i in range(len(codes))], codes)))
+        _NUMPY_DTYPES[key] = dtype
+    return dtype
+
+
+def numpy_array(layout, eth_udp_bin_data, offset, count, names=None):
+    """
+    View `count` consecutive elements of one layout as a numpy array without
+    decoding them one by one. numpy is optional and only imported here.
+    :return numpy array, read only and sharing memory with the UDP data
+    """
+    import numpy
+    count = max(count, 0)
+    if offset + count * layout.size > len(eth_udp_bin_data):
+        raise struct.error("unpack requires a buffer of %d bytes" % (count * layout.size))
+    return numpy.frombuffer(eth_udp_bin_data, numpy_dtype(layout, names), count, offset)
+
+
+# ---- 声明式消息布局 ----
+# 每种 EHPSignal 消息的内容按顺序声明, 偏移量由前面各段的长度累加得到,
+# at= 标注的偏移量在导入时校验. 导入时为每种消息生成解码器:
+# 所有定长段合并为一个 struct.Struct, 一次 unpack_from 解出, 重复元素整段批量解码.
+
+
+class Fixed(object):
+    """
+    Fixed size part of a message
+    name:Segment name
+    layout:struct.Struct of the part
+    names:Field names of the layout
+    at:Expected offset in the UDP data, checked when the layout is compiled
+    """
+
+    def __init__(self, name, layout, names, at=None) -> None:
+        if len(names) != len(layout.unpack(bytes(layout.size))):
+            raise ValueError("%s: %d names for layout %s" % (name, len(names), layout.format))
+        self.name = name
+        self.layout = layout
+        self.names = tuple(names)
+        self.at = at
+
+
+class Padding(object):
+    """
+    Bytes that are skipped
+    """
+
+    def __init__(self, size, at=None) -> None:
+        self.size = size
+        self.at = at
+
+
+class Repeated(Fixed):
+    """
+    Repeated elements of one layout
+    count:Name of a fixed field holding the element count, an int for a constant
+    count, None for as many elements as the EHP length leaves after the offset
+    """
+
+    def __init__(self, name, layout, names, count=None, at=None) -> None:
+        super().__init__(name, layout, names, at)
+        self.count = count
+
+
+FIXED_HEAD = (
+    Fixed("ehp_head", EHP_HEAD, ("length", "counter", "data_id", "crc"), at=0),
+    Fixed("payload_timestamp", PAYLOAD_TIMESTAMP, ("reserve", "utc_valid", "utc_week", "utc_us", "systime"), at=12),
+    Fixed("payload_head", PAYLOAD_HEAD, ("part_count", "part_index", "bundle_id"), at=32),
+    Fixed("adasis_head", ADASIS_HEAD, ("reserved", "cyclic_counter", "message_type", "message_count"), at=40),
+)
+PROFILE = FIXED_HEAD + (
+    Fixed("profile_head", PROFILE_HEAD,
+          ("instance_id", "retransmission", "change", "confidence", "path_id", "lane_number",
+           "offset", "end_offset", "end_offset_final", "interpolation", "profile_type", "available"), at=44),
+)
+_POSITION_3D_NAMES = ("lat", "lon", "alt")
+_GLOBAL_BYTE_NAMES = ("data_type", "available", "value")
+_GLOBAL_INT_NAMES = ("data_type", "available", "value")
+_EHP_LENGTH = struct.Struct("<H")
+
+
+class MessageLayout(object):
+    """
+    Decoder generated from the segments of one message type.
+    fixed_size:Bytes of the fixed part, head:struct.Struct decoding all of it at once
+    fields:Segment name -> (start, stop) in the tuple decoded by head
+    fixed_segments:Fixed segment name -> (struct.Struct, offset)
+    repeated:Segment name -> (Repeated, offset)
+    columns:List of ("segment.field", offset, struct type code) of the fixed fields
+    """
+
+    def __init__(self, signal, *segments) -> None:
+        self.signal = signal
+        self.segments = segments
+        self.fields = {}
+        self.fixed_segments = {}
+        self.repeated = {}
+        # 字段名 -> head 解码结果中的位置, 同名字段取第一个
+        self.field_index = {}
+        # 字段名 -> (偏移量, 类型码), 同名字段取第一个
+        self._field_offsets = {}
+        # 重复段名 -> (计数字段在 head 结果中的位置, 计数字段的 Struct, 偏移量)
+        self._counts = {}
+        self.columns = []
+        self._dtype = None
+        formats = []
+        offset = 0
+        index = 0
+        variable = None
+        for segment in segments:
+            name = getattr(segment, "name", "padding")
+            if variable is not None:
+                raise ValueError("%s: %s follows %s of variable count" % (signal.name, name, variable))
+            if segment.at is not None and segment.at != offset:
+                raise ValueError("%s: %s declared at %d but laid out at %d" % (signal.name, name, segment.at, offset))
+            if isinstance(segment, Padding):
+                formats.append("%dx" % segment.size)
+                offset += segment.size
+            elif isinstance(segment, Repeated):
+                count = segment.count
+                if isinstance(count, str):
+                    if count not in self.field_index:
+                        raise ValueError("%s: unknown count field %s" % (signal.name, count))
+                    count_offset, code = self._field_offsets[count]
+                    self._counts[name] = (self.field_index[count], compiled_struct("<" + code), count_offset)
+                self.repeated[name] = (segment, offset)
+                if isinstance(count, int):
+                    offset += count * segment.layout.size
+                else:
+                    variable = name
+            else:
+                if self.repeated:
+                    raise ValueError("%s: fixed %s follows repeated elements" % (signal.name, name))
+                codes = segment.layout.format.lstrip("<")
+                formats.append(codes)
+                self.fields[name] = (index, index + len(segment.names))
+                self.fixed_segments[name] = (segment.layout, offset)
+                for position, field in enumerate(segment.names):
+                    # 格式串均为单字符类型码, 字段偏移量即前缀的长度
+                    field_offset = offset + struct.calcsize("<" + codes[:position])
+                    self.field_index.setdefault(field, index)
+                    self._field_offsets.setdefault(field, (field_offset, codes[position]))
+                    self.columns.append((name + "." + field, field_offset, codes[position]))
+                    index += 1
+                offset += segment.layout.size
+        self.head = struct.Struct("<" + "".join(formats))
+        self.fixed_size = self.head.size
+        # 常量个数的重复段之后的长度, 变长段不计
+        self.size = offset
+
+    def fixed(self, eth_udp_bin_data):
+        """
+        :return Flat tuple of all fixed fields, in declaration order
+        """
+        return self.head.unpack_from(eth_udp_bin_data, 0)
+
+    def count(self, eth_udp_bin_data, name, values=None):
+        """
+        values:Result of fixed() if already decoded
+        :return Number of elements of the repeated segment `name`
+        """
+        segment, offset = self.repeated[name]
+        if isinstance(segment.count, int):
+            return segment.count
+        if segment.count is None:
+            # EHP 长度不含 12 字节包头
+            length = values[0] if values is not None else _EHP_LENGTH.unpack_from(eth_udp_bin_data, 0)[0]
+            return (length + EHP_HEAD.size - offset) // segment.layout.size
+        index, count_layout, count_offset = self._counts[name]
+        if values is not None:
+            return values[index]
+        return count_layout.unpack_from(eth_udp_bin_data, count_offset)[0]
+
+    def elements(self, eth_udp_bin_data, name, values=None):
+        """
+        :return List of element tuples of the repeated segment `name`
+        """
+        segment, offset = self.repeated[name]
+        return unpack_array(segment.layout, eth_udp_bin_data, offset, self.count(eth_udp_bin_data, name, values))
+
+    def array(self, eth_udp_bin_data, name, values=None):
+        """
+        :return The repeated segment `name` as one numpy structured array, a plain
+        array for single field elements
+        """
+        segment, offset = self.repeated[name]
+        names = segment.names if len(segment.names) > 1 else None
+        return numpy_array(segment.layout, eth_udp_bin_data, offset, self.count(eth_udp_bin_data, name, values), names)
+
+    def head_dtype(self):
+        """
+        :return numpy structured dtype of the fixed part, fields named "segment.field"
+        """
+        if self._dtype is None:
+            import numpy
+            self._dtype = numpy.dtype({
+                "names": [column for column, _, _ in self.columns],
+                "formats": [_NUMPY_TYPES[code] for _, _, code in self.columns],
+                "offsets": [column_offset for _, column_offset, _ in self.columns],
+                "itemsize": self.fixed_size,
+            })
+        return self._dtype
+
+    def decode(self, eth_udp_bin_data):
+        """
+        :return Dict of segment name -> tuple of the fixed fields or list of element tuples
+        """
+        values = self.head.unpack_from(eth_udp_bin_data, 0)
+        message = {name: values[start:stop] for name, (start, stop) in self.fields.items()}
+        for name in self.repeated:
+            message[name] = self.elements(eth_udp_bin_data, name, values)
+        return message
+
+
+LAYOUTS = {}
+
+
+def register_layout(layout):
+    LAYOUTS[int(layout.signal)] = layout
+    return layout
+
+
+for _layout in (
+    MessageLayout(
+        EHPSignal.LOC, *FIXED_HEAD,
+        Fixed("relative_pos", LOCATION_RELATIVE_POS,
+              ("road_id", "lane_id", "lane_seq", "dis_left", "dis_right", "head_left", "head_right"), at=44),
+        Fixed("absolute_pos", LOCATION_ABSOLUTE_POS,
+              ("lon", "lat", "heading", "lon_std", "lat_std", "confidence", "x_acc", "y_acc", "z_acc",
+               "angular_velocity_x", "angular_velocity_y", "angular_velocity_z"), at=77),
+        Fixed("geofence", UINT8_PAIR, ("geofence_judge_status", "geofence_judge_type"), at=122),
+        Fixed("position_info", LOCATION_POSITION_INFO,
+              ("timestamp", "position_age", "path_id", "offset", "accuracy", "deviation", "speed",
+               "relative_heading", "probability", "current_lane", "prefer_path"), at=124),
+        Fixed("fail_safe", LOCATION_FAIL_SAFE,
+              ("loc_status", "gnss_status", "camera_status", "hdmap_status", "vehicle_status", "imu_status"), at=173),
+    ),
+    MessageLayout(
+        EHPSignal.GLOBAL_DATA, *FIXED_HEAD,
+        Fixed("drive_side", GLOBAL_BYTE_ATTRIBUTE, _GLOBAL_BYTE_NAMES, at=44),
+        Fixed("country_code", GLOBAL_INT_ATTRIBUTE, _GLOBAL_INT_NAMES, at=47),
+        Fixed("unit_system", GLOBAL_BYTE_ATTRIBUTE, _GLOBAL_BYTE_NAMES, at=53),
+        Fixed("protocol_version", GLOBAL_INT_ATTRIBUTE, _GLOBAL_INT_NAMES, at=56),
+        Fixed("hardware_version", GLOBAL_INT_ATTRIBUTE, _GLOBAL_INT_NAMES, at=62),
+        Fixed("map_version", GLOBAL_INT_ATTRIBUTE, _GLOBAL_INT_NAMES, at=68),
+        Fixed("map_age", GLOBAL_INT_ATTRIBUTE, _GLOBAL_INT_NAMES, at=74),
+        Fixed("map_provider", GLOBAL_INT_ATTRIBUTE, _GLOBAL_INT_NAMES, at=80),
+        Fixed("guidance", GLOBAL_BYTE_ATTRIBUTE, _GLOBAL_BYTE_NAMES, at=86),
+        Fixed("simulating", BOOL, ("value",), at=89),
+        Padding(1, at=90),
+        Fixed("region_code", UINT32, ("value",), at=91),
+    ),
+    MessageLayout(
+        EHPSignal.PATH_CONTROL, *FIXED_HEAD,
+        Fixed("path_control_head", PATH_CONTROL_HEAD, ("id_first", "id_last", "path_count", "is_reset"), at=44),
+        Repeated("paths", PATH_CONTROL_PATH, ("id", "parent_id", "path_offset"), at=54),
+    ),
+    MessageLayout(
+        EHPSignal.PROFILE_CONTROL, *FIXED_HEAD,
+        Repeated("paths", PROFILE_CONTROL_PATH, ("path_id", "path_offset"), at=44),
+    ),
+    MessageLayout(
+        EHPSignal.SWITCH_INFO, *FIXED_HEAD,
+        Fixed("navigation_info", NOA_NAVIGATION_INFO, ("navigation_status", "matching_status", "remain_distance"), at=44),
+        Fixed("switch_info", NOA_SWITCH_INFO,
+              ("switch_lane_direction", "switch_lane_reason", "switch_lane_distance",
+               "switch_lane_end_distance", "line_count"), at=50),
+        Repeated("line_ids", UINT32, ("line_id",), count="line_count", at=58),
+    ),
+    MessageLayout(
+        EHPSignal.ROUTE_LIST, *FIXED_HEAD,
+        Fixed("hd_info", NOA_HD_INFO, ("hdmap_version", "link_count"), at=44),
+        Repeated("links", UINT32, ("link_id",), count="link_count", at=50),
+    ),
+    MessageLayout(
+        EHPSignal.PROFILE_NODE, *PROFILE,
+        Fixed("node_count", UINT8, ("count",), at=71),
+        Repeated("nodes", NODE_POINT,
+                 ("sub_path", "probability", "turn_angle", "comp_int_sec", "right_of_way"), at=72),
+    ),
+    MessageLayout(
+        EHPSignal.LANE_MODEL, *PROFILE,
+        Fixed("lane_total", UINT8, ("count",), at=71),
+        Repeated("lanes", LANE_INFO,
+                 ("lane_number", "direction", "transit", "lane_type", "lane_app_type",
+                  "centerline", "left_bound", "right_bound"), at=72),
+    ),
+    MessageLayout(
+        EHPSignal.LANE_CONNECTIVITY, *PROFILE,
+        Fixed("lane_connectivity_count", UINT8, ("count",), at=71),
+        Repeated("connections", LANE_CONNECTION,
+                 ("init_lane_number", "init_path", "new_lane_number", "new_path", "to_link_id"),
+                 count="count", at=72),
+    ),
+    MessageLayout(
+        EHPSignal.LINEAR_OBJECTS, *PROFILE,
+        Fixed("linear_object_total", UINT8, ("count",), at=71),
+        Repeated("linear_objects", LINEAR_OBJECT,
+                 ("line_id", "line_type", "line_marking", "line_color", "line_bold"), at=72),
+    ),
+    MessageLayout(
+        EHPSignal.LANES_GEOMETRY, *PROFILE,
+        Fixed("geometry_info", LANES_GEOMETRY_INFO, ("geometry_count", "id_line", "curve_type", "point_count"), at=71),
+        Repeated("points", POSITION_3D, _POSITION_3D_NAMES, at=78),
+    ),
+    MessageLayout(
+        EHPSignal.CURVATURE, *PROFILE,
+        Fixed("curvature_count", UINT8, ("count",), at=71),
+        Repeated("points", CURVATURE_POINT, ("offset", "curvature"), count="count", at=72),
+    ),
+    MessageLayout(
+        EHPSignal.SLOPE, *PROFILE,
+        Fixed("slope_count", UINT8, ("count",), at=71),
+        Repeated("points", SLOPE_POINT, ("slope_offset", "slope", "cross_slope"), at=72),
+    ),
+    MessageLayout(
+        EHPSignal.EFFECTIVE_SPEED_LIMIT, *PROFILE,
+        Fixed("speed_limit", SPEED_LIMIT, ("speed_high", "speed_low", "speed_unit"), at=71),
+    ),
+    MessageLayout(
+        EHPSignal.ROAD_GEOMETRY, *PROFILE,
+        Fixed("road_geo_count", UINT8, ("count",), at=71),
+        Repeated("points", POSITION_3D, _POSITION_3D_NAMES, at=72),
+    ),
+    MessageLayout(
+        EHPSignal.NUMBER_OF_LANES_DRIVING_DIRECTION, *PROFILE,
+        Fixed("number_of_lanes", UINT8, ("value",), at=71),
+    ),
+    MessageLayout(
+        EHPSignal.LINK_IDENTIFIER, *PROFILE,
+        Fixed("link_identifier", UINT64, ("link_id",), at=71),
+    ),
+    MessageLayout(
+        EHPSignal.FUNCTIONAL_ROAD_CLASS, *PROFILE,
+        Fixed("functional_road_class", UINT8, ("value",), at=71),
+    ),
+    MessageLayout(
+        EHPSignal.FORM_OF_WAY, *PROFILE,
+        Fixed("form_of_way", UINT8, ("value",), at=71),
+    ),
+    MessageLayout(
+        EHPSignal.TUNNEL, *PROFILE,
+        Fixed("tunnel", BOOL, ("is_tunnel",), at=71),
+    ),
+    MessageLayout(
+        EHPSignal.LANE_WIDTH, *PROFILE,
+        Fixed("lane_width", LANE_WIDTH, ("min_width", "max_width"), at=71),
+    ),
+    MessageLayout(
+        EHPSignal.GEOFENCE, *PROFILE,
+        Fixed("geo_fence_count", UINT8, ("count",), at=71),
+        Repeated("fences", GEO_FENCE, ("geo_fence_type", "geo_fence_seq", "geo_fence_offset", "geo_fence_end_offset"),
+                 count="count", at=72),
+    ),
+    MessageLayout(
+        EHPSignal.MERGE_POINT, *PROFILE,
+        Fixed("merge_point_count", UINT8, ("count",), at=71),
+        Repeated("points", MERGE_POINT, ("path_id", "offset", "is_master"), at=72),
+    ),
+    MessageLayout(
+        EHPSignal.TRAFFIC_SIGN, *PROFILE,
+        Fixed("traffic_sign_type", UINT8_PAIR, ("type", "shape"), at=71),
+        Repeated("bounding_box", POSITION_3D, _POSITION_3D_NAMES, count=9, at=73),
+    ),
+    MessageLayout(
+        EHPSignal.GANTRY, *PROFILE,
+        Repeated("points", POSITION_3D, _POSITION_3D_NAMES, at=71),
+    ),
+    MessageLayout(
+        EHPSignal.POLE, *PROFILE,
+        Fixed("pole_type", UINT8, ("type",), at=71),
+        # 中心点及 8 个包围盒顶点
+        Repeated("bounding_box", POSITION_3D, _POSITION_3D_NAMES, count=9, at=72),
+    ),
+    MessageLayout(
+        EHPSignal.GROUND_ARROW, *PROFILE,
+        Repeated("points", POSITION_3D, _POSITION_3D_NAMES, at=71),
+    ),
+    MessageLayout(
+        EHPSignal.GROUND_TEXT, *PROFILE,
+        Repeated("points", POSITION_3D, _POSITION_3D_NAMES, at=71),
+    ),
+    MessageLayout(
+        EHPSignal.TOLLGATE, *PROFILE,
+        Fixed("tollgate", BOOL, ("is_tollgate",), at=71),
+    ),
+    MessageLayout(
+        EHPSignal.DYNAMIC_INFO_EVENT, *PROFILE,
+        Fixed("event_info", EVENT_INFO, ("sub_type", "traffic_speed", "jam_level"), at=71),
+        Fixed("start_position", EVENT_POSITION, ("offset", "lat", "lon"), at=75),
+        Fixed("end_position", EVENT_POSITION, ("offset", "lat", "lon"), at=87),
+    ),
+    MessageLayout(
+        EHPSignal.DYNAMIC_INFO_METEOROLOGY, *PROFILE,
+        Fixed("meteorology_info", METEOROLOGY_INFO, ("precipitation", "wind_direction", "wind_scale", "weather"), at=71),
+    ),
+    MessageLayout(
+        EHPSignal.DYNAMIC_INFO_EMERGENCY, *PROFILE,
+        Fixed("emergency_count", UINT8, ("count",), at=71),
+        Repeated("events", UINT32, ("event_id",), count="count", at=72),
+    ),
+):
+    register_layout(_layout)
+del _layout
+
+
+def fixed_reader(signal, name):
+    """
+    Decoder of one fixed segment at the offset given by its layout, the accessor
+    classes below read their fixed fields through it and hold no offsets of their own
+    signal:EHPSignal of the message
+    name:Segment name
+    :return Function of the UDP data returning the tuple of the segment fields
+    """
+    layout, offset = LAYOUTS[int(signal)].fixed_segments[name]
+    # 偏移量折算为前导填充字节, 读取时不再传偏移量参数, 与直接 unpack_from 一样快
+    return compiled_struct("<%dx%s" % (offset, layout.format.lstrip("<"))).unpack_from
 
 
 class EhpHead(object):
     # Ehp package head
+    __slots__ = ("eth_udp", "_ehp_head_raw", "_ehp_head")
+    # 各消息的包头相同, 包头读取函数取任一消息的布局
+    _read_ehp_head = fixed_reader(EHPSignal.LOC, "ehp_head")
+
     def __init__(self, udp_data) -> None:
         self.eth_udp = udp_data
+        # 各级包头在首次访问时解码一次, 之后直接返回
+        # 子类直接初始化全部槽位, 不逐级调用 super().__init__, 每个报文都会实例化
+        self._ehp_head_raw = None
+        self._ehp_head = None
 
     def ehp_head(self):
         """
@@ -76,21 +592,44 @@ class EhpHead(object):
         Data ID: 4 bytes,value is payload length.
         CRC: 4 bytes
         """
-        (
-            ehp_package_length,
-            ehp_package_counter,
-            ehp_package_data_id,
-            ehp_package_crc,
-        ) = decode_udp_bytes_content(self.eth_udp, 0, 12, "<HHII")
-        return (
-            ehp_package_length,
-            ehp_package_counter,
-            hex(ehp_package_data_id),
-            ehp_package_crc,
-        )
+        if self._ehp_head is None:
+            (
+                ehp_package_length,
+                ehp_package_counter,
+                ehp_package_data_id,
+                ehp_package_crc,
+            ) = self.ehp_head_raw()
+            self._ehp_head = (
+                ehp_package_length,
+                ehp_package_counter,
+                hex(ehp_package_data_id),
+                ehp_package_crc,
+            )
+        return self._ehp_head
+
+    def ehp_head_raw(self):
+        """
+        Same as ehp_head with the Data ID as int
+        """
+        if self._ehp_head_raw is None:
+            self._ehp_head_raw = self._read_ehp_head(self.eth_udp)
+        return self._ehp_head_raw
+
+    def data_id(self):
+        return self.ehp_head_raw()[2]
 
 
 class Payload(EhpHead):
+    __slots__ = ("_ts_info", "_payload_head")
+    _read_payload_timestamp = fixed_reader(EHPSignal.LOC, "payload_timestamp")
+    _read_payload_head = fixed_reader(EHPSignal.LOC, "payload_head")
+
+    def __init__(self, udp_data) -> None:
+        self.eth_udp = udp_data
+        self._ehp_head_raw = None
+        self._ehp_head = None
+        self._ts_info = None
+        self._payload_head = None
 
     # Timestamp info of payload
 
@@ -99,20 +638,22 @@ class Payload(EhpHead):
         Timestamp length is 20 bytes :
         timestamp:20 bytes
         """
-        (
-            ehp_pl_ts_reserve,
-            ehp_pl_ts_utc_valid,
-            ehp_pl_ts_utc_week,
-            ehp_pl_ts_utc_us,
-            ehp_pl_ts_utc_systime,
-        ) = decode_udp_bytes_content(self.eth_udp, 12, 32, "<BBHQQ")
-        return (
-            ehp_pl_ts_reserve,
-            ehp_pl_ts_utc_valid,
-            ehp_pl_ts_utc_week,
-            ehp_pl_ts_utc_us,
-            ehp_pl_ts_utc_systime,
-        )
+        if self._ts_info is None:
+            (
+                ehp_pl_ts_reserve,
+                ehp_pl_ts_utc_valid,
+                ehp_pl_ts_utc_week,
+                ehp_pl_ts_utc_us,
+                ehp_pl_ts_utc_systime,
+            ) = self._read_payload_timestamp(self.eth_udp)
+            self._ts_info = (
+                ehp_pl_ts_reserve,
+                ehp_pl_ts_utc_valid,
+                ehp_pl_ts_utc_week,
+                ehp_pl_ts_utc_us,
+                ehp_pl_ts_utc_systime,
+            )
+        return self._ts_info
 
     # Payload head
 
@@ -123,45 +664,64 @@ class Payload(EhpHead):
         partIndex: 2 bytes
         bundleId: 4 bytes
         """
-        (
-            ehp_pl_head_partcount,
-            ehp_pl_head_partIndex,
-            ehp_pl_head_bundleId,
-        ) = decode_udp_bytes_content(self.eth_udp, 32, 40, "<HHI")
-        return ehp_pl_head_partcount, ehp_pl_head_partIndex, ehp_pl_head_bundleId
+        if self._payload_head is None:
+            (
+                ehp_pl_head_partcount,
+                ehp_pl_head_partIndex,
+                ehp_pl_head_bundleId,
+            ) = self._read_payload_head(self.eth_udp)
+            self._payload_head = ehp_pl_head_partcount, ehp_pl_head_partIndex, ehp_pl_head_bundleId
+        return self._payload_head
 
 
 class AdasisV3(Payload):
+    __slots__ = ("_adasis_head",)
+    _read_adasis_head = fixed_reader(EHPSignal.LOC, "adasis_head")
+
+    def __init__(self, udp_data) -> None:
+        self.eth_udp = udp_data
+        self._ehp_head_raw = None
+        self._ehp_head = None
+        self._ts_info = None
+        self._payload_head = None
+        self._adasis_head = None
 
     # Adasis v3 head
 
-    def pay_load_adasis_head(self, eth_udp_bin_data):
+    def pay_load_adasis_head(self, eth_udp_bin_data=None):
         """
         ADAS V3 head length is 4 bytes:
         reserved: 1 byte
         cycliccounter: 1 byte
         messageType: 1 byte
         messageCount: 1 byte
+        eth_udp_bin_data:UDP data to decode, the own payload if None
         """
-        (
-            ehp_adasis_head_reserve,
-            ehp_adasis_head_cyc_counter,
-            ehp_adasis_head_msg_type,
-            ehp_adasis_head_msg_count,
-        ) = decode_udp_bytes_content(eth_udp_bin_data, 40, 44, "<BBBB")
-        return (
-            ehp_adasis_head_reserve,
-            ehp_adasis_head_cyc_counter,
-            ehp_adasis_head_msg_type,
-            ehp_adasis_head_msg_count,
-        )
+        if eth_udp_bin_data is not None and eth_udp_bin_data is not self.eth_udp:
+            return self._read_adasis_head(eth_udp_bin_data)
+        if self._adasis_head is None:
+            (
+                ehp_adasis_head_reserve,
+                ehp_adasis_head_cyc_counter,
+                ehp_adasis_head_msg_type,
+                ehp_adasis_head_msg_count,
+            ) = self._read_adasis_head(self.eth_udp)
+            self._adasis_head = (
+                ehp_adasis_head_reserve,
+                ehp_adasis_head_cyc_counter,
+                ehp_adasis_head_msg_type,
+                ehp_adasis_head_msg_count,
+            )
+        return self._adasis_head
 
 
 class NOASwitchInfo(AdasisV3):
+    __slots__ = ()
+    _read_navigation_info = fixed_reader(EHPSignal.SWITCH_INFO, "navigation_info")
+    _read_switch_info = fixed_reader(EHPSignal.SWITCH_INFO, "switch_info")
+
     def navigation_info(self):
-        navigation_status, matching_status, remain_distance = decode_udp_bytes_content(
-            self.eth_udp, 44, 50, "<BBI"
-        )
+        navigation_status, matching_status, remain_distance = self._read_navigation_info(self.eth_udp)
         return navigation_status, matching_status, remain_distance
 
     def switch_info(self):
@@ -171,7 +731,7 @@ class NOASwitchInfo(AdasisV3):
             switch_lane_distance,
             switch_lane_end_distance,
             line_count,
-        ) = decode_udp_bytes_content(self.eth_udp, 50, 58, "<BBHHH")
+        ) = self._read_switch_info(self.eth_udp)
         return (
             switch_lane_direction,
             switch_lane_reason,
@@ -181,39 +741,35 @@ class NOASwitchInfo(AdasisV3):
         )
 
     def linear_object_id(self):
-        *_, line_count = self.switch_info()
-        line_list = list()
-        if line_count:
-            for line_ in range(0, line_count):
-                line_list.append(
-                    decode_udp_bytes_content(
-                        self.eth_udp, 58 + line_ * 4, 58 + (line_ + 1) * 4, "<I"
-                    )[0]
-                )
-        return line_list
+        return [line_id for line_id, in LAYOUTS[EHPSignal.SWITCH_INFO].elements(self.eth_udp, "line_ids")]
 
 
 class NOARouteList(AdasisV3):
+    __slots__ = ()
+    _read_hd_info = fixed_reader(EHPSignal.ROUTE_LIST, "hd_info")
+
     def nav_hd_info(self):
-        hdmap_version, link_count = decode_udp_bytes_content(
-            self.eth_udp, 44, 50, "<IH"
-        )
+        hdmap_version, link_count = self._read_hd_info(self.eth_udp)
         return hdmap_version, link_count
 
     def nav_link_list(self):
-        _, link_total = self.nav_hd_info()
-        links_list = list()
+        return [link_ for link_, in LAYOUTS[EHPSignal.ROUTE_LIST].elements(self.eth_udp, "links")]
 
-        for elem in range(0, link_total):
-            link_ = decode_udp_bytes_content(
-                self.eth_udp, 50 + elem * 4, 50 + (elem + 1) * 4, "<I"
-            )[0]
-            links_list.append(link_)
-        return links_list
+    def nav_link_array(self):
+        """
+        Same as nav_link_list as one numpy uint32 array
+        """
+        return LAYOUTS[EHPSignal.ROUTE_LIST].array(self.eth_udp, "links")
 
 
 class Location(AdasisV3):
     # If DataId is 0x03000001,msg is location info.
+    __slots__ = ()
+    _read_relative_pos = fixed_reader(EHPSignal.LOC, "relative_pos")
+    _read_absolute_pos = fixed_reader(EHPSignal.LOC, "absolute_pos")
+    _read_geofence = fixed_reader(EHPSignal.LOC, "geofence")
+    _read_position_info = fixed_reader(EHPSignal.LOC, "position_info")
+    _read_fail_safe = fixed_reader(EHPSignal.LOC, "fail_safe")
 
     def location_relative_pos(self):
         """
@@ -234,7 +790,7 @@ class Location(AdasisV3):
             ehp_loc_relapos_disright,
             ehp_loc_relapos_headleft,
             ehp_loc_relapos_headright,
-        ) = decode_udp_bytes_content(self.eth_udp, 44, 77, "<QQBLLff")
+        ) = self._read_relative_pos(self.eth_udp)
         return (
             ehp_loc_relapos_roadid,
             ehp_loc_relapos_laneid,
@@ -263,7 +819,7 @@ class Location(AdasisV3):
             ehp_loc_absopos_angular_velocity_x,
             ehp_loc_absopos_angular_velocity_y,
             ehp_loc_absopos_angular_velocity_z,
-        ) = decode_udp_bytes_content(self.eth_udp, 77, 122, "<llfffBffffff")
+        ) = self._read_absolute_pos(self.eth_udp)
         return (
             ehp_loc_absopos_lon,
             ehp_loc_absopos_lat,
@@ -289,7 +845,7 @@ class Location(AdasisV3):
         (
             ehp_loc_geofennce_judge_status,
             ehp_loc_geofence_judge_type,
-        ) = decode_udp_bytes_content(self.eth_udp, 122, 124, "<BB")
+        ) = self._read_geofence(self.eth_udp)
         return ehp_loc_geofennce_judge_status, ehp_loc_geofence_judge_type
 
     def location_position_info(self):
@@ -320,7 +876,7 @@ class Location(AdasisV3):
             ehp_loc_position_probability,
             ehp_loc_position_currentLane,
             ehp_loc_position_preferpath,
-        ) = decode_udp_bytes_content(self.eth_udp, 124, 173, "<QQIIIlfffBI")
+        ) = self._read_position_info(self.eth_udp)
         return (
             ehp_loc_position_timestamp,
             ehp_loc_position_positionage,
@@ -352,7 +908,7 @@ class Location(AdasisV3):
             ehp_loc_failsafe_hdmap_status,
             ehp_loc_failsafe_vehcle_status,
             ehp_loc_failsafe_imu_status,
-        ) = decode_udp_bytes_content(self.eth_udp, 173, 179, "<BBBBBB")
+        ) = self._read_fail_safe(self.eth_udp)
         return (
             ehp_loc_failsafe_loc_status,
             ehp_loc_failsafe_gnss_status,
@@ -432,70 +988,68 @@ class GlobalData(AdasisV3):
     TOLLGATE=62,
     """
 
+    __slots__ = ()
+    _read_drive_side = fixed_reader(EHPSignal.GLOBAL_DATA, "drive_side")
+    _read_country_code = fixed_reader(EHPSignal.GLOBAL_DATA, "country_code")
+    _read_unit_system = fixed_reader(EHPSignal.GLOBAL_DATA, "unit_system")
+    _read_protocol_version = fixed_reader(EHPSignal.GLOBAL_DATA, "protocol_version")
+    _read_hardware_version = fixed_reader(EHPSignal.GLOBAL_DATA, "hardware_version")
+    _read_map_version = fixed_reader(EHPSignal.GLOBAL_DATA, "map_version")
+    _read_map_age = fixed_reader(EHPSignal.GLOBAL_DATA, "map_age")
+    _read_map_provider = fixed_reader(EHPSignal.GLOBAL_DATA, "map_provider")
+    _read_guidance = fixed_reader(EHPSignal.GLOBAL_DATA, "guidance")
+    _read_simulating = fixed_reader(EHPSignal.GLOBAL_DATA, "simulating")
+    _read_region_code = fixed_reader(EHPSignal.GLOBAL_DATA, "region_code")
+
     def global_drive_side(self):
-        data_type, is_avialable, dirve_side = decode_udp_bytes_content(
-            self.eth_udp, 44, 47, "<B?B"
-        )
+        data_type, is_avialable, dirve_side = self._read_drive_side(self.eth_udp)
         return data_type, is_avialable, dirve_side
 
     def global_country_code(self):
-        data_type, is_avialable, country_code = decode_udp_bytes_content(
-            self.eth_udp, 47, 53, "<B?I"
-        )
+        data_type, is_avialable, country_code = self._read_country_code(self.eth_udp)
         return data_type, is_avialable, country_code
 
     def global_unit_system(self):
-        data_type, is_avialable, unit_system = decode_udp_bytes_content(
-            self.eth_udp, 53, 56, "<B?B"
-        )
+        data_type, is_avialable, unit_system = self._read_unit_system(self.eth_udp)
         return data_type, is_avialable, unit_system
 
     def global_protocol_version(self):
-        data_type, is_avialable, protocol_version = decode_udp_bytes_content(
-            self.eth_udp, 56, 62, "<B?I"
-        )
+        data_type, is_avialable, protocol_version = self._read_protocol_version(self.eth_udp)
         return data_type, is_avialable, protocol_version
 
     def global_hardware_version(self):
-        data_type, is_avialable, hardware_version = decode_udp_bytes_content(
-            self.eth_udp, 62, 68, "<B?I"
-        )
+        data_type, is_avialable, hardware_version = self._read_hardware_version(self.eth_udp)
         return data_type, is_avialable, hardware_version
 
     def global_map_version(self):
-        data_type, is_avialable, map_version = decode_udp_bytes_content(
-            self.eth_udp, 68, 74, "<B?I"
-        )
+        data_type, is_avialable, map_version = self._read_map_version(self.eth_udp)
         return data_type, is_avialable, map_version
 
     def global_map_age(self):
-        data_type, is_avialable, map_age = decode_udp_bytes_content(
-            self.eth_udp, 74, 80, "<B?I"
-        )
+        data_type, is_avialable, map_age = self._read_map_age(self.eth_udp)
         return data_type, is_avialable, map_age
 
     def global_map_provider(self):
-        data_type, is_avialable, map_provider = decode_udp_bytes_content(
-            self.eth_udp, 80, 86, "<B?I"
-        )
+        data_type, is_avialable, map_provider = self._read_map_provider(self.eth_udp)
         return data_type, is_avialable, map_provider
 
     def global_guidance(self):
-        data_type, is_avialable, guidance = decode_udp_bytes_content(
-            self.eth_udp, 86, 89, "<B?B"
-        )
+        data_type, is_avialable, guidance = self._read_guidance(self.eth_udp)
         return data_type, is_avialable, guidance
 
     def global_simulating(self):
-        simulating = decode_udp_bytes_content(self.eth_udp, 89, 90, "<?")
+        simulating = self._read_simulating(self.eth_udp)
         return simulating
 
     def global_regioncode(self):
-        citycode=decode_udp_bytes_content(self.eth_udp, 91, 95, "<I")
+        citycode=self._read_region_code(self.eth_udp)
         return citycode
 
 
 class PathControl(AdasisV3):
+    __slots__ = ()
+    _read_path_control_head = fixed_reader(EHPSignal.PATH_CONTROL, "path_control_head")
+
     def path_control_head(self):
         """
         Path sequence info in PathControl info length is 10 bytes:
@@ -509,7 +1063,7 @@ class PathControl(AdasisV3):
             ehp_path_ctrl_id_last,
             ehp_path_ctrl_path_count,
             ehp_path_ctrl_is_reset,
-        ) = decode_udp_bytes_content(self.eth_udp, 44, 54, "<IIBB")
+        ) = self._read_path_control_head(self.eth_udp)
         return (
             ehp_path_ctrl_id_first,
             ehp_path_ctrl_id_last,
@@ -525,31 +1079,12 @@ class PathControl(AdasisV3):
             offset:4 bytes
         Every pathControl udp package maybe 1 or more path info.The length is all path info.
         """
-        length_, _, _, _ = self.ehp_head()
-        all_path = ((length_ + 12) - 54) / 12
-        path_info = list()
-        for elem in range(0, int(all_path)):
-            (
-                ehp_path_ctrl_id_x,
-                ehp_path_ctrl_parent_id_x,
-                ehp_path_ctrl_path_offset_x,
-            ) = decode_udp_bytes_content(
-                self.eth_udp,
-                54 + (elem * 12),
-                54 + (elem + 1) * 12,
-                "<III",  # From 54 bytes to 54+12
-            )
-            path_info.append(
-                (
-                    ehp_path_ctrl_id_x,
-                    ehp_path_ctrl_parent_id_x,
-                    ehp_path_ctrl_path_offset_x,
-                )
-            )
-        return path_info
+        return LAYOUTS[EHPSignal.PATH_CONTROL].elements(self.eth_udp, "paths")
 
 
 class ProfileControl(AdasisV3):
+    __slots__ = ()
+
     def profile_control_path(self):
         """
         Path info in profileControl length is 8 bytes:
@@ -557,19 +1092,22 @@ class ProfileControl(AdasisV3):
             pathOffS:4 bytes
         Every profileControl maybe 1 or more path info.
         """
-        length_, _, _, _ = self.ehp_head()
-        all_path = ((length_ + 12) - 44) / 8
-        path_list = list()
-        if all_path != 0:
-            for elem in range(0, int(all_path)):
-                path_id, path_offset = decode_udp_bytes_content(
-                    self.eth_udp, 44 + elem * 8, 44 + ((elem + 1) * 8), "<II"
-                )
-                path_list.append((path_id, path_offset))
-        return path_list
+        return LAYOUTS[EHPSignal.PROFILE_CONTROL].elements(self.eth_udp, "paths")
 
 
 class ProfileHead(AdasisV3):
+    __slots__ = ("_profile_head",)
+    _read_profile_head = fixed_reader(EHPSignal.PROFILE_NODE, "profile_head")
+
+    def __init__(self, udp_data) -> None:
+        self.eth_udp = udp_data
+        self._ehp_head_raw = None
+        self._ehp_head = None
+        self._ts_info = None
+        self._payload_head = None
+        self._adasis_head = None
+        self._profile_head = None
+
     def profile_head(self):
         """
         Profile head in profile length is 27 bytes:
@@ -586,100 +1124,102 @@ class ProfileHead(AdasisV3):
         type:1 byte
         available:1 byte
         """
-        (
-            instance_id,
-            retransmis,
-            change,
-            confidence,
-            path_id,
-            lane_number,
-            offset,
-            end_offset,
-            end_offset_final,
-            interpolat,
-            profile_type,
-            available,
-        ) = decode_udp_bytes_content(self.eth_udp, 44, 71, "<I?BfIBII?BB?")
-        return (
-            instance_id,
-            retransmis,
-            change,
-            confidence,
-            path_id,
-            lane_number,
-            offset,
-            end_offset,
-            end_offset_final,
-            interpolat,
-            profile_type,
-            available,
-        )
+        if self._profile_head is None:
+            (
+                instance_id,
+                retransmis,
+                change,
+                confidence,
+                path_id,
+                lane_number,
+                offset,
+                end_offset,
+                end_offset_final,
+                interpolat,
+                profile_type,
+                available,
+            ) = self._read_profile_head(self.eth_udp)
+            self._profile_head = (
+                instance_id,
+                retransmis,
+                change,
+                confidence,
+                path_id,
+                lane_number,
+                offset,
+                end_offset,
+                end_offset_final,
+                interpolat,
+                profile_type,
+                available,
+            )
+        return self._profile_head
 
 
 class ProfileCurvature(ProfileHead):
+    __slots__ = ()
+
     def profile_curvature(self):
         """
         Curvature info in profile every length is 8 bytes:
         offset:4 bytes
         curvature:4 bytes
         """
-        cur_count = decode_udp_bytes_content(self.eth_udp, 71, 72, "<B")[0]
-        cur_list = list()
-        if cur_count >= 1:
+        return [list(point) for point in LAYOUTS[EHPSignal.CURVATURE].elements(self.eth_udp, "points")]
 
-            for elem in range(0, cur_count):
-                offset, curvature = decode_udp_bytes_content(
-                    self.eth_udp, 72 + elem * 8, 72 + ((elem + 1) * 8), "<If"
-                )
-                cur_list.append([offset, curvature])
-        return cur_list
+    def profile_curvature_array(self):
+        """
+        Same as profile_curvature as one numpy structured array (offset, curvature)
+        """
+        return LAYOUTS[EHPSignal.CURVATURE].array(self.eth_udp, "points")
 
 
 class ProfileEffectiveSpeedLimit(ProfileHead):
+    __slots__ = ()
+    _read_speed_limit = fixed_reader(EHPSignal.EFFECTIVE_SPEED_LIMIT, "speed_limit")
+
     def speed_limit(self):
-        speed_high, speed_low, speed_unit = decode_udp_bytes_content(
-            self.eth_udp, 71, 74, "<BBB"
-        )
+        speed_high, speed_low, speed_unit = self._read_speed_limit(self.eth_udp)
         return speed_high, speed_low, speed_unit
 
 
 class ProfileFormOfWay(ProfileHead):
+    __slots__ = ()
+    _read_form_of_way = fixed_reader(EHPSignal.FORM_OF_WAY, "form_of_way")
+
     def link_form_way(self):
-        link_form_of_way = decode_udp_bytes_content(self.eth_udp, 71, 72, "<B")
+        link_form_of_way = self._read_form_of_way(self.eth_udp)
         return link_form_of_way
 
 
 class ProfileFunctionalRoadClass(ProfileHead):
+    __slots__ = ()
+    _read_functional_road_class = fixed_reader(EHPSignal.FUNCTIONAL_ROAD_CLASS, "functional_road_class")
+
     def link_fun_class(self):
-        fun_class = decode_udp_bytes_content(self.eth_udp, 71, 72, "<B")
+        fun_class = self._read_functional_road_class(self.eth_udp)
         return fun_class
 
 
 # Failed,1.24 version exclude
 class ProfileGantry(ProfileHead):
+    __slots__ = ()
+
 
     def gantry_info(self):
         """
         Decode gantry info
         :return: Gantry info list
         """
-        length_, _, _, _ = self.ehp_head()
-        gantry_all = ((length_ + 12) - 71) / 12
-        gantry_list = list()
-
-        for index_ in range(0, int(gantry_all)):
-            (
-                gantry_lat,
-                gantry_lon,
-                gantry_alt,
-            ) = decode_udp_bytes_content(self.eth_udp, 71 + (index_ * 12), 71 + (index_ + 1) * 12, "<iii")
-            gantry_list.append((gantry_lat, gantry_lon, gantry_alt))
-        return gantry_list
+        return LAYOUTS[EHPSignal.GANTRY].elements(self.eth_udp, "points")
 
 
 class ProfileGeoFence(ProfileHead):
+    __slots__ = ()
+    _read_geo_fence_count = fixed_reader(EHPSignal.GEOFENCE, "geo_fence_count")
+
     def geo_fence_count(self):
-        fence_count = decode_udp_bytes_content(self.eth_udp, 71, 72, "<B")[0]
+        fence_count = self._read_geo_fence_count(self.eth_udp)[0]
         # print("geoFenceCount:", fence_count)
         return fence_count
 
@@ -688,375 +1228,360 @@ class ProfileGeoFence(ProfileHead):
         # length_,_,_,_=self.ehp_head()
         # fence_all=((length_+12)-73)/4
         fence_all = self.geo_fence_count()
-        geo_fence_info = list()
         if fence_all > 0:
 
             # geo_fence_type,geo_fence_seq=decode_udp_bytes_content(self.eth_udp,72,74,'<Bb')
             # geo_fence_info.append(geo_fence_type,geo_fence_seq)
-            for elem in range(0, int(fence_all)):
-                (
-                    geo_fence_type,
-                    geo_fence_seq,
-                    geo_fence_offset,
-                    geo_fence_end_offset,
-                ) = decode_udp_bytes_content(
-                    self.eth_udp, 72 + (elem * 10), 72 + (elem + 1) * 10, "<BbII"
-                )
-                geo_fence_info.append(
-                    (
-                        geo_fence_type,
-                        geo_fence_seq,
-                        geo_fence_offset,
-                        geo_fence_end_offset,
-                    )
-                )
-            return geo_fence_info
+            return LAYOUTS[EHPSignal.GEOFENCE].elements(self.eth_udp, "fences")
 
 
 # 1.24 version exclude
 class ProfileGroundArrow(ProfileHead):
-    def ground_arrow_info(self):
-        length_, _, _, _ = self.ehp_head()
-        ground_arrow_all = ((length_ + 12) - 71) / 12
-        ground_arrow_list = list()
+    __slots__ = ()
 
-        for index_ in range(0, int(ground_arrow_all)):
-            (
-                gantry_lat,
-                gantry_lon,
-                gantry_alt,
-            ) = decode_udp_bytes_content(self.eth_udp, 71 + (index_ * 12), 71 + (index_ + 1) * 12, "<iii")
-            ground_arrow_list.append((gantry_lat, gantry_lon, gantry_alt))
-        return ground_arrow_list
+    def ground_arrow_info(self):
+        return LAYOUTS[EHPSignal.GROUND_ARROW].elements(self.eth_udp, "points")
 
 
 # 1.24 version exclude
 class ProfileGroundText(ProfileHead):
-    def ground_text_info(self):
-        length_, _, _, _ = self.ehp_head()
-        ground_text_all = ((length_ + 12) - 71) / 12
-        ground_text_list = list()
+    __slots__ = ()
 
-        for index_ in range(0, int(ground_text_all)):
-            (
-                gantry_lat,
-                gantry_lon,
-                gantry_alt,
-            ) = decode_udp_bytes_content(self.eth_udp, 71 + (index_ * 12), 71 + (index_ + 1) * 12, "<iii")
-            ground_text_list.append((gantry_lat, gantry_lon, gantry_alt))
-        return ground_text_list
+    def ground_text_info(self):
+        return LAYOUTS[EHPSignal.GROUND_TEXT].elements(self.eth_udp, "points")
 
 
 class ProfileLaneConnectivity(ProfileHead):
+    __slots__ = ()
+    _read_lane_connectivity_count = fixed_reader(EHPSignal.LANE_CONNECTIVITY, "lane_connectivity_count")
+
     def lane_connectivity_count(self):
-        lane_count = decode_udp_bytes_content(self.eth_udp, 71, 72, "<B")[0]
+        lane_count = self._read_lane_connectivity_count(self.eth_udp)[0]
         return lane_count
 
     def lane_connection_info(self):
-        lanes_info = list()
-        if self.lane_connectivity_count():
-            for lane_ in range(0, self.lane_connectivity_count()):
-                (
-                    init_lane_number,
-                    init_path,
-                    new_lane_number,
-                    new_path,
-                    to_link_id,
-                ) = decode_udp_bytes_content(
-                    self.eth_udp, 72 + lane_ * 14, 72 + ((lane_ + 1) * 14), "<BIBII"
-                )
-                lanes_info.append(
-                    (
-                        init_lane_number,
-                        init_path,
-                        new_lane_number,
-                        new_path,
-                        to_link_id,
-                    )
-                )
-        return lanes_info
+        return LAYOUTS[EHPSignal.LANE_CONNECTIVITY].elements(self.eth_udp, "connections")
 
 
 class ProfileLaneModel(ProfileHead):
+    __slots__ = ()
+    _read_lane_total = fixed_reader(EHPSignal.LANE_MODEL, "lane_total")
+
     def lane_total(self):
-        lane_count = decode_udp_bytes_content(self.eth_udp, 71, 72, "<B")
+        lane_count = self._read_lane_total(self.eth_udp)
         return lane_count
 
     def lane_infoes(self):
-        length_, _, _, _ = self.ehp_head()
-        lane_info_length = (length_ + 12) - 71
-        lane_all = lane_info_length / 23
-
-        lane_info_list = list()
-        for elem in range(0, int(lane_all)):
-            (
-                lane_number,
-                direction,
-                transit,
-                lane_type,
-                lane_app_type,
-                centeline,
-                left_bound,
-                right_bound,
-            ) = decode_udp_bytes_content(
-                self.eth_udp, 72 + (elem * 23), 72 + (elem + 1) * 23, "<BBBIIIII"
-            )
-            lane_info_list.append(
-                (
-                    lane_number,
-                    direction,
-                    transit,
-                    lane_type,
-                    lane_app_type,
-                    centeline,
-                    left_bound,
-                    right_bound,
-                )
-            )
-        return lane_info_list
+        return LAYOUTS[EHPSignal.LANE_MODEL].elements(self.eth_udp, "lanes")
 
 
 class ProfileLanesGeometry(ProfileHead):
+    __slots__ = ()
+    _read_geometry_info = fixed_reader(EHPSignal.LANES_GEOMETRY, "geometry_info")
+
     def get_geometry_info(self):
-        geometry_count, id_line, curve_type, point_count = decode_udp_bytes_content(
-            self.eth_udp, 71, 78, "<BIBB"
-        )
+        geometry_count, id_line, curve_type, point_count = self._read_geometry_info(self.eth_udp)
         return geometry_count, id_line, curve_type, point_count
 
     def get_geometry_contents(self):
-        length_, _, _, _ = self.ehp_head()
-        geo_info_length = (length_ + 12) - 77
-        geo_all = geo_info_length / 12
+        return LAYOUTS[EHPSignal.LANES_GEOMETRY].elements(self.eth_udp, "points")
 
-        geo_list = list()
-
-        for elem in range(0, int(geo_all)):
-            lat, lon, alt = decode_udp_bytes_content(
-                self.eth_udp, 78 + elem * 12, 78 + (elem + 1) * 12, "<iii"
-            )
-            geo_list.append((lat, lon, alt))
-        return geo_list
+    def get_geometry_contents_array(self):
+        """
+        Same as get_geometry_contents as one numpy structured array (lat, lon, alt)
+        """
+        return LAYOUTS[EHPSignal.LANES_GEOMETRY].array(self.eth_udp, "points")
 
 
 class ProfileLaneWidth(ProfileHead):
+    __slots__ = ()
+    _read_lane_width = fixed_reader(EHPSignal.LANE_WIDTH, "lane_width")
+
     def get_lane_width(self):
-        min_width, max_width = decode_udp_bytes_content(self.eth_udp, 71, 75, "<HH")
+        min_width, max_width = self._read_lane_width(self.eth_udp)
         return min_width, max_width
 
 
 class ProfileLinearObjects(ProfileHead):
+    __slots__ = ()
+    _read_linear_object_total = fixed_reader(EHPSignal.LINEAR_OBJECTS, "linear_object_total")
+
     def linear_object_total(self):
-        total_linear_object = decode_udp_bytes_content(self.eth_udp, 71, 72, "<B")[0]
+        total_linear_object = self._read_linear_object_total(self.eth_udp)[0]
         return total_linear_object
 
     def linear_object_info(self):
-        length_, _, _, _ = self.ehp_head()
-        linear_info_length = (length_ + 12) - 71
-        linear_all = linear_info_length / 8
-
-        line_info_list = list()
-        for elem in range(0, int(linear_all)):
-            (
-                line_id,
-                line_type,
-                line_marking,
-                line_color,
-                line_bold,
-            ) = decode_udp_bytes_content(
-                self.eth_udp, 72 + elem * 8, 72 + (elem + 1) * 8, "<IBBBB"
-            )
-            line_info_list.append(
-                (line_id, line_type, line_marking, line_color, line_bold)
-            )
-        return line_info_list
+        return LAYOUTS[EHPSignal.LINEAR_OBJECTS].elements(self.eth_udp, "linear_objects")
 
 
 class ProfileLinkIdentifier(ProfileHead):
+    __slots__ = ()
+    _read_link_identifier = fixed_reader(EHPSignal.LINK_IDENTIFIER, "link_identifier")
+
     def link_info(self):
-        link_id = decode_udp_bytes_content(self.eth_udp, 71, 79, "<Q")[0]
+        link_id = self._read_link_identifier(self.eth_udp)[0]
         return link_id
 
 
 class ProfileMergePoint(ProfileHead):
+    __slots__ = ()
+    _read_merge_point_count = fixed_reader(EHPSignal.MERGE_POINT, "merge_point_count")
+
     def merge_point_count(self):
-        point_count = decode_udp_bytes_content(self.eth_udp, 71, 72, "<B")[0]
+        point_count = self._read_merge_point_count(self.eth_udp)[0]
         return point_count
 
     def merge_point_info(self):
-        length_, *_ = self.ehp_head()
-        point_info_length = (length_ + 12) - 71
-        merge_point_all = point_info_length / 9
-
-        merge_point_list = list()
-
-        for elem in range(0, int(merge_point_all)):
-            path_id, offset, is_master = decode_udp_bytes_content(
-                self.eth_udp, 72 + elem * 9, 72 + (elem + 1) * 9, "<II?"
-            )
-            merge_point_list.append((path_id, offset, is_master))
-        return merge_point_list
+        return LAYOUTS[EHPSignal.MERGE_POINT].elements(self.eth_udp, "points")
 
 
 class ProfileNode(ProfileHead):
+    __slots__ = ()
+    _read_node_count = fixed_reader(EHPSignal.PROFILE_NODE, "node_count")
+
     def node_count(self):
-        nodes = decode_udp_bytes_content(self.eth_udp, 71, 72, "<B")
+        nodes = self._read_node_count(self.eth_udp)
         return nodes
 
     def node_info(self):
-        length_, _, _, _ = self.ehp_head()
-        node_info_length = (length_ + 12) - 71
-        node_point_all = node_info_length / 14
-
-        node_point_list = list()
-        for elem in range(0, int(node_point_all)):
-            (
-                sub_path,
-                probability,
-                turn_angle,
-                comp_int_sec,
-                right_of_way,
-            ) = decode_udp_bytes_content(
-                self.eth_udp, 72 + elem * 14, 72 + (elem + 1) * 14, "<Iff?B"
-            )
-            node_point_list.append((sub_path, probability, turn_angle, comp_int_sec, right_of_way))
-        return node_point_list
+        return LAYOUTS[EHPSignal.PROFILE_NODE].elements(self.eth_udp, "nodes")
 
 
 class ProfileNumberOfLanesDrivingDirection(ProfileHead):
+    __slots__ = ()
+    _read_number_of_lanes = fixed_reader(EHPSignal.NUMBER_OF_LANES_DRIVING_DIRECTION, "number_of_lanes")
+
     def number_of_lane(self):
-        number_ = decode_udp_bytes_content(self.eth_udp, 71, 72, "<B")[0]
+        number_ = self._read_number_of_lanes(self.eth_udp)[0]
         return number_
 
 
 # 1.24 version exclude
 class ProfilePole(ProfileHead):
+    __slots__ = ()
+    _read_pole_type = fixed_reader(EHPSignal.POLE, "pole_type")
+
     def pole_type(self):
-        pole_type = decode_udp_bytes_content(self.eth_udp, 71, 72, "<B")[0]
+        pole_type = self._read_pole_type(self.eth_udp)[0]
         return pole_type
 
     def pole_info(self):
-        pole_position = list()
-        for index_ in range(9):
-            # The pole coordinate list:center position and 8 bounding positions
-            pos_ = decode_udp_bytes_content(self.eth_udp, 72 + index_ * 12, 72 + (index_ + 1) * 12, "<iii")
-            pole_position.append(pos_)
-        return pole_position  # pole_bounding_box
+        # The pole coordinate list:center position and 8 bounding positions
+        return LAYOUTS[EHPSignal.POLE].elements(self.eth_udp, "bounding_box")
 
 
 class ProfileRoadGeometry(ProfileHead):
+    __slots__ = ()
+    _read_road_geo_count = fixed_reader(EHPSignal.ROAD_GEOMETRY, "road_geo_count")
+
     def road_geo_count(self):
-        geo_count = decode_udp_bytes_content(self.eth_udp, 71, 72, "<B")
+        geo_count = self._read_road_geo_count(self.eth_udp)
         return geo_count
 
     def road_geo_info(self):
-        length_, _, _, _ = self.ehp_head()
-        point_info_length = (length_ + 12) - 71
-        merge_point_all = point_info_length / 12
-
-        merge_point_list = list()
+        return LAYOUTS[EHPSignal.ROAD_GEOMETRY].elements(self.eth_udp, "points")
 
-        for elem in range(0, int(merge_point_all)):
-            road_geo_lat, road_geo_lon, road_geo_alt = decode_udp_bytes_content(
-                self.eth_udp, 72 + elem * 12, 72 + (elem + 1) * 12, "<iii"
-            )
-            merge_point_list.append((road_geo_lat, road_geo_lon, road_geo_alt))
-        return merge_point_list
+    def road_geo_info_array(self):
+        """
+        Same as road_geo_info as one numpy structured array (lat, lon, alt)
+        """
+        return LAYOUTS[EHPSignal.ROAD_GEOMETRY].array(self.eth_udp, "points")
 
 
 class ProfileSlope(ProfileHead):
+    __slots__ = ()
+    _read_slope_count = fixed_reader(EHPSignal.SLOPE, "slope_count")
+
     def slope_count(self):
-        slope_ = decode_udp_bytes_content(self.eth_udp, 71, 72, "<B")[0]
+        slope_ = self._read_slope_count(self.eth_udp)[0]
         return slope_
 
     def slope_info(self):
-        length_, _, _, _ = self.ehp_head()
-        slope_info_length = (length_ + 12) - 71
-        slope_all = slope_info_length / 12
-
-        slope_info_list = list()
-        for elem in range(0, int(slope_all)):
-            slope_offset, slope, cross_slope = decode_udp_bytes_content(
-                self.eth_udp, 72 + elem * 12, 72 + (elem + 1) * 12, "<Iff"
-            )
-            slope_info_list.append((slope_offset, slope, cross_slope))
-        return slope_info_list
+        return LAYOUTS[EHPSignal.SLOPE].elements(self.eth_udp, "points")
+
+    def slope_info_array(self):
+        """
+        Same as slope_info as one numpy structured array (slope_offset, slope, cross_slope)
+        """
+        return LAYOUTS[EHPSignal.SLOPE].array(self.eth_udp, "points")
 
 
 # 1.24 version exclude
 class ProfileTollgate(ProfileHead):
+    __slots__ = ()
+    _read_tollgate = fixed_reader(EHPSignal.TOLLGATE, "tollgate")
+
     def toll_gate(self):
-        toll_ = decode_udp_bytes_content(self.eth_udp, 71, 72, "<?")[0]
+        toll_ = self._read_tollgate(self.eth_udp)[0]
         return toll_
 
 
 # 1.24 version exclude ,failed
 class ProfileTrafficSign(ProfileHead):
+    __slots__ = ()
+    _read_traffic_sign_type = fixed_reader(EHPSignal.TRAFFIC_SIGN, "traffic_sign_type")
+
     def traffic_sign_type(self):
-        type_, sharp_ = decode_udp_bytes_content(self.eth_udp, 71, 73, "<BB")
+        type_, sharp_ = self._read_traffic_sign_type(self.eth_udp)
         return type_, sharp_
 
     def traffic_sign(self):
-        traffic_sign_pos = list()
-        for index_ in range(9):
-            (
-                traffic_sign_lat,
-                traffic_sign_lon,
-                traffic_sign_alt,
-                # traffic_sign_bounding_box,
-            ) = decode_udp_bytes_content(self.eth_udp, 73 + index_ * 12, 73 + (index_ + 1) * 12, "<iii")
-            traffic_sign_pos.append((traffic_sign_lat, traffic_sign_lon, traffic_sign_alt))
-        return traffic_sign_pos
+        # traffic_sign_bounding_box
+        return LAYOUTS[EHPSignal.TRAFFIC_SIGN].elements(self.eth_udp, "bounding_box")
 
 
 class ProfileTunnel(ProfileHead):
+    __slots__ = ()
+    _read_tunnel = fixed_reader(EHPSignal.TUNNEL, "tunnel")
+
     def tunnel_info(self):
-        is_tunnel = decode_udp_bytes_content(self.eth_udp, 71, 72, "<?")[0]
+        is_tunnel = self._read_tunnel(self.eth_udp)[0]
         return is_tunnel
 
 
 # Exclude
 class DynamicInfoEvent(ProfileHead):
+    __slots__ = ()
+    _read_event_info = fixed_reader(EHPSignal.DYNAMIC_INFO_EVENT, "event_info")
+    _read_start_position = fixed_reader(EHPSignal.DYNAMIC_INFO_EVENT, "start_position")
+    _read_end_position = fixed_reader(EHPSignal.DYNAMIC_INFO_EVENT, "end_position")
+
     def event_info(self):
-        sub_type, traffic_speed, jam_level = decode_udp_bytes_content(
-            self.eth_udp, 71, 75, "<HBB"
-        )
+        sub_type, traffic_speed, jam_level = self._read_event_info(self.eth_udp)
         return sub_type, traffic_speed, jam_level
 
     def start_2_offset(self):
-        start_offset, start_lat, start_lon = decode_udp_bytes_content(
-            self.eth_udp, 75, 87, "<Iii"
-        )
+        start_offset, start_lat, start_lon = self._read_start_position(self.eth_udp)
         return start_offset, start_lat, start_lon
 
     def end_2_offset(self):
-        end_offset, end_lat, end_lon = decode_udp_bytes_content(
-            self.eth_udp, 87, 99, "<Iii"
-        )
+        end_offset, end_lat, end_lon = self._read_end_position(self.eth_udp)
         return end_offset, end_lat, end_lon
 
 
 # Exclude
 class DynamicInfoMeteorology(ProfileHead):
+    __slots__ = ()
+    _read_meteorology_info = fixed_reader(EHPSignal.DYNAMIC_INFO_METEOROLOGY, "meteorology_info")
+
     def meteorology_info(self):
-        precipitation, wind_direction, wind_scale, weather = decode_udp_bytes_content(
-            self.eth_udp, 71, 78, "<IBBB"
-        )
+        precipitation, wind_direction, wind_scale, weather = self._read_meteorology_info(self.eth_udp)
         return precipitation, wind_direction, wind_scale, weather
 
 
 # Exclude
 class DynamicInfoEmergency(ProfileHead):
+    __slots__ = ()
+    _read_emergency_count = fixed_reader(EHPSignal.DYNAMIC_INFO_EMERGENCY, "emergency_count")
+
     def emergency_count(self):
-        total_count = decode_udp_bytes_content(self.eth_udp, 71, 72, "<B")
+        total_count = self._read_emergency_count(self.eth_udp)
         return total_count
 
     def emergency_info(self):
-        count_ = self.emergency_count()
+        return LAYOUTS[EHPSignal.DYNAMIC_INFO_EMERGENCY].elements(self.eth_udp, "events")
+
+
+# 数据 ID -> 解码类
+DECODERS = {
+    EHPSignal.LOC: Location,
+    EHPSignal.PATH_CONTROL: PathControl,
+    EHPSignal.GLOBAL_DATA: GlobalData,
+    EHPSignal.PROFILE_CONTROL: ProfileControl,
+    EHPSignal.PROFILE_NODE: ProfileNode,
+    EHPSignal.LANE_MODEL: ProfileLaneModel,
+    EHPSignal.LANE_CONNECTIVITY: ProfileLaneConnectivity,
+    EHPSignal.LINEAR_OBJECTS: ProfileLinearObjects,
+    EHPSignal.LANES_GEOMETRY: ProfileLanesGeometry,
+    EHPSignal.CURVATURE: ProfileCurvature,
+    EHPSignal.SLOPE: ProfileSlope,
+    EHPSignal.EFFECTIVE_SPEED_LIMIT: ProfileEffectiveSpeedLimit,
+    EHPSignal.ROAD_GEOMETRY: ProfileRoadGeometry,
+    EHPSignal.NUMBER_OF_LANES_DRIVING_DIRECTION: ProfileNumberOfLanesDrivingDirection,
+    EHPSignal.LINK_IDENTIFIER: ProfileLinkIdentifier,
+    EHPSignal.FUNCTIONAL_ROAD_CLASS: ProfileFunctionalRoadClass,
+    EHPSignal.FORM_OF_WAY: ProfileFormOfWay,
+    EHPSignal.TUNNEL: ProfileTunnel,
+    EHPSignal.LANE_WIDTH: ProfileLaneWidth,
+    EHPSignal.SWITCH_INFO: NOASwitchInfo,
+    EHPSignal.ROUTE_LIST: NOARouteList,
+    EHPSignal.GEOFENCE: ProfileGeoFence,
+    EHPSignal.MERGE_POINT: ProfileMergePoint,
+    EHPSignal.TRAFFIC_SIGN: ProfileTrafficSign,
+    EHPSignal.GANTRY: ProfileGantry,
+    EHPSignal.POLE: ProfilePole,
+    EHPSignal.GROUND_ARROW: ProfileGroundArrow,
+    EHPSignal.GROUND_TEXT: ProfileGroundText,
+    EHPSignal.TOLLGATE: ProfileTollgate,
+    EHPSignal.DYNAMIC_INFO_EVENT: DynamicInfoEvent,
+    EHPSignal.DYNAMIC_INFO_EMERGENCY: DynamicInfoEmergency,
+    EHPSignal.DYNAMIC_INFO_METEOROLOGY: DynamicInfoMeteorology,
+}
+
+
+# Data ID 的最高字节, 所有 EHP 报文均为 0x03
+EHP_DATA_ID_CLASS = 0x03
+
+
+def register_decoder(data_id, decoder):
+    """
+    Register or replace the decoder class of a data ID
+    """
+    DECODERS[int(data_id)] = decoder
 
-        emg_info_list = list()
-        for elem in range(0, count_):
-            emg_ = decode_udp_bytes_content(
-                self.eth_udp, 72 + elem * 4, 72 + (elem + 1) * 4, "<I"
-            )
-            emg_info_list.append(emg_)
-        return emg_info_list
+
+def is_ehp(eth_udp_bin_data):
+    """
+    :return True if the UDP data is an EHP message: the data ID is stored little
+    endian at offset 4 and its high byte is 0x03, whether or not it has a decoder
+    """
+    return len(eth_udp_bin_data) >= EHP_HEAD.size and eth_udp_bin_data[7] == EHP_DATA_ID_CLASS
+
+
+def ehp_data_id(eth_udp_bin_data):
+    """
+    :return Data ID of the EHP head as int, None if the UDP data is shorter than the head
+    """
+    if len(eth_udp_bin_data) < EHP_HEAD.size:
+        return None
+    return UINT32.unpack_from(eth_udp_bin_data, 4)[0]
+
+
+def decode(eth_udp_bin_data):
+    """
+    Decode a UDP payload with the decoder class of its data ID
+    :return Decoder object, None for unknown data IDs
+    """
+    decoder = DECODERS.get(ehp_data_id(eth_udp_bin_data))
+    if decoder is None:
+        return None
+    return decoder(eth_udp_bin_data)
+
+
+class SignalDispatcher(object):
+    """
+    Call the handlers subscribed to a data ID with the decoded message,
+    payloads of other data IDs are skipped after reading their ID.
+    """
+
+    def __init__(self) -> None:
+        self._handlers = {}
+
+    def subscribe(self, data_id, handler):
+        """
+        handler:Callable(message), message is the decoder object of the payload
+        """
+        self._handlers.setdefault(int(data_id), []).append(handler)
+
+    def dispatch(self, eth_udp_bin_data):
+        """
+        :return Decoder object if any handler was called, else None
+        """
+        data_id = ehp_data_id(eth_udp_bin_data)
+        handlers = self._handlers.get(data_id)
+        if handlers is None:
+            return None
+        message = DECODERS.get(data_id, EhpHead)(eth_udp_bin_data)
+        for handler in handlers:
+            handler(message)
+        return message
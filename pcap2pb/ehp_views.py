@@ -0,0 +1,176 @@
+from ehp_signal_matrix_struct import EHPSignal, compiled_struct, ehp_data_id
+
+"""
+Lazy message views.
+A view borrows the UDP payload (bytes, bytearray or a memoryview of the mapped
+capture) and decodes a named field only when it is read, no tuple or list is
+built for the fields that are not used. One view object can be re-bound to
+every packet of a capture, and detach() copies out only the fields to keep, so
+the payload is released as soon as the reader moves on.
+"""
+
+
+class Field(object):
+    """
+    One field of a view, decoded from the borrowed buffer on every access
+    decode_str:struct format of the field, PS:'<I'
+    offset:Start position in the UDP data
+    """
+
+    __slots__ = ("layout", "offset", "name")
+
+    def __init__(self, decode_str, offset) -> None:
+        self.layout = compiled_struct(decode_str)
+        self.offset = offset
+        self.name = None
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, view, owner=None):
+        if view is None:
+            return self
+        return self.layout.unpack_from(view.buffer, self.offset)[0]
+
+
+class MessageView(object):
+    """
+    EHP head, payload head and ADASIS head fields shared by all messages
+    """
+
+    __slots__ = ("buffer",)
+    # 字段名, 按声明顺序, 由 __init_subclass__ 收集
+    fields = ()
+
+    length = Field("<H", 0)
+    counter = Field("<H", 2)
+    data_id = Field("<I", 4)
+    crc = Field("<I", 8)
+    part_count = Field("<H", 32)
+    part_index = Field("<H", 34)
+    bundle_id = Field("<I", 36)
+    cyclic_counter = Field("<B", 41)
+    message_type = Field("<B", 42)
+    message_count = Field("<B", 43)
+
+    def __init__(self, buffer=None) -> None:
+        self.buffer = buffer
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        fields = []
+        for klass in reversed(cls.__mro__):
+            for name, value in vars(klass).items():
+                if isinstance(value, Field) and name not in fields:
+                    fields.append(name)
+        cls.fields = tuple(fields)
+
+    def bind(self, buffer):
+        """
+        Point the view at another payload, no new object per packet
+        :return self
+        """
+        self.buffer = buffer
+        return self
+
+    def detach(self, *names):
+        """
+        Copy the named fields out of the borrowed buffer
+        :return Tuple of the field values, all fields if no name is given
+        """
+        return tuple(getattr(self, name) for name in names or self.fields)
+
+
+MessageView.fields = tuple(name for name, value in vars(MessageView).items() if isinstance(value, Field))
+
+
+class ProfileHeadView(MessageView):
+    __slots__ = ()
+
+    instance_id = Field("<I", 44)
+    retransmission = Field("<?", 48)
+    change = Field("<B", 49)
+    confidence = Field("<f", 50)
+    path_id = Field("<I", 54)
+    lane_number = Field("<B", 58)
+    offset = Field("<I", 59)
+    end_offset = Field("<I", 63)
+    end_offset_final = Field("<?", 67)
+    interpolation = Field("<B", 68)
+    profile_type = Field("<B", 69)
+    available = Field("<?", 70)
+
+
+class FormOfWayView(ProfileHeadView):
+    __slots__ = ()
+
+    form_of_way = Field("<B", 71)
+
+
+class FunctionalRoadClassView(ProfileHeadView):
+    __slots__ = ()
+
+    functional_road_class = Field("<B", 71)
+
+
+class LinkIdentifierView(ProfileHeadView):
+    __slots__ = ()
+
+    link_id = Field("<Q", 71)
+
+
+class TunnelView(ProfileHeadView):
+    __slots__ = ()
+
+    is_tunnel = Field("<?", 71)
+
+
+class TollgateView(ProfileHeadView):
+    __slots__ = ()
+
+    is_tollgate = Field("<?", 71)
+
+
+class NumberOfLanesView(ProfileHeadView):
+    __slots__ = ()
+
+    number_of_lanes = Field("<B", 71)
+
+
+class EffectiveSpeedLimitView(ProfileHeadView):
+    __slots__ = ()
+
+    speed_high = Field("<B", 71)
+    speed_low = Field("<B", 72)
+    speed_unit = Field("<B", 73)
+
+
+class LaneWidthView(ProfileHeadView):
+    __slots__ = ()
+
+    min_width = Field("<H", 71)
+    max_width = Field("<H", 73)
+
+
+# 数据 ID -> 视图类
+VIEWS = {
+    EHPSignal.FORM_OF_WAY: FormOfWayView,
+    EHPSignal.FUNCTIONAL_ROAD_CLASS: FunctionalRoadClassView,
+    EHPSignal.LINK_IDENTIFIER: LinkIdentifierView,
+    EHPSignal.TUNNEL: TunnelView,
+    EHPSignal.TOLLGATE: TollgateView,
+    EHPSignal.NUMBER_OF_LANES_DRIVING_DIRECTION: NumberOfLanesView,
+    EHPSignal.EFFECTIVE_SPEED_LIMIT: EffectiveSpeedLimitView,
+    EHPSignal.LANE_WIDTH: LaneWidthView,
+}
+
+
+def view(eth_udp_bin_data):
+    """
+    :return View of the payload by its data ID, a plain MessageView for data IDs
+    without a view class, None if the payload has no EHP head
+    """
+    data_id = ehp_data_id(eth_udp_bin_data)
+    if data_id is None:
+        return None
+    return VIEWS.get(data_id, MessageView)(eth_udp_bin_data)
@@ -0,0 +1,87 @@
+import struct
+
+from ehp_signal_matrix_struct import is_ehp
+
+"""
+Continuous loop replay.
+The capture is replayed pass after pass, every pass has its timestamps
+shifted so it starts one average packet gap after the previous pass ended,
+and the replay clock runs on without a gap or a burst.
+"""
+
+# EHP 包头: length 2 bytes, counter 2 bytes, data id 4 bytes
+_EHP_COUNTER = struct.Struct("<H")
+_EHP_COUNTER_DATA_ID = struct.Struct("<HI")
+
+
+class LoopedPackets(object):
+    """
+    open_source:Callable(start_time=None, start_packet=None) returning a fresh
+    closable packet source, e.g. a MmapPcapReader
+    loops:Number of passes, 0 replays forever
+    rewrite_counter:Continue ehp_package_counter of every data ID across passes,
+    so downstream consumers never see a counter reset. Only EHP messages are
+    rewritten, the CRC field is not recomputed.
+    start_time/start_packet:Where the first pass starts, later passes start at
+    the beginning of the capture
+    """
+
+    def __init__(self, open_source, loops=0, rewrite_counter=False, start_time=None, start_packet=None) -> None:
+        self.open_source = open_source
+        self.loops = loops
+        self.rewrite_counter = rewrite_counter
+        self.start_time = start_time
+        self.start_packet = start_packet
+        self.passes = 0
+        self._source = None
+
+    def __iter__(self):
+        # 每个数据 ID 最后发出的计数, 及当前一轮需要加上的偏移
+        last_counters = {}
+        counter_deltas = {}
+        ts_offset = 0.0
+        pass_end = None
+        gap = 0.0
+        self.passes = 0
+        while not self.loops or self.passes < self.loops:
+            if self.passes == 0:
+                self._source = self.open_source(self.start_time, self.start_packet)
+            else:
+                self._source = self.open_source()
+            first_ts = last_ts = None
+            count = 0
+            for ts, dst_port, udp_data in self._source:
+                if first_ts is None:
+                    first_ts = ts
+                    if pass_end is not None:
+                        ts_offset = pass_end + gap - ts
+                last_ts = ts
+                count += 1
+                # 只改写 EHP 报文, 其余报文原样发出
+                if self.rewrite_counter and is_ehp(udp_data):
+                    counter, data_id = _EHP_COUNTER_DATA_ID.unpack_from(udp_data, 2)
+                    if self.passes:
+                        delta = counter_deltas.get(data_id)
+                        if delta is None:
+                            delta = (last_counters.get(data_id, counter - 1) + 1 - counter) & 0xFFFF
+                            counter_deltas[data_id] = delta
+                        if delta:
+                            counter = (counter + delta) & 0xFFFF
+                            udp_data = bytearray(udp_data)
+                            _EHP_COUNTER.pack_into(udp_data, 2, counter)
+                    last_counters[data_id] = counter
+                yield ts + ts_offset, dst_port, udp_data
+            self._source.close()
+            self._source = None
+            if first_ts is None:
+                return
+            self.passes += 1
+            counter_deltas = {}
+            # 两轮之间留出一个平均报文间隔
+            gap = (last_ts - first_ts) / (count - 1) if count > 1 else 0.0
+            pass_end = last_ts + ts_offset
+
+    def close(self):
+        if self._source is not None:
+            self._source.close()
+            self._source = None
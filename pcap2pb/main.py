@@ -1,19 +1,102 @@
 import os
 import sys
+import argparse
+import multiprocessing
 from pathlib import Path
 from ehp2hdmap import load_file
+from playback_control import CONTROL_PORT
+from replay_pipeline import PIPELINE_DEPTH
+from packet_filter import PacketFilter, parse_ports, parse_data_ids
+from multicast_routes import RoutingTable
 
 directory = Path(__file__).resolve().parent
 sys.path.append(str(directory.parent))
 
 if __name__ == '__main__':
-    import sys
-    if len(sys.argv) > 2:
-        pcap_path = sys.argv[1]
-        interval = float(sys.argv[2])
-        if os.path.isfile(pcap_path):
-            load_file(pcap_path ,interval)
+    # PyInstaller 单文件打包时, 工作进程需要在这里接管
+    multiprocessing.freeze_support()
+    parser = argparse.ArgumentParser(usage="./pcap_path [pcap_path ...] interval [options]")
+    parser.add_argument("pcap_path", nargs="+",
+                        help="captures to replay, several captures are merged by timestamp")
+    parser.add_argument("interval", type=float)
+    parser.add_argument("--pyshark", action="store_true",
+                        help="dissect the capture with tshark/pyshark instead of the built-in reader")
+    parser.add_argument("--index", action="store_true",
+                        help="replay through the <pcap_path>.idx sidecar, build it if missing")
+    parser.add_argument("--start-time", type=float,
+                        help="start at this many seconds after the first packet (uses the index)")
+    parser.add_argument("--start-packet", type=int,
+                        help="start at this packet number (uses the index)")
+    parser.add_argument("--batch-window", type=float, metavar="US",
+                        help="send datagrams due within this many microseconds together (sendmmsg)")
+    parser.add_argument("--control-port", type=int, default=CONTROL_PORT,
+                        help="local UDP port for speed/pause/resume/step/seek commands, 0 to disable")
+    parser.add_argument("--pipeline-depth", type=int, default=PIPELINE_DEPTH,
+                        help="packets read ahead by the reader thread, 0 to read in the sending thread")
+    parser.add_argument("--preload", action="store_true",
+                        help="load all payloads into memory first, then replay without touching the disk")
+    parser.add_argument("--loop", type=int, nargs="?", const=0, metavar="N",
+                        help="replay the capture N times back to back, forever if N is omitted or 0")
+    parser.add_argument("--rewrite-counter", action="store_true",
+                        help="keep the EHP head counter running across loops")
+    parser.add_argument("--ports", type=parse_ports, metavar="PORT[,PORT...]",
+                        help="only replay packets sent to these UDP dst ports")
+    parser.add_argument("--data-ids", type=parse_data_ids, metavar="ID[,ID...]",
+                        help="only replay EHP packets of these data IDs, EHPSignal names or numbers, e.g. LOC,LANE_MODEL")
+    parser.add_argument("--routes", metavar="ROUTES_JSON",
+                        help="multicast routing file mapping dst ports / data IDs to group, port and interface")
+    parser.add_argument("--concurrent", action="store_true",
+                        help="replay every capture as an independent stream on one asyncio event loop instead of "
+                             "merging; only --loop, --ports, --data-ids, --routes and --control-port apply")
+    parser.add_argument("--workers", type=int, metavar="N",
+                        help="replay in N worker processes sharing one clock, packets split by --shard-by; "
+                             "only --routes and --control-port apply")
+    parser.add_argument("--shard-by", choices=("port", "data_id"), default="port",
+                        help="how packets are split across --workers")
+    args = parser.parse_args()
+    if args.workers:
+        # 多进程回放只支持共享时钟, 路由和 speed/interval 控制, 其余选项不能静默忽略
+        unsupported = [option for option, value in (
+            ("--pyshark", args.pyshark), ("--index", args.index),
+            ("--start-time", args.start_time is not None), ("--start-packet", args.start_packet is not None),
+            ("--batch-window", args.batch_window), ("--pipeline-depth", args.pipeline_depth != PIPELINE_DEPTH),
+            ("--preload", args.preload), ("--loop", args.loop is not None),
+            ("--rewrite-counter", args.rewrite_counter), ("--ports", args.ports),
+            ("--data-ids", args.data_ids), ("--concurrent", args.concurrent)) if value]
+        if unsupported:
+            parser.error("--workers cannot be combined with %s" % ", ".join(unsupported))
+    if args.concurrent:
+        # 并发流只支持循环, 过滤, 路由和 speed/interval 控制
+        unsupported = [option for option, value in (
+            ("--pyshark", args.pyshark), ("--index", args.index),
+            ("--start-time", args.start_time is not None), ("--start-packet", args.start_packet is not None),
+            ("--batch-window", args.batch_window), ("--pipeline-depth", args.pipeline_depth != PIPELINE_DEPTH),
+            ("--preload", args.preload), ("--rewrite-counter", args.rewrite_counter)) if value]
+        if unsupported:
+            parser.error("--concurrent cannot be combined with %s" % ", ".join(unsupported))
+    if all(os.path.isfile(pcap_path) for pcap_path in args.pcap_path):
+        pcap_path = args.pcap_path[0] if len(args.pcap_path) == 1 else args.pcap_path
+        packet_filter = None
+        if args.ports or args.data_ids:
+            packet_filter = PacketFilter(args.ports, args.data_ids)
+        if args.concurrent:
+            from async_replay import concurrent_replay
+            # 每个流使用各自的套接字, 路由表由各流分别加载
+            concurrent_replay(args.pcap_path, args.interval, args.routes, args.loop, packet_filter, args.control_port)
+        elif args.workers:
+            from sharded_replay import sharded_replay
+            sharded_replay(pcap_path, args.interval, args.workers, args.shard_by, args.routes, args.control_port)
         else:
-            print("pcap_path is not file")
+            routes = None
+            if args.routes:
+                from ehp2hdmap import MULTICAST_ADDR
+                routes = RoutingTable.load(args.routes, MULTICAST_ADDR)
+                print(routes.report())
+            load_file(pcap_path, args.interval, use_pyshark=args.pyshark, use_index=args.index,
+                      start_time=args.start_time, start_packet=args.start_packet,
+                      batch_window=args.batch_window * 1e-6 if args.batch_window else None,
+                      control_port=args.control_port, pipeline_depth=args.pipeline_depth, preload=args.preload,
+                      loops=args.loop, rewrite_counter=args.rewrite_counter, packet_filter=packet_filter,
+                      routes=routes)
     else:
-        print("[usage]: ./pcap_path interval")
\ No newline at end of file
+        print("pcap_path is not file")
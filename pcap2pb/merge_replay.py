@@ -0,0 +1,32 @@
+import heapq
+from itertools import islice
+from operator import itemgetter
+
+"""
+Time merged replay of several captures.
+The packet sources are merged by timestamp with a streaming k-way heap merge,
+only one pending packet per source is held in memory. Captures recorded on
+different loggers interleave, split files of one logger play back as one
+continuous stream.
+"""
+
+
+class MergedPackets(object):
+    """
+    sources:Closable packet sources, each ordered by timestamp
+    skip:Number of merged packets to drop from the start
+    """
+
+    def __init__(self, sources, skip=0) -> None:
+        self.sources = sources
+        self.skip = skip
+
+    def __iter__(self):
+        merged = heapq.merge(*self.sources, key=itemgetter(0))
+        if self.skip:
+            merged = islice(merged, self.skip, None)
+        return merged
+
+    def close(self):
+        for source in self.sources:
+            source.close()
@@ -0,0 +1,168 @@
+import json
+import socket
+import struct
+
+from packet_filter import parse_data_ids
+
+"""
+Multicast fan-out routing.
+Every captured packet is routed by its EHP data ID or its UDP dst port to a
+destination group, port and source interface. Each route owns one socket
+configured once when the table is opened, so sending only looks up the route.
+
+Routing file (JSON), routes are matched by data_id first, then by dst_port,
+anything else goes to the default route:
+{
+    "default": {"group": "239.255.43.44"},
+    "routes": [
+        {"dst_port": 5001, "group": "239.255.43.45", "port": 6001, "interface": "192.168.2.10"},
+        {"data_id": "LANE_MODEL", "group": "239.255.43.46", "ttl": 1}
+    ]
+}
+"""
+
+MULTICAST_TTL = 255
+# 发送缓冲区, 突发发送时避免内核丢包
+SNDBUF_SIZE = 4 * 1024 * 1024
+_EHP_DATA_ID = struct.Struct("<I")
+
+
+class Route(object):
+    """
+    group:Destination multicast group
+    port:Destination port, None keeps the captured dst port
+    interface:IPv4 address of the local interface to send from (IP_MULTICAST_IF),
+    None uses the system default
+    ttl/loop:IP_MULTICAST_TTL and IP_MULTICAST_LOOP
+    sndbuf:SO_SNDBUF in bytes, None keeps the system default
+    """
+
+    def __init__(self, group, port=None, interface=None, ttl=MULTICAST_TTL, loop=True, sndbuf=SNDBUF_SIZE) -> None:
+        self.group = group
+        self.port = port
+        self.interface = interface
+        self.ttl = ttl
+        self.loop = loop
+        self.sndbuf = sndbuf
+        self.sock = None
+        self._addrs = {}
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(config["group"], config.get("port"), config.get("interface"), config.get("ttl", MULTICAST_TTL),
+                   config.get("loop", True), config.get("sndbuf", SNDBUF_SIZE))
+
+    def open(self):
+        if self.sock is not None:
+            return self.sock
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, self.ttl)
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 1 if self.loop else 0)
+        if self.interface:
+            sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_IF, socket.inet_aton(self.interface))
+        if self.sndbuf:
+            try:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, self.sndbuf)
+            except OSError:
+                # 超过系统上限时保留默认值
+                pass
+        self.sock = sock
+        return sock
+
+    def destination(self, dst_port):
+        """
+        :return (group, port) to send a packet captured with `dst_port` to
+        """
+        addr = self._addrs.get(dst_port)
+        if addr is None:
+            addr = (self.group, self.port or dst_port)
+            self._addrs[dst_port] = addr
+        return addr
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+    def __str__(self):
+        return "%s:%s via %s" % (self.group, self.port or "*", self.interface or "default interface")
+
+
+class RoutingTable(object):
+    """
+    default:Route of packets no other route matches
+    """
+
+    def __init__(self, default) -> None:
+        self.default = default
+        self.port_routes = {}
+        self.data_id_routes = {}
+        # dst port -> (socket, address), 仅用于按端口路由的报文
+        self._port_targets = {}
+
+    def add(self, route, dst_port=None, data_id=None):
+        if data_id is not None:
+            self.data_id_routes[int(data_id)] = route
+        elif dst_port is not None:
+            self.port_routes[int(dst_port)] = route
+        else:
+            raise ValueError("route needs a dst_port or a data_id: " + str(route))
+        self._port_targets.clear()
+
+    @classmethod
+    def load(cls, route_path, default_group):
+        """
+        Read a routing file, see the module doc for the format.
+        """
+        with open(route_path, "r") as f:
+            config = json.load(f)
+        default = config.get("default") or {}
+        table = cls(Route.from_config(dict(default, group=default.get("group", default_group))))
+        for item in config.get("routes", []):
+            route = Route.from_config(item)
+            if "data_id" in item:
+                for data_id in parse_data_ids(str(item["data_id"])):
+                    table.add(route, data_id=data_id)
+            else:
+                table.add(route, dst_port=item["dst_port"])
+        return table
+
+    @property
+    def routes(self):
+        routes = [self.default]
+        for route in list(self.port_routes.values()) + list(self.data_id_routes.values()):
+            if route not in routes:
+                routes.append(route)
+        return routes
+
+    def open(self):
+        for route in self.routes:
+            route.open()
+        return self
+
+    def close(self):
+        for route in self.routes:
+            route.close()
+
+    def resolve(self, dst_port, udp_data):
+        """
+        :return (socket, (group, port)) to send the packet with
+        """
+        if self.data_id_routes and len(udp_data) >= 8:
+            route = self.data_id_routes.get(_EHP_DATA_ID.unpack_from(udp_data, 4)[0])
+            if route is not None:
+                return route.sock, route.destination(dst_port)
+        target = self._port_targets.get(dst_port)
+        if target is None:
+            route = self.port_routes.get(dst_port, self.default)
+            target = (route.sock, route.destination(dst_port))
+            self._port_targets[dst_port] = target
+        return target
+
+    def report(self):
+        lines = ["routes: default -> %s" % self.default]
+        for dst_port, route in sorted(self.port_routes.items()):
+            lines.append("  dst port %d -> %s" % (dst_port, route))
+        for data_id, route in sorted(self.data_id_routes.items()):
+            lines.append("  data id 0x%08X -> %s" % (data_id, route))
+        return "\n".join(lines)
@@ -0,0 +1,225 @@
+import time
+from array import array
+
+"""
+Replay pacing.
+Every packet's send deadline is computed from the capture start (the anchor)
+instead of the previous packet, so sleep overshoot never accumulates.
+"""
+
+# 剩余时间小于该值时改为忙等, 保证亚毫秒精度
+SPIN_THRESHOLD = 0.002
+
+
+# 直方图每个 2 的幂区间再分 SUB_BUCKETS 份, 分位数相对误差不超过 1/SUB_BUCKETS
+SUB_BUCKET_BITS = 4
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+# 覆盖到 2**63 ns
+HISTOGRAM_BUCKETS = 64 * SUB_BUCKETS
+
+
+def _bucket(magnitude):
+    """
+    :return Log-spaced histogram bucket of a non-negative nanosecond value,
+    values below SUB_BUCKETS have a bucket each
+    """
+    if magnitude < SUB_BUCKETS:
+        return magnitude
+    shift = magnitude.bit_length() - SUB_BUCKET_BITS - 1
+    return (shift + 1) * SUB_BUCKETS + (magnitude >> shift) - SUB_BUCKETS
+
+
+def _bucket_value(bucket):
+    """
+    :return Middle of the nanosecond range of a histogram bucket
+    """
+    if bucket < SUB_BUCKETS:
+        return bucket
+    shift = bucket // SUB_BUCKETS - 1
+    return ((bucket % SUB_BUCKETS + SUB_BUCKETS) << shift) + ((1 << shift) >> 1)
+
+
+class LatenessStats(object):
+    """
+    Per packet lateness (actual send time - deadline) in nanoseconds.
+    Negative values are packets sent early, e.g. joined into a send batch.
+    Kept as a fixed size log-spaced histogram, memory does not grow with the
+    number of packets, e.g. when looping a capture for hours.
+    """
+
+    def __init__(self) -> None:
+        # 早发(负值)与迟发分别按绝对值统计
+        self.early = array("q", bytes(8 * HISTOGRAM_BUCKETS))
+        self.late = array("q", bytes(8 * HISTOGRAM_BUCKETS))
+        self.count = 0
+        self.max = None
+
+    def __len__(self):
+        return self.count
+
+    def add(self, lateness_ns):
+        if lateness_ns < 0:
+            self.early[_bucket(-lateness_ns)] += 1
+        else:
+            self.late[_bucket(lateness_ns)] += 1
+        self.count += 1
+        if self.max is None or lateness_ns > self.max:
+            self.max = lateness_ns
+
+    def merge(self, other):
+        """
+        Add the packets of another LatenessStats, e.g. of a replay worker
+        """
+        for bucket in range(HISTOGRAM_BUCKETS):
+            self.early[bucket] += other.early[bucket]
+            self.late[bucket] += other.late[bucket]
+        self.count += other.count
+        if other.max is not None and (self.max is None or other.max > self.max):
+            self.max = other.max
+
+    def percentile(self, percent):
+        """
+        :return Lateness in nanoseconds at `percent`, within the bucket resolution
+        """
+        rank = (self.count - 1) * percent // 100
+        for bucket in range(HISTOGRAM_BUCKETS - 1, -1, -1):
+            rank -= self.early[bucket]
+            if rank < 0:
+                return -_bucket_value(bucket)
+        for bucket in range(HISTOGRAM_BUCKETS):
+            rank -= self.late[bucket]
+            if rank < 0:
+                return min(_bucket_value(bucket), self.max)
+        return self.max
+
+    def summary(self):
+        """
+        :return Dict of count, p50, p99 and max lateness in nanoseconds
+        """
+        if not self.count:
+            return {"count": 0, "p50": 0, "p99": 0, "max": 0}
+        return {
+            "count": self.count,
+            "p50": self.percentile(50),
+            "p99": self.percentile(99),
+            "max": self.max,
+        }
+
+    def report(self):
+        stats = self.summary()
+        return "lateness over %d packets: p50 %.1f us, p99 %.1f us, max %.1f us" % (
+            stats["count"], stats["p50"] / 1e3, stats["p99"] / 1e3, stats["max"] / 1e3)
+
+
+class ReplayClock(object):
+    """
+    Map capture timestamps to time.monotonic_ns() deadlines.
+    scale:Real seconds per capture second, the same meaning as `interval`
+    (0.5 plays twice as fast)
+    """
+
+    def __init__(self, scale=1.0, spin_threshold=SPIN_THRESHOLD) -> None:
+        self.scale = scale
+        self.spin_threshold_ns = int(spin_threshold * 1e9)
+        self.stats = LatenessStats()
+        self._anchor_ts = None
+        self._anchor_ns = 0
+        self._last_ts = None
+        self._last_deadline_ns = 0
+
+    def rebase(self, ts, now_ns=None):
+        """
+        Anchor capture time `ts` to now, e.g. when replay starts or resumes.
+        """
+        self._anchor_ts = ts
+        self._anchor_ns = time.monotonic_ns() if now_ns is None else now_ns
+        self._last_ts = ts
+        self._last_deadline_ns = self._anchor_ns
+
+    def reset(self):
+        """
+        Drop the anchor, the next scheduled packet is sent immediately and
+        becomes the new anchor.
+        """
+        self._anchor_ts = None
+        self._last_ts = None
+
+    def set_scale(self, scale):
+        """
+        Change the playback speed from the last scheduled packet on, without a
+        jump in the timeline.
+        """
+        if scale == self.scale:
+            return
+        if self._last_ts is not None:
+            self._anchor_ts = self._last_ts
+            self._anchor_ns = self._last_deadline_ns
+        self.scale = scale
+
+    def deadline_ns(self, ts):
+        if self._anchor_ts is None:
+            self.rebase(ts)
+        return self._anchor_ns + int((ts - self._anchor_ts) * self.scale * 1e9)
+
+    def wait(self, ts, interrupt=None, record=True):
+        """
+        Block until the deadline of capture time `ts`, sleeping first and
+        spinning on the last `spin_threshold` seconds.
+        interrupt:Optional callable(timeout) used for the sleep, returning True
+        when it was woken early, e.g. PlaybackControl.wait
+        record:False if the packet is only queued after the wait, its lateness
+        is then recorded with sent() once it has actually been sent
+        :return Lateness in nanoseconds, None if the sleep was interrupted and
+        nothing was recorded
+        """
+        deadline = self.deadline_ns(ts)
+        now = time.monotonic_ns()
+        remaining = deadline - now
+        if remaining > self.spin_threshold_ns:
+            timeout = (remaining - self.spin_threshold_ns) / 1e9
+            if interrupt is None:
+                time.sleep(timeout)
+            elif interrupt(timeout):
+                return None
+            now = time.monotonic_ns()
+        while now < deadline:
+            now = time.monotonic_ns()
+        if not record:
+            self._last_ts = ts
+            self._last_deadline_ns = deadline
+            return now - deadline
+        return self._record(ts, deadline, now)
+
+    def schedule(self, ts):
+        """
+        Take a packet as queued now without waiting for its deadline.
+        :return Deadline in nanoseconds, pass it to sent() once the packet is sent
+        """
+        deadline = self.deadline_ns(ts)
+        self._last_ts = ts
+        self._last_deadline_ns = deadline
+        return deadline
+
+    def sent(self, deadlines, now_ns=None):
+        """
+        Record the lateness of queued packets that have just been sent.
+        deadlines:Deadlines in nanoseconds of the packets
+        """
+        now = time.monotonic_ns() if now_ns is None else now_ns
+        add = self.stats.add
+        for deadline in deadlines:
+            add(now - deadline)
+
+    def record(self, ts):
+        """
+        Record a packet sent now without waiting for its deadline.
+        :return Lateness in nanoseconds
+        """
+        return self._record(ts, self.deadline_ns(ts), time.monotonic_ns())
+
+    def _record(self, ts, deadline, now):
+        self._last_ts = ts
+        self._last_deadline_ns = deadline
+        lateness = now - deadline
+        self.stats.add(lateness)
+        return lateness
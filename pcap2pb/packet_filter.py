@@ -0,0 +1,97 @@
+import struct
+
+from ehp_signal_matrix_struct import EHPSignal
+
+"""
+Packet filter applied by the readers before any payload slice or object is
+created for a packet. Packets are selected by UDP dst port and by the EHP data
+ID of the EHP head (4 bytes at offset 4), a dropped packet costs a set lookup.
+"""
+
+_EHP_DATA_ID = struct.Struct("<I")
+# EHP 包头长度, 不足的负载没有数据 ID
+_EHP_HEAD_LENGTH = 12
+
+
+def parse_ports(text):
+    """
+    text:Comma separated port numbers, e.g. "5001,5003"
+    :return Set of ports
+    """
+    return {int(port) for port in text.split(",") if port.strip()}
+
+
+def parse_data_ids(text):
+    """
+    text:Comma separated EHPSignal names or numbers, e.g. "LOC,LANE_MODEL,0x0300000A"
+    :return Set of EHP data IDs
+    """
+    data_ids = set()
+    for name in text.split(","):
+        name = name.strip()
+        if not name:
+            continue
+        if name.upper() in EHPSignal.__members__:
+            data_ids.add(int(EHPSignal[name.upper()]))
+        else:
+            data_ids.add(int(name, 0))
+    return data_ids
+
+
+class PacketFilter(object):
+    """
+    ports:UDP dst ports to keep, None keeps all
+    data_ids:EHP data IDs to keep, None keeps all. Payloads without EHP head
+    are dropped when set.
+    passed/dropped_port/dropped_data_id:packet counters
+    """
+
+    def __init__(self, ports=None, data_ids=None) -> None:
+        self.ports = frozenset(ports) if ports else None
+        self.data_ids = frozenset(int(data_id) for data_id in data_ids) if data_ids else None
+        self.passed = 0
+        self.dropped_port = 0
+        self.dropped_data_id = 0
+
+    def accept(self, dst_port, buffer, start, end):
+        """
+        buffer:Bytes-like object holding the payload at [start, end), not sliced
+        :return True if the packet is kept
+        """
+        if self.ports is not None and dst_port not in self.ports:
+            self.dropped_port += 1
+            return False
+        if self.data_ids is not None:
+            if end - start < _EHP_HEAD_LENGTH or _EHP_DATA_ID.unpack_from(buffer, start + 4)[0] not in self.data_ids:
+                self.dropped_data_id += 1
+                return False
+        self.passed += 1
+        return True
+
+    def accept_indexed(self, dst_port, data_id):
+        """
+        Same as accept for packets whose port and data ID are already known, e.g.
+        from the index columns (data ID 0 if there is no EHP head).
+        """
+        if self.ports is not None and dst_port not in self.ports:
+            self.dropped_port += 1
+            return False
+        if self.data_ids is not None and data_id not in self.data_ids:
+            self.dropped_data_id += 1
+            return False
+        self.passed += 1
+        return True
+
+    def filter(self, source):
+        """
+        Filter a source of (timestamp, dst_port, udp_payload) that has already
+        created the payloads, e.g. pyshark_packets.
+        """
+        accept = self.accept
+        for packet in source:
+            if accept(packet[1], packet[2], 0, len(packet[2])):
+                yield packet
+
+    def report(self):
+        return "filter: %d packets passed, %d dropped by port, %d dropped by data ID" % (
+            self.passed, self.dropped_port, self.dropped_data_id)
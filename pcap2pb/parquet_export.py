@@ -0,0 +1,118 @@
+import argparse
+import os
+import time
+
+from batch_decode import decode_chunks
+from packet_filter import PacketFilter, parse_data_ids, parse_ports
+
+"""
+Parquet export of decoded EHP signals.
+Every capture is decoded once with the layout table and written as one parquet
+file per signal type, <output>/<SIGNAL>/<capture>.parquet, repeated elements
+to <output>/<SIGNAL>.<segment>/<capture>.parquet. Row groups follow capture
+order and carry min/max statistics on the timestamp and link/path ID columns,
+so a query reads only the columns and row groups it needs. pyarrow is only
+imported by the export.
+"""
+
+COMPRESSION = "zstd"
+ROW_GROUP_SIZE = 65536
+# 写入行组统计信息的列, 子表从父表复制这些列
+KEY_COLUMNS = (
+    "timestamp",
+    "profile_head.instance_id",
+    "profile_head.path_id",
+    "link_identifier.link_id",
+    "position_info.path_id",
+    "relative_pos.road_id",
+)
+
+
+class _TableWriters(object):
+    """
+    One ParquetWriter per table directory, opened with the schema of the first chunk
+    """
+
+    def __init__(self, output_dir, file_name, compression, row_group_size) -> None:
+        self.output_dir = output_dir
+        self.file_name = file_name
+        self.compression = compression
+        self.row_group_size = row_group_size
+        self.writers = {}
+        self.rows = {}
+        self.paths = []
+
+    def write(self, table_name, columns):
+        import pyarrow
+        import pyarrow.parquet
+        table = pyarrow.table(columns)
+        writer = self.writers.get(table_name)
+        if writer is None:
+            directory = os.path.join(self.output_dir, table_name)
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, self.file_name)
+            writer = self.writers[table_name] = pyarrow.parquet.ParquetWriter(
+                path, table.schema, compression=self.compression,
+                write_statistics=[column for column in KEY_COLUMNS if column in columns])
+            self.paths.append(path)
+        writer.write_table(table, row_group_size=self.row_group_size)
+        self.rows[table_name] = self.rows.get(table_name, 0) + len(table)
+
+    def close(self):
+        for writer in self.writers.values():
+            writer.close()
+        self.writers = {}
+
+
+def export_capture(file_path, output_dir, signals=None, packet_filter=None,
+                   compression=COMPRESSION, row_group_size=ROW_GROUP_SIZE):
+    """
+    Decode a capture and write its signal tables as parquet files.
+    signals:Optional set of EHPSignal to export, all signal types with a layout if None
+    :return Dict of table name -> rows written
+    """
+    file_name = os.path.splitext(os.path.basename(file_path))[0] + ".parquet"
+    writers = _TableWriters(output_dir, file_name, compression, row_group_size)
+    # 每种信号已写入的行数, 子表的 parent 列换算为文件内的行号
+    written = {}
+    try:
+        for signal, table in decode_chunks(file_path, row_group_size, signals, packet_filter):
+            first_row = written.get(signal, 0)
+            written[signal] = first_row + len(table)
+            writers.write(table.name, table.columns)
+            for child in table.children.values():
+                parent = child["parent"]
+                columns = {"parent": parent + first_row}
+                for column in KEY_COLUMNS:
+                    if column in table:
+                        columns[column] = table[column][parent]
+                for column, values in child.columns.items():
+                    if column != "parent":
+                        columns[column] = values
+                writers.write(child.name, columns)
+    finally:
+        writers.close()
+    return writers.rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export decoded EHP signals of pcap files as parquet")
+    parser.add_argument("output_dir", type=str, help="output directory, one sub directory per signal type")
+    parser.add_argument("pcap_path", type=str, nargs="+", help="pcap files to export")
+    parser.add_argument("--data-ids", type=str, default=None,
+                        help="comma separated EHP signals to export, names or numbers, e.g. LOC,CURVATURE")
+    parser.add_argument("--ports", type=str, default=None, help="comma separated UDP dst ports to export")
+    parser.add_argument("--compression", type=str, default=COMPRESSION, help="parquet compression codec")
+    parser.add_argument("--row-group-size", type=int, default=ROW_GROUP_SIZE, help="messages per row group")
+    args = parser.parse_args()
+
+    signals = parse_data_ids(args.data_ids) if args.data_ids else None
+    packet_filter = PacketFilter(ports=parse_ports(args.ports)) if args.ports else None
+    for pcap_path in args.pcap_path:
+        t0 = time.perf_counter()
+        rows = export_capture(pcap_path, args.output_dir, signals, packet_filter,
+                              args.compression, args.row_group_size)
+        print("%s: %d rows in %d tables, %.3f s" % (
+            pcap_path, sum(rows.values()), len(rows), time.perf_counter() - t0))
+        for table_name in sorted(rows):
+            print("  %s: %d rows" % (table_name, rows[table_name]))
@@ -0,0 +1,199 @@
+import os
+import sys
+import struct
+from array import array
+from bisect import bisect_left
+
+from pcap_reader import MmapPcapReader
+
+"""
+Packet offset index stored as a sidecar file next to the capture (<capture>.idx).
+Index head is 40 bytes:
+magic:8 bytes
+version:4 bytes
+capture size:8 bytes
+capture mtime:8 bytes, float type
+packet count:4 bytes
+reserved:8 bytes
+Then one little endian column per field, each of packet count items:
+payload offset:8 bytes, payload length:4 bytes, timestamp:8 bytes float type,
+dst port:2 bytes, EHP data ID:4 bytes (0 if the payload has no EHP head).
+"""
+
+INDEX_MAGIC = b"EHPPCIDX"
+INDEX_VERSION = 1
+INDEX_SUFFIX = ".idx"
+_INDEX_HEAD = struct.Struct("<8sIQdI8x")
+_EHP_DATA_ID = struct.Struct("<I")
+# 列名与 array 类型码
+_COLUMNS = (("offsets", "Q"), ("lengths", "I"), ("timestamps", "d"), ("ports", "H"), ("data_ids", "I"))
+
+
+def index_path_of(file_path):
+    return file_path + INDEX_SUFFIX
+
+
+class PcapIndex(object):
+    """
+    Offset, timestamp, dst port and EHP data ID of every UDP packet in a capture.
+    Replaying through the index reads payloads straight from the mapped capture
+    without parsing any pcap/ethernet/ip/udp head again.
+    """
+
+    def __init__(self, file_path) -> None:
+        self.file_path = file_path
+        self.offsets = array("Q")
+        self.lengths = array("I")
+        self.timestamps = array("d")
+        self.ports = array("H")
+        self.data_ids = array("I")
+        self._reader = None
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @classmethod
+    def build(cls, file_path):
+        """
+        Scan the capture once and collect the index columns.
+        """
+        index = cls(file_path)
+        with MmapPcapReader(file_path) as reader:
+            view = reader.view
+            for timestamp, dst_port, start, end in reader.udp_records():
+                index.offsets.append(start)
+                index.lengths.append(end - start)
+                index.timestamps.append(timestamp)
+                index.ports.append(dst_port)
+                if end - start >= 12:
+                    index.data_ids.append(_EHP_DATA_ID.unpack_from(view, start + 4)[0])
+                else:
+                    index.data_ids.append(0)
+        return index
+
+    @classmethod
+    def load(cls, file_path, index_path=None):
+        """
+        Read the sidecar of the capture.
+        :return PcapIndex, None if the sidecar is missing or out of date
+        """
+        index_path = index_path or index_path_of(file_path)
+        if not os.path.isfile(index_path):
+            return None
+        stat = os.stat(file_path)
+        with open(index_path, "rb") as fp:
+            head = fp.read(_INDEX_HEAD.size)
+            if len(head) < _INDEX_HEAD.size:
+                return None
+            magic, version, size, mtime, count = _INDEX_HEAD.unpack(head)
+            if magic != INDEX_MAGIC or version != INDEX_VERSION:
+                return None
+            if size != stat.st_size or mtime != stat.st_mtime:
+                return None
+            index = cls(file_path)
+            try:
+                for name, _ in _COLUMNS:
+                    column = getattr(index, name)
+                    column.fromfile(fp, count)
+                    if sys.byteorder == "big":
+                        column.byteswap()
+            except EOFError:
+                return None
+        return index
+
+    @classmethod
+    def open(cls, file_path, index_path=None):
+        """
+        Load the sidecar of the capture, build and save it first if it is missing
+        or out of date. If the sidecar cannot be written, e.g. the capture is on
+        read-only media, the index built in memory is used.
+        """
+        index = cls.load(file_path, index_path)
+        if index is None:
+            index = cls.build(file_path)
+            try:
+                index.save(index_path)
+            except OSError as e:
+                print("index of %s not saved (%s), using it in memory" % (file_path, e))
+        return index
+
+    def save(self, index_path=None):
+        index_path = index_path or index_path_of(self.file_path)
+        stat = os.stat(self.file_path)
+        tmp_path = index_path + ".tmp"
+        try:
+            with open(tmp_path, "wb") as fp:
+                fp.write(_INDEX_HEAD.pack(INDEX_MAGIC, INDEX_VERSION, stat.st_size, stat.st_mtime, len(self)))
+                for name, _ in _COLUMNS:
+                    column = getattr(self, name)
+                    if sys.byteorder == "big":
+                        column = array(column.typecode, column)
+                        column.byteswap()
+                    column.tofile(fp)
+            os.replace(tmp_path, index_path)
+        except OSError:
+            # 写入失败时不留下半个临时文件
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def find_time(self, timestamp):
+        """
+        :return Number of the first packet captured at or after the timestamp
+        """
+        return bisect_left(self.timestamps, timestamp)
+
+    def find_offset(self, seconds):
+        """
+        :return Number of the first packet captured at or after `seconds` since
+        the first packet of the capture
+        """
+        if not len(self):
+            return 0
+        return self.find_time(self.timestamps[0] + seconds)
+
+    def packets(self, start=0, packet_filter=None):
+        """
+        Replay source starting at packet number `start`.
+        packet_filter:Optional PacketFilter, decided on the index columns alone
+        :return Iterator of (timestamp, dst_port, udp_payload), the payload is a
+        memoryview slice of the mapped capture
+        """
+        if self._reader is None:
+            self._reader = MmapPcapReader(self.file_path)
+            self._reader.open()
+        view = self._reader.view
+        offsets, lengths, timestamps, ports = self.offsets, self.lengths, self.timestamps, self.ports
+        if packet_filter is not None:
+            accept, data_ids = packet_filter.accept_indexed, self.data_ids
+            for number in range(start, len(offsets)):
+                if accept(ports[number], data_ids[number]):
+                    offset = offsets[number]
+                    yield timestamps[number], ports[number], view[offset:offset + lengths[number]]
+            return
+        for number in range(start, len(offsets)):
+            offset = offsets[number]
+            yield timestamps[number], ports[number], view[offset:offset + lengths[number]]
+
+    def close(self):
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
+
+
+if __name__ == "__main__":
+    import time
+
+    if len(sys.argv) < 2:
+        print("[usage]: ./pcap_path [pcap_path ...]")
+    for pcap_path in sys.argv[1:]:
+        t0 = time.time()
+        index = PcapIndex.build(pcap_path)
+        index.save()
+        print(pcap_path, ":", len(index), "packets indexed in", round(time.time() - t0, 3), "s")
@@ -0,0 +1,443 @@
+import mmap
+import struct
+
+"""
+Native pcap/pcapng reader.
+Parse capture records directly from the file without tshark, and yield
+(timestamp, dst_port, udp_payload) for every UDP datagram in the capture.
+PcapReader streams the file and yields bytes, MmapPcapReader maps the file and
+yields memoryview slices of it without copying.
+"""
+
+# 经典 pcap 文件头魔数
+PCAP_MAGIC_US = 0xA1B2C3D4
+PCAP_MAGIC_NS = 0xA1B23C4D
+# pcapng 块类型
+PCAPNG_SHB = 0x0A0D0D0A
+PCAPNG_IDB = 0x00000001
+PCAPNG_OPB = 0x00000002
+PCAPNG_SPB = 0x00000003
+PCAPNG_EPB = 0x00000006
+PCAPNG_BYTE_ORDER_MAGIC = 0x1A2B3C4D
+PCAPNG_OPT_IF_TSRESOL = 9
+
+# Link layer types
+LINKTYPE_NULL = 0
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = 101
+LINKTYPE_LINUX_SLL = 113
+LINKTYPE_IPV4 = 228
+LINKTYPE_IPV6 = 229
+LINKTYPE_LINUX_SLL2 = 276
+
+ETH_TYPE_IPV4 = 0x0800
+ETH_TYPE_IPV6 = 0x86DD
+ETH_TYPE_VLAN = (0x8100, 0x88A8, 0x9100)
+IP_PROTO_UDP = 17
+
+_U16_BE = struct.Struct(">H")
+_UDP_HEAD = struct.Struct(">HHH")
+
+
+def _ip_header_offset(frame, linktype, start=0, end=None):
+    """
+    Return (offset of the IP header, ip version) for the frame,
+    or None if the link layer does not carry IP.
+    start, end:Bounds of the frame inside the buffer, the whole buffer by default
+    """
+    if end is None:
+        end = len(frame)
+    if linktype == LINKTYPE_ETHERNET:
+        offset = start + 12
+        if offset + 2 > end:
+            return None
+        (eth_type,) = _U16_BE.unpack_from(frame, offset)
+        while eth_type in ETH_TYPE_VLAN:
+            offset += 4
+            if offset + 2 > end:
+                return None
+            (eth_type,) = _U16_BE.unpack_from(frame, offset)
+        offset += 2
+    elif linktype == LINKTYPE_LINUX_SLL:
+        if start + 16 > end:
+            return None
+        (eth_type,) = _U16_BE.unpack_from(frame, start + 14)
+        offset = start + 16
+    elif linktype == LINKTYPE_LINUX_SLL2:
+        if start + 20 > end:
+            return None
+        (eth_type,) = _U16_BE.unpack_from(frame, start)
+        offset = start + 20
+    elif linktype == LINKTYPE_NULL:
+        if start + 4 > end:
+            return None
+        # BSD loopback: 4 bytes address family in host byte order
+        family = frame[start] or frame[start + 3]
+        eth_type = ETH_TYPE_IPV4 if family == 2 else ETH_TYPE_IPV6
+        offset = start + 4
+    elif linktype in (LINKTYPE_RAW, LINKTYPE_IPV4, LINKTYPE_IPV6):
+        if start >= end:
+            return None
+        eth_type = ETH_TYPE_IPV4 if frame[start] >> 4 == 4 else ETH_TYPE_IPV6
+        offset = start
+    else:
+        return None
+    if eth_type == ETH_TYPE_IPV4:
+        return offset, 4
+    if eth_type == ETH_TYPE_IPV6:
+        return offset, 6
+    return None
+
+
+def udp_payload_bounds(frame, linktype, start=0, end=None):
+    """
+    Locate the UDP payload inside a captured frame.
+    frame:Captured link layer frame, bytes or memoryview. May also be the whole
+    capture buffer with the frame given by start and end, so that nothing is
+    sliced before the packet is accepted
+    linktype:pcap link layer type of the frame
+    start, end:Bounds of the frame inside the buffer, the whole buffer by default
+    :return (dst_port, start, end) of the UDP payload in the same coordinates as
+    frame, None if the frame is not an unfragmented UDP datagram
+    """
+    if end is None:
+        end = len(frame)
+    try:
+        ip = _ip_header_offset(frame, linktype, start, end)
+        if ip is None:
+            return None
+        offset, version = ip
+        if version == 4:
+            if offset + 20 > end or frame[offset + 9] != IP_PROTO_UDP:
+                return None
+            # 分片报文无法单独还原 UDP 负载
+            (flags_fragment,) = _U16_BE.unpack_from(frame, offset + 6)
+            if flags_fragment & 0x3FFF:
+                return None
+            offset += (frame[offset] & 0x0F) * 4
+        else:
+            if offset + 40 > end or frame[offset + 6] != IP_PROTO_UDP:
+                return None
+            offset += 40
+        if offset + 8 > end:
+            return None
+        _, dst_port, udp_length = _UDP_HEAD.unpack_from(frame, offset)
+    except (IndexError, struct.error):
+        return None
+    payload_start = offset + 8
+    # 以 UDP 长度为准, 去掉以太网填充
+    payload_end = min(offset + udp_length, end)
+    if payload_end < payload_start:
+        return None
+    return dst_port, payload_start, payload_end
+
+
+def _pcapng_interface(body, endian):
+    """
+    Interface description block body:
+    linktype:2 bytes
+    reserved:2 bytes
+    snaplen:4 bytes
+    options: code 2 bytes, length 2 bytes, value padded to 4 bytes
+    """
+    (linktype,) = struct.unpack_from(endian + "H", body, 0)
+    ts_scale = 1e-6
+    offset = 8
+    while offset + 4 <= len(body):
+        code, length = struct.unpack_from(endian + "HH", body, offset)
+        if code == 0:
+            break
+        if code == PCAPNG_OPT_IF_TSRESOL and length >= 1:
+            tsresol = body[offset + 4]
+            if tsresol & 0x80:
+                ts_scale = 2.0 ** -(tsresol & 0x7F)
+            else:
+                ts_scale = 10.0 ** -tsresol
+        offset += 4 + ((length + 3) & ~3)
+    return linktype, ts_scale
+
+
+class PcapReader(object):
+    """
+    Streaming reader of classic pcap and pcapng files.
+    Iterate it to get (timestamp, dst_port, udp_payload) of every UDP datagram.
+    """
+
+    def __init__(self, file_path) -> None:
+        self.file_path = file_path
+        self._fp = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if self._fp is not None:
+            self._fp.close()
+            self._fp = None
+
+    def __iter__(self):
+        self.close()
+        self._fp = open(self.file_path, "rb")
+        magic = self._fp.read(4)
+        if len(magic) < 4:
+            return iter(())
+        if struct.unpack("<I", magic)[0] == PCAPNG_SHB:
+            records = self._pcapng_records(magic)
+        else:
+            records = self._pcap_records(magic)
+        return self._udp_packets(records)
+
+    def _udp_packets(self, records):
+        for timestamp, linktype, frame in records:
+            bounds = udp_payload_bounds(frame, linktype)
+            if bounds is None:
+                continue
+            dst_port, start, end = bounds
+            yield timestamp, dst_port, frame[start:end]
+
+    def _pcap_records(self, magic):
+        """
+        Classic pcap file head is 24 bytes, record head is 16 bytes:
+        ts_sec:4 bytes
+        ts_frac:4 bytes, micro or nano seconds
+        incl_len:4 bytes
+        orig_len:4 bytes
+        """
+        fp = self._fp
+        for endian in ("<", ">"):
+            (value,) = struct.unpack(endian + "I", magic)
+            if value in (PCAP_MAGIC_US, PCAP_MAGIC_NS):
+                break
+        else:
+            raise ValueError("invalid pcap magic number: " + magic.hex())
+        ts_scale = 1e-9 if value == PCAP_MAGIC_NS else 1e-6
+        file_head = fp.read(20)
+        if len(file_head) < 20:
+            return
+        linktype = struct.unpack(endian + "IHHiIII", magic + file_head)[-1] & 0x0FFFFFFF
+        record_head = struct.Struct(endian + "IIII")
+        read = fp.read
+        while True:
+            head = read(16)
+            if len(head) < 16:
+                return
+            ts_sec, ts_frac, incl_len, _ = record_head.unpack(head)
+            frame = read(incl_len)
+            if len(frame) < incl_len:
+                return
+            yield ts_sec + ts_frac * ts_scale, linktype, frame
+
+    def _pcapng_records(self, magic):
+        """
+        pcapng block: type:4 bytes, total length:4 bytes, body, total length:4 bytes.
+        Packets come from Enhanced/Simple/Obsolete packet blocks, the link type and
+        timestamp resolution from the Interface Description Block they refer to.
+        """
+        fp = self._fp
+        read = fp.read
+        endian = "<"
+        interfaces = []
+        timestamp = 0.0
+        block_type = PCAPNG_SHB
+        head = magic + read(4)
+        while len(head) == 8:
+            if block_type == PCAPNG_SHB:
+                body_head = read(4)
+                if len(body_head) < 4:
+                    return
+                for endian in ("<", ">"):
+                    if struct.unpack(endian + "I", body_head)[0] == PCAPNG_BYTE_ORDER_MAGIC:
+                        break
+                else:
+                    raise ValueError("invalid pcapng byte order magic: " + body_head.hex())
+                (total_len,) = struct.unpack(endian + "I", head[4:])
+                body = body_head + read(total_len - 12)
+                interfaces = []
+            else:
+                (total_len,) = struct.unpack(endian + "I", head[4:])
+                body = read(total_len - 8)
+            if len(body) < total_len - 8:
+                return
+            body = body[:-4]
+
+            if block_type == PCAPNG_IDB:
+                interfaces.append(_pcapng_interface(body, endian))
+            elif block_type == PCAPNG_EPB or block_type == PCAPNG_OPB:
+                if block_type == PCAPNG_EPB:
+                    if_id, ts_high, ts_low, cap_len, _ = struct.unpack_from(endian + "IIIII", body, 0)
+                else:
+                    if_id, _, ts_high, ts_low, cap_len, _ = struct.unpack_from(endian + "HHIIII", body, 0)
+                linktype, ts_scale = interfaces[if_id]
+                timestamp = ((ts_high << 32) | ts_low) * ts_scale
+                yield timestamp, linktype, body[20:20 + cap_len]
+            elif block_type == PCAPNG_SPB and interfaces:
+                # Simple packet block has no timestamp, reuse the previous one
+                linktype, _ = interfaces[0]
+                (orig_len,) = struct.unpack_from(endian + "I", body, 0)
+                yield timestamp, linktype, body[4:4 + orig_len]
+
+            head = read(8)
+            if len(head) == 8:
+                # SHB 块类型是回文, 字节序未知时也能识别
+                (block_type,) = struct.unpack(endian + "I", head[:4])
+
+
+class MmapPcapReader(object):
+    """
+    Zero-copy reader of classic pcap and pcapng files.
+    The capture is memory mapped and every udp_payload is a memoryview slice of
+    the mapping, which struct.unpack/unpack_from and socket.sendto consume
+    directly. The slices are only valid while the reader is open, copy the
+    payload with bytes() to keep it longer.
+    packet_filter:Optional PacketFilter, dropped packets are never sliced
+    """
+
+    def __init__(self, file_path, packet_filter=None) -> None:
+        self.file_path = file_path
+        self.packet_filter = packet_filter
+        self._fp = None
+        self._mm = None
+        self.view = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def open(self):
+        if self._mm is not None:
+            return
+        self._fp = open(self.file_path, "rb")
+        try:
+            self._mm = mmap.mmap(self._fp.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # 空文件无法映射
+            self._mm = b""
+        self.view = memoryview(self._mm)
+
+    def close(self):
+        if self.view is not None:
+            self.view.release()
+            self.view = None
+        if self._mm is not None:
+            try:
+                if isinstance(self._mm, mmap.mmap):
+                    self._mm.close()
+            except BufferError:
+                # 仍有负载切片被引用, 映射在最后一个切片释放时解除
+                pass
+            self._mm = None
+        if self._fp is not None:
+            self._fp.close()
+            self._fp = None
+
+    def __iter__(self):
+        self.open()
+        view = self.view
+        for timestamp, dst_port, start, end in self.udp_records():
+            yield timestamp, dst_port, view[start:end]
+
+    def first_timestamp(self):
+        """
+        :return Timestamp of the first captured frame, None if there is none
+        """
+        for timestamp, _, _, _ in self.records():
+            return timestamp
+        return None
+
+    def udp_records(self):
+        """
+        :return Iterator of (timestamp, dst_port, payload_start, payload_end), the
+        payload position is the absolute offset in the capture file
+        """
+        self.open()
+        view = self.view
+        accept = self.packet_filter.accept if self.packet_filter is not None else None
+        for timestamp, linktype, frame_start, frame_end in self.records():
+            # 直接在整个映射上定位负载, 过滤前不为每帧创建切片
+            bounds = udp_payload_bounds(view, linktype, frame_start, frame_end)
+            if bounds is None:
+                continue
+            dst_port, start, end = bounds
+            if accept is not None and not accept(dst_port, view, start, end):
+                continue
+            yield timestamp, dst_port, start, end
+
+    def records(self):
+        """
+        :return Iterator of (timestamp, linktype, frame_start, frame_end) of every
+        captured frame
+        """
+        self.open()
+        if len(self.view) < 4:
+            return iter(())
+        if struct.unpack_from("<I", self.view, 0)[0] == PCAPNG_SHB:
+            return self._pcapng_records()
+        return self._pcap_records()
+
+    def _pcap_records(self):
+        view = self.view
+        size = len(view)
+        for endian in ("<", ">"):
+            (value,) = struct.unpack_from(endian + "I", view, 0)
+            if value in (PCAP_MAGIC_US, PCAP_MAGIC_NS):
+                break
+        else:
+            raise ValueError("invalid pcap magic number: " + view[:4].hex())
+        ts_scale = 1e-9 if value == PCAP_MAGIC_NS else 1e-6
+        if size < 24:
+            return
+        linktype = struct.unpack_from(endian + "I", view, 20)[0] & 0x0FFFFFFF
+        unpack_head = struct.Struct(endian + "III").unpack_from
+        offset = 24
+        while offset + 16 <= size:
+            ts_sec, ts_frac, incl_len = unpack_head(view, offset)
+            start = offset + 16
+            offset = start + incl_len
+            if offset > size:
+                return
+            yield ts_sec + ts_frac * ts_scale, linktype, start, offset
+
+    def _pcapng_records(self):
+        view = self.view
+        size = len(view)
+        endian = "<"
+        interfaces = []
+        timestamp = 0.0
+        offset = 0
+        while offset + 12 <= size:
+            (block_type,) = struct.unpack_from(endian + "I", view, offset)
+            if block_type == PCAPNG_SHB:
+                for endian in ("<", ">"):
+                    if struct.unpack_from(endian + "I", view, offset + 8)[0] == PCAPNG_BYTE_ORDER_MAGIC:
+                        break
+                else:
+                    raise ValueError("invalid pcapng byte order magic: " + view[offset + 8:offset + 12].hex())
+                interfaces = []
+            (total_len,) = struct.unpack_from(endian + "I", view, offset + 4)
+            body = offset + 8
+            block_end = offset + total_len
+            if total_len < 12 or block_end > size:
+                return
+
+            if block_type == PCAPNG_IDB:
+                interfaces.append(_pcapng_interface(view[body:block_end - 4], endian))
+            elif block_type == PCAPNG_EPB or block_type == PCAPNG_OPB:
+                if block_type == PCAPNG_EPB:
+                    if_id, ts_high, ts_low, cap_len = struct.unpack_from(endian + "IIII", view, body)
+                else:
+                    if_id, _, ts_high, ts_low, cap_len = struct.unpack_from(endian + "HHIII", view, body)
+                linktype, ts_scale = interfaces[if_id]
+                timestamp = ((ts_high << 32) | ts_low) * ts_scale
+                yield timestamp, linktype, body + 20, min(body + 20 + cap_len, block_end - 4)
+            elif block_type == PCAPNG_SPB and interfaces:
+                # Simple packet block has no timestamp, reuse the previous one
+                linktype, _ = interfaces[0]
+                (orig_len,) = struct.unpack_from(endian + "I", view, body)
+                yield timestamp, linktype, body + 4, min(body + 4 + orig_len, block_end - 4)
+            offset = block_end
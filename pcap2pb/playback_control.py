@@ -0,0 +1,259 @@
+import json
+import os
+import socket
+import threading
+import time
+
+"""
+Playback control channel.
+PlaybackControl holds the speed/pause/step/seek state shared between the
+replay loop and its inputs, and wakes the replay loop as soon as it changes.
+Inputs are a local UDP command port and the legacy interval.json file.
+
+UDP commands (one per datagram, the reply is "ok" or "error: ..."):
+speed <interval>   set the playback interval, same meaning as interval.json
+pause
+resume
+step [count]       pause and release `count` packets
+frame [count]      pause and release `count` EHP cycles (ADASIS cyclic counter)
+seek <seconds>     jump to seconds since the first packet of the capture
+"""
+
+CONTROL_PORT = 12346
+# interval.json 的检查周期, 只有修改时间变化时才重新读取; 即时调速请用控制端口
+INTERVAL_FILE_CHECK = 1.0
+# 全部指令
+COMMANDS = ("speed", "interval", "pause", "resume", "step", "frame", "seek")
+
+
+class PlaybackControl(object):
+    """
+    commands:Names of the commands this player supports, the others are
+    answered with an error
+    """
+
+    def __init__(self, interval=1.0, commands=COMMANDS) -> None:
+        self.interval = float(interval)
+        self.commands = tuple(commands)
+        self.paused = False
+        self.steps = 0
+        self.frames = 0
+        self.seek_to = None
+        # 正在单步放行的 EHP 周期计数
+        self._frame_cycle = None
+        # 每次状态变化加一, 回放循环只比较该计数, 无需加锁
+        self.version = 0
+        self._cond = threading.Condition()
+
+    def _changed(self):
+        self.version += 1
+        self._cond.notify_all()
+
+    def set_interval(self, interval):
+        with self._cond:
+            self.interval = float(interval)
+            self._changed()
+
+    def pause(self):
+        with self._cond:
+            self.paused = True
+            self._changed()
+
+    def resume(self):
+        with self._cond:
+            self.paused = False
+            self.steps = 0
+            self.frames = 0
+            self._frame_cycle = None
+            self._changed()
+
+    def step(self, count=1):
+        with self._cond:
+            self.paused = True
+            self.steps += count
+            self._changed()
+
+    def frame(self, count=1):
+        with self._cond:
+            self.paused = True
+            self.frames += count
+            self._changed()
+
+    def seek(self, seconds):
+        with self._cond:
+            self.seek_to = float(seconds)
+            self._changed()
+
+    def take_seek(self):
+        """
+        :return Pending seek target in seconds and clear it, None if there is none
+        """
+        with self._cond:
+            seek_to, self.seek_to = self.seek_to, None
+            return seek_to
+
+    def wait_turn(self, cycle=None):
+        """
+        Called by the replay loop before each packet: block while paused, unless
+        a step, frame or seek is pending, and consume the step or frame.
+        cycle:EHP cycle counter of the packet, None for non EHP packets
+        :return True if the call blocked, the caller's clock must be re-anchored
+        """
+        if not self.paused:
+            return False
+        with self._cond:
+            waited = False
+            while True:
+                if not self.paused or self.seek_to is not None:
+                    return waited
+                if self.steps:
+                    self.steps -= 1
+                    return True
+                if self.frames:
+                    if self._frame_cycle is None:
+                        self._frame_cycle = cycle
+                        return True
+                    if cycle is None or cycle == self._frame_cycle:
+                        return True
+                    # 下一个周期开始, 当前周期放行完毕
+                    self.frames -= 1
+                    self._frame_cycle = None
+                    if self.frames:
+                        self._frame_cycle = cycle
+                        return True
+                self._cond.wait()
+                waited = True
+
+    def wait(self, timeout, version=None):
+        """
+        Sleep up to `timeout` seconds, return early when the state changes.
+        version:Version the caller last acted on, a change that arrived since is
+        reported at once instead of being missed for the whole sleep; None waits
+        for a change from now on
+        :return True if the state changed
+        """
+        with self._cond:
+            if version is None:
+                version = self.version
+            elif version != self.version:
+                return True
+            self._cond.wait(timeout)
+            return self.version != version
+
+    def apply(self, command):
+        """
+        Execute a text command.
+        :return Reply text
+        """
+        words = command.split()
+        if not words:
+            return "error: empty command"
+        name, args = words[0].lower(), words[1:]
+        if name in COMMANDS and name not in self.commands:
+            return "error: %s is not supported by this player" % name
+        try:
+            if name in ("speed", "interval") and len(args) == 1:
+                self.set_interval(float(args[0]))
+            elif name == "pause" and not args:
+                self.pause()
+            elif name == "resume" and not args:
+                self.resume()
+            elif name == "step" and len(args) <= 1:
+                self.step(int(args[0]) if args else 1)
+            elif name == "frame" and len(args) <= 1:
+                self.frame(int(args[0]) if args else 1)
+            elif name == "seek" and len(args) == 1:
+                self.seek(float(args[0]))
+            else:
+                return "error: unknown command " + command
+        except ValueError as e:
+            return "error: " + str(e)
+        return "ok"
+
+
+class ControlServer(threading.Thread):
+    """
+    Receive text commands on a local UDP port and apply them to the control.
+    """
+
+    def __init__(self, control, port=CONTROL_PORT, host="127.0.0.1") -> None:
+        super().__init__(daemon=True)
+        self.control = control
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind((host, port))
+
+    def run(self):
+        while True:
+            try:
+                data, addr = self.sock.recvfrom(1024)
+            except OSError:
+                return
+            reply = self.control.apply(data.decode("utf-8", "replace"))
+            try:
+                self.sock.sendto(reply.encode(), addr)
+            except OSError:
+                pass
+
+    def close(self):
+        self.sock.close()
+
+
+def start_control_server(control, port=CONTROL_PORT, host="127.0.0.1"):
+    """
+    Start a ControlServer, several players can run side by side: when the port
+    is taken the player goes on without a control port.
+    :return The running ControlServer, None if the port could not be bound
+    """
+    try:
+        server = ControlServer(control, port, host)
+    except OSError as e:
+        print("control port %d unavailable (%s), replaying without control port" % (port, e))
+        return None
+    server.start()
+    print("control port==%d" % port)
+    return server
+
+
+def watch_interval_file(interval_path, control, check_period=INTERVAL_FILE_CHECK):
+    """
+    Apply changes of interval.json to the control. The file is only parsed
+    again when its modification time changes.
+    """
+    last_mtime = None
+    while True:
+        try:
+            stat = os.stat(interval_path)
+            mtime = (stat.st_mtime_ns, stat.st_size)
+            if mtime != last_mtime:
+                last_mtime = mtime
+                with open(interval_path, 'r') as f:
+                    data = json.load(f)
+                if float(data["interval"]) != control.interval:
+                    control.set_interval(data["interval"])
+        except (OSError, ValueError, KeyError):
+            # 文件正在被改写, 下个周期再读
+            last_mtime = None
+        time.sleep(check_period)
+
+
+def send_command(command, port=CONTROL_PORT, host="127.0.0.1", timeout=1.0):
+    """
+    Send one command to a running player.
+    :return Reply text
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.settimeout(timeout)
+    try:
+        sock.sendto(command.encode(), (host, port))
+        return sock.recv(1024).decode()
+    finally:
+        sock.close()
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) < 2:
+        print("[usage]: speed <interval> | pause | resume | step [count] | frame [count] | seek <seconds>")
+    else:
+        print(send_command(" ".join(sys.argv[1:])))
@@ -0,0 +1,128 @@
+import os
+import sys
+import time
+from array import array
+from bisect import bisect_left
+
+from pcap_reader import MmapPcapReader
+
+"""
+In-RAM replay source.
+The UDP payloads of the whole capture are copied once into one contiguous
+buffer, next to offset/length/timestamp/port arrays, so replay, seek and
+rewind never touch the disk again.
+"""
+
+
+def resident_memory():
+    """
+    :return Resident set size of this process in bytes, None if unknown
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    if sys.platform == "win32":
+        import ctypes
+        from ctypes import wintypes
+
+        class ProcessMemoryCounters(ctypes.Structure):
+            _fields_ = [
+                ("cb", wintypes.DWORD),
+                ("PageFaultCount", wintypes.DWORD),
+                ("PeakWorkingSetSize", ctypes.c_size_t),
+                ("WorkingSetSize", ctypes.c_size_t),
+                ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                ("PagefileUsage", ctypes.c_size_t),
+                ("PeakPagefileUsage", ctypes.c_size_t),
+            ]
+
+        counters = ProcessMemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+            return counters.WorkingSetSize
+        return None
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # macOS 以字节为单位, 其余为 KB
+        return peak if sys.platform == "darwin" else peak * 1024
+    except ImportError:
+        return None
+
+
+class PreloadedCapture(object):
+    """
+    UDP payloads of a capture held in memory.
+    load_time:seconds spent loading, resident:process RSS after loading
+    """
+
+    def __init__(self, file_path) -> None:
+        self.file_path = file_path
+        self.buffer = bytearray()
+        self.offsets = array("Q")
+        self.lengths = array("I")
+        self.timestamps = array("d")
+        self.ports = array("H")
+        self.load_time = 0.0
+        self.resident = None
+
+    def __len__(self):
+        return len(self.offsets)
+
+    @classmethod
+    def load(cls, file_path):
+        t0 = time.perf_counter()
+        capture = cls(file_path)
+        buffer = capture.buffer
+        with MmapPcapReader(file_path) as reader:
+            view = reader.view
+            for timestamp, dst_port, start, end in reader.udp_records():
+                capture.offsets.append(len(buffer))
+                capture.lengths.append(end - start)
+                capture.timestamps.append(timestamp)
+                capture.ports.append(dst_port)
+                buffer += view[start:end]
+        capture.load_time = time.perf_counter() - t0
+        capture.resident = resident_memory()
+        return capture
+
+    def report(self):
+        text = "preloaded %d packets, %.1f MB payload in %.3f s" % (
+            len(self), len(self.buffer) / 1e6, self.load_time)
+        if self.resident is not None:
+            text += ", resident memory %.1f MB" % (self.resident / 1e6)
+        return text
+
+    def find_offset(self, seconds):
+        """
+        :return Number of the first packet captured at or after `seconds` since
+        the first packet of the capture
+        """
+        if not len(self):
+            return 0
+        return bisect_left(self.timestamps, self.timestamps[0] + seconds)
+
+    def packets(self, start=0, packet_filter=None):
+        """
+        packet_filter:Optional PacketFilter
+        :return Iterator of (timestamp, dst_port, udp_payload) from packet number
+        `start`, the payload is a memoryview slice of the in-memory buffer
+        """
+        view = memoryview(self.buffer)
+        offsets, lengths, timestamps, ports = self.offsets, self.lengths, self.timestamps, self.ports
+        if packet_filter is not None:
+            accept, buffer = packet_filter.accept, self.buffer
+            for number in range(start, len(offsets)):
+                offset = offsets[number]
+                if accept(ports[number], buffer, offset, offset + lengths[number]):
+                    yield timestamps[number], ports[number], view[offset:offset + lengths[number]]
+            return
+        for number in range(start, len(offsets)):
+            offset = offsets[number]
+            yield timestamps[number], ports[number], view[offset:offset + lengths[number]]
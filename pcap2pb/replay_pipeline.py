@@ -0,0 +1,108 @@
+import threading
+from collections import deque
+
+"""
+Producer/consumer replay pipeline.
+A reader thread pulls packets from the source (pcap parsing, index lookup or
+pyshark dissection) into a bounded ring buffer, the replay loop only waits
+and sends, so it never blocks on the disk or dissector while the buffer is
+not empty.
+"""
+
+PIPELINE_DEPTH = 4096
+
+
+class PacketPipeline(object):
+    """
+    Iterate it like the wrapped source. Counters:
+    produced/consumed:packets moved through the buffer
+    max_depth:highest buffer fill level seen
+    underruns:times the sender found the buffer empty before the source ended
+    """
+
+    def __init__(self, source, capacity=PIPELINE_DEPTH) -> None:
+        self.source = source
+        self.capacity = capacity
+        self.produced = 0
+        self.consumed = 0
+        self.max_depth = 0
+        self.underruns = 0
+        self._buffer = deque()
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self._consumer_waiting = False
+        self._producer_waiting = False
+        self._done = False
+        self._stopped = False
+        self._error = None
+        self._thread = threading.Thread(target=self._produce, daemon=True)
+        self._thread.start()
+
+    @property
+    def depth(self):
+        return len(self._buffer)
+
+    def _produce(self):
+        buffer = self._buffer
+        capacity = self.capacity
+        try:
+            for packet in self.source:
+                if len(buffer) >= capacity:
+                    with self._lock:
+                        self._producer_waiting = True
+                        # 置位后再检查一次, 避免与消费者的唤醒竞争
+                        while len(buffer) >= capacity and not self._stopped:
+                            self._not_full.wait()
+                        self._producer_waiting = False
+                if self._stopped:
+                    return
+                buffer.append(packet)
+                self.produced += 1
+                if self._consumer_waiting:
+                    with self._lock:
+                        self._not_empty.notify()
+        except Exception as e:
+            self._error = e
+        finally:
+            with self._lock:
+                self._done = True
+                self._not_empty.notify()
+
+    def __iter__(self):
+        buffer = self._buffer
+        while True:
+            depth = len(buffer)
+            if depth:
+                if depth > self.max_depth:
+                    self.max_depth = depth
+                packet = buffer.popleft()
+                self.consumed += 1
+                if self._producer_waiting:
+                    with self._lock:
+                        self._not_full.notify()
+                yield packet
+                continue
+            with self._lock:
+                if not buffer and not self._done:
+                    self.underruns += 1
+                self._consumer_waiting = True
+                while not buffer and not self._done:
+                    self._not_empty.wait()
+                self._consumer_waiting = False
+                if not buffer:
+                    break
+        if self._error is not None:
+            raise self._error
+
+    def close(self):
+        with self._lock:
+            self._stopped = True
+            self._not_full.notify()
+        self._thread.join()
+        self._buffer.clear()
+        self.source.close()
+
+    def report(self):
+        return "pipeline: %d packets, max depth %d/%d, %d underruns" % (
+            self.consumed, self.max_depth, self.capacity, self.underruns)
@@ -0,0 +1,254 @@
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+import time
+from collections import Counter
+from multiprocessing.sharedctypes import RawArray
+
+from ehp2hdmap import MULTICAST_ADDR, open_packets, init_interval_file
+from multicast_routes import Route, RoutingTable
+from packet_filter import PacketFilter
+from pacer import ReplayClock, LatenessStats
+from pcap_index import PcapIndex
+from playback_control import PlaybackControl, start_control_server, watch_interval_file, CONTROL_PORT
+
+"""
+Sharded replay across worker processes.
+The packets are split by dst port or EHP data ID into shards of about equal
+packet count, every worker process replays one shard through the index. All
+workers follow one MasterClock in shared memory, the parent owns the control
+inputs and moves the clock, the workers only read it.
+"""
+
+# 工作进程检查主时钟变化的周期
+SHARD_POLL = 0.01
+SHARD_BY = ("port", "data_id")
+
+
+class MasterClock(object):
+    """
+    Capture time to time.monotonic_ns() mapping shared by all processes.
+    Written by the parent only, read lock free through a sequence counter that
+    is odd while a write is in progress, so a reader never sees a half
+    updated anchor/speed pair.
+    """
+
+    def __init__(self) -> None:
+        # [sequence, anchor_ns], [anchor_ts, scale]
+        self._seq = RawArray("q", 2)
+        self._values = RawArray("d", 2)
+
+    @property
+    def version(self):
+        return self._seq[0]
+
+    def set(self, anchor_ts, anchor_ns, scale):
+        seq = self._seq
+        seq[0] += 1
+        seq[1] = anchor_ns
+        self._values[0] = anchor_ts
+        self._values[1] = scale
+        seq[0] += 1
+
+    def read(self):
+        """
+        :return (version, anchor_ts, anchor_ns, scale)
+        """
+        seq, values = self._seq, self._values
+        while True:
+            version = seq[0]
+            if version & 1:
+                continue
+            anchor_ns = seq[1]
+            anchor_ts = values[0]
+            scale = values[1]
+            if seq[0] == version:
+                return version, anchor_ts, anchor_ns, scale
+
+    def set_scale(self, scale):
+        """
+        Change the speed of all workers at once, re-anchored at the current
+        capture time so no worker jumps.
+        """
+        _, anchor_ts, anchor_ns, old_scale = self.read()
+        now = time.monotonic_ns()
+        if now > anchor_ns and old_scale > 0:
+            anchor_ts += (now - anchor_ns) / 1e9 / old_scale
+            anchor_ns = now
+        self.set(anchor_ts, anchor_ns, scale)
+
+
+class SharedReplayClock(ReplayClock):
+    """
+    ReplayClock following a MasterClock instead of its own anchor.
+    """
+
+    def __init__(self, master) -> None:
+        super().__init__()
+        self.master = master
+        self._version = None
+
+    def deadline_ns(self, ts):
+        if self.master.version != self._version:
+            self._version, self._anchor_ts, self._anchor_ns, self.scale = self.master.read()
+        return self._anchor_ns + int((ts - self._anchor_ts) * self.scale * 1e9)
+
+    def interrupt(self, timeout):
+        """
+        Sleep for ReplayClock.wait in slices of SHARD_POLL.
+        :return True if the master clock changed meanwhile
+        """
+        version = self._version
+        end = time.monotonic() + timeout
+        while True:
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                return False
+            time.sleep(min(remaining, SHARD_POLL))
+            if self.master.version != version:
+                return True
+
+
+def plan_shards(file_path, workers, shard_by="port"):
+    """
+    Split the dst ports or data IDs of the captures into at most `workers`
+    shards, balanced by packet count from the index columns.
+    :return (list of key sets, timestamp of the earliest packet)
+    """
+    paths = [file_path] if isinstance(file_path, str) else list(file_path)
+    counts = Counter()
+    first_ts = None
+    for path in paths:
+        with PcapIndex.open(path) as index:
+            counts.update(index.ports if shard_by == "port" else index.data_ids)
+            if len(index) and (first_ts is None or index.timestamps[0] < first_ts):
+                first_ts = index.timestamps[0]
+    shards = [set() for _ in range(workers)]
+    loads = [0] * workers
+    for key, count in counts.most_common():
+        lightest = loads.index(min(loads))
+        shards[lightest].add(key)
+        loads[lightest] += count
+    return [shard for shard in shards if shard], first_ts
+
+
+def _replay_shard(shard, file_path, keys, shard_by, master, route_path, results):
+    try:
+        if shard_by == "port":
+            packet_filter = PacketFilter(ports=keys)
+        else:
+            packet_filter = PacketFilter(data_ids=keys)
+        if route_path:
+            routes = RoutingTable.load(route_path, MULTICAST_ADDR)
+        else:
+            routes = RoutingTable(Route(MULTICAST_ADDR))
+        routes.open()
+        resolve = routes.resolve
+        clock = SharedReplayClock(master)
+        packets = open_packets(file_path, use_index=True, packet_filter=packet_filter)
+        sent = 0
+        results.put(("ready", shard))
+        # 等待父进程设定起始时刻
+        while not master.version:
+            time.sleep(SHARD_POLL)
+        try:
+            for ts, dst_port, udp_data in packets:
+                while clock.wait(ts, clock.interrupt) is None:
+                    pass
+                sock, addr = resolve(dst_port, udp_data)
+                sock.sendto(udp_data, addr)
+                sent += 1
+        finally:
+            packets.close()
+            routes.close()
+        results.put(("done", shard, sent, clock.stats))
+    except Exception as e:
+        results.put(("error", shard, repr(e)))
+
+
+def _forward_speed(control, master):
+    version = control.version
+    while True:
+        control.wait(1.0, version)
+        if control.version != version:
+            version = control.version
+            master.set_scale(control.interval)
+
+
+def sharded_replay(file_path, interval_input, workers=None, shard_by="port", route_path=None,
+                   control_port=CONTROL_PORT, start_delay=0.1):
+    """
+    Replay captures split across worker processes.
+    file_path:Capture path, or list of capture paths merged by timestamp
+    workers:Number of worker processes, default the CPU count
+    shard_by:"port" or "data_id"
+    route_path:Routing file loaded by every worker for its own sockets
+    control_port:UDP control port, only speed commands apply to all workers
+    :return Merged LatenessStats of all workers
+    """
+    if shard_by not in SHARD_BY:
+        raise ValueError("shard_by must be one of " + ", ".join(SHARD_BY))
+    shards, first_ts = plan_shards(file_path, workers or os.cpu_count() or 1, shard_by)
+    if first_ts is None:
+        print("no packets to replay")
+        return LatenessStats()
+
+    interval_path = os.path.dirname(sys.argv[0]) + "/interval.json"
+    init_interval_file(interval_path, interval_input)
+    # 分片之间只同步速度, 暂停/单步/跳转会被拒绝
+    control = PlaybackControl(interval_input, commands=("speed", "interval"))
+    threading.Thread(target=watch_interval_file, args=(interval_path, control), daemon=True).start()
+    control_server = start_control_server(control, control_port) if control_port else None
+
+    master = MasterClock()
+    results = multiprocessing.Queue()
+    processes = []
+    for shard, keys in enumerate(shards):
+        process = multiprocessing.Process(target=_replay_shard, daemon=True,
+                                          args=(shard, file_path, keys, shard_by, master, route_path, results))
+        process.start()
+        processes.append(process)
+        key_format = "%d" if shard_by == "port" else "0x%08X"
+        print("shard %d: %s %s" % (shard, shard_by, ", ".join(key_format % key for key in sorted(keys))))
+
+    stats = LatenessStats()
+    sent = 0
+    ready = 0
+    running = len(processes)
+    try:
+        while running:
+            try:
+                message = results.get(timeout=1.0)
+            except queue.Empty:
+                if not any(process.is_alive() for process in processes):
+                    print("workers exited without reporting")
+                    break
+                continue
+            if message[0] == "ready":
+                ready += 1
+                if ready == len(processes):
+                    # 所有分片就绪后统一起跑, 此后调速经主时钟同时下发
+                    master.set(first_ts, time.monotonic_ns() + int(start_delay * 1e9), control.interval)
+                    threading.Thread(target=_forward_speed, args=(control, master), daemon=True).start()
+            elif message[0] == "done":
+                _, shard, shard_sent, shard_stats = message
+                sent += shard_sent
+                stats.merge(shard_stats)
+                running -= 1
+            else:
+                print("shard %d failed: %s" % (message[1], message[2]))
+                running -= 1
+                if not master.version:
+                    break
+    finally:
+        for process in processes:
+            process.join(1.0)
+            if process.is_alive():
+                process.terminate()
+        if control_server is not None:
+            control_server.close()
+    print("sharded replay: %d packets from %d workers" % (sent, len(processes)))
+    print(stats.report())
+    return stats
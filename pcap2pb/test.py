@@ -1,7 +1,8 @@
 import os
 from collections import defaultdict
-import dpkt
 from ehp_signal_matrix_struct import *
+from ehp_reassembly import Reassembler
+from pcap_reader import MmapPcapReader
 from cities.city_code import get_city_code_provider
 from cities.city_code2 import get_city_code_provider as get_city_code_provider2
 from cities.gps import GpsTransfer
@@ -14,28 +15,18 @@ def load_file(file_path):
     pcap_file: Pcap file full path.
     :return Dict of all signal and map between link id and city code
     """
+    def print_tollgate(data_pcap):
+        link_id = data_pcap.profile_head()[0]
+        is_tollgate = data_pcap.toll_gate()
+        if is_tollgate:
+            print(link_id)
+
+    dispatcher = SignalDispatcher()
+    dispatcher.subscribe(EHPSignal.TOLLGATE, print_tollgate)
     if os.path.exists(file_path):
-        with open(file_path, "rb") as fp:
-            pcp_data = dpkt.pcap.Reader(fp)
+        with MmapPcapReader(file_path) as reader:
             log().info("load " + file_path)
-            for timestamp, buffer in pcp_data:
-                eth_udp = dpkt.ethernet.Ethernet(buffer)
-
-                if (
-                        "udp" in dir(eth_udp.data)
-                        and eth_udp.data.p == dpkt.ip.IP_PROTO_UDP
-                ):
-                    ehp_obj = EhpHead(eth_udp.data.data.data)
-                    data_id = eval(ehp_obj.ehp_head()[-2])
-
-                    if data_id == 0x03000022:
-                        data_pcap = ProfileTollgate(eth_udp.data.data.data)
-                        link_id = data_pcap.profile_head()[0]
-                        is_tollgate = data_pcap.toll_gate()
-                        if is_tollgate:
-                            print(link_id)
-                    else:
-                        continue
+            Reassembler().dispatch(reader, dispatcher)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,201 @@
+import ctypes
+import ctypes.util
+import errno
+import socket
+import sys
+
+"""
+Batched UDP transmission.
+Datagrams scheduled within one window are flushed together with a single
+sendmmsg system call on Linux, or with a plain sendto loop elsewhere.
+"""
+
+
+class _SockaddrIn(ctypes.Structure):
+    _fields_ = [
+        ("sin_family", ctypes.c_ushort),
+        ("sin_port", ctypes.c_ushort),
+        ("sin_addr", ctypes.c_ubyte * 4),
+        ("sin_zero", ctypes.c_ubyte * 8),
+    ]
+
+
+class _Iovec(ctypes.Structure):
+    _fields_ = [("iov_base", ctypes.c_void_p), ("iov_len", ctypes.c_size_t)]
+
+
+class _Msghdr(ctypes.Structure):
+    _fields_ = [
+        ("msg_name", ctypes.c_void_p),
+        ("msg_namelen", ctypes.c_uint32),
+        ("msg_iov", ctypes.POINTER(_Iovec)),
+        ("msg_iovlen", ctypes.c_size_t),
+        ("msg_control", ctypes.c_void_p),
+        ("msg_controllen", ctypes.c_size_t),
+        ("msg_flags", ctypes.c_int),
+    ]
+
+
+class _Mmsghdr(ctypes.Structure):
+    _fields_ = [("msg_hdr", _Msghdr), ("msg_len", ctypes.c_uint)]
+
+
+def _load_sendmmsg():
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        sendmmsg = libc.sendmmsg
+    except (OSError, AttributeError):
+        return None
+    sendmmsg.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_uint, ctypes.c_int]
+    sendmmsg.restype = ctypes.c_int
+    return sendmmsg
+
+
+_sendmmsg = _load_sendmmsg()
+
+
+class BatchSender(object):
+    """
+    Collect datagrams whose scheduled send times fall within `window` seconds
+    of the first queued one and send them with one system call.
+    datagrams / syscalls is the batching ratio achieved.
+    on_flush:Optional callable(count) called after a flush has sent its `count`
+    queued datagrams, in queue order
+    """
+
+    def __init__(self, sock, window=0.0002, max_batch=64, use_sendmmsg=True, on_flush=None) -> None:
+        self.sock = sock
+        self.window = window
+        self.max_batch = max_batch
+        self.on_flush = on_flush
+        self.datagrams = 0
+        self.syscalls = 0
+        self._pending = []
+        self._first_time = 0.0
+        self._sendmmsg = _sendmmsg if use_sendmmsg and sock.family == socket.AF_INET else None
+        if self._sendmmsg is not None:
+            self._msgs = (_Mmsghdr * max_batch)()
+            self._iovecs = (_Iovec * max_batch)()
+            for i in range(max_batch):
+                self._msgs[i].msg_hdr.msg_iov = ctypes.pointer(self._iovecs[i])
+                self._msgs[i].msg_hdr.msg_iovlen = 1
+            self._addrs = {}
+
+    @property
+    def batch_ratio(self):
+        return self.datagrams / self.syscalls if self.syscalls else 0.0
+
+    @property
+    def uses_sendmmsg(self):
+        return self._sendmmsg is not None
+
+    def open_window(self, send_time):
+        """
+        Tell the sender the scheduled time of the next datagram.
+        :return False if the datagram joins the queued batch and must be added
+        without waiting, True if the queued batch was flushed and the caller
+        should wait for send_time before adding it
+        """
+        if self._pending and len(self._pending) < self.max_batch and send_time - self._first_time <= self.window:
+            return False
+        self.flush()
+        self._first_time = send_time
+        return True
+
+    def add(self, data, addr, sock=None):
+        """
+        sock:Socket to send the datagram from, the sender's socket if None
+        """
+        self._pending.append((data, addr, sock or self.sock))
+        if len(self._pending) >= self.max_batch:
+            self.flush()
+
+    def send(self, data, addr, sock=None):
+        """
+        Send a single datagram immediately, after the queued ones.
+        """
+        self.flush()
+        (sock or self.sock).sendto(data, addr)
+        self.datagrams += 1
+        self.syscalls += 1
+
+    def flush(self):
+        pending = self._pending
+        if not pending:
+            return
+        self._pending = []
+        if self._sendmmsg is None or len(pending) == 1:
+            for data, addr, sock in pending:
+                sock.sendto(data, addr)
+            self.datagrams += len(pending)
+            self.syscalls += len(pending)
+        else:
+            self._flush_runs(pending)
+        if self.on_flush is not None:
+            self.on_flush(len(pending))
+
+    def _flush_runs(self, pending):
+        # 按发送套接字切分为连续的段, 每段一次 sendmmsg, 保持发送顺序
+        run_start = 0
+        for i in range(1, len(pending) + 1):
+            if i < len(pending) and pending[i][2] is pending[run_start][2]:
+                continue
+            if i - run_start == 1:
+                data, addr, sock = pending[run_start]
+                sock.sendto(data, addr)
+                self.datagrams += 1
+                self.syscalls += 1
+            else:
+                self._flush_sendmmsg(pending[run_start:i])
+            run_start = i
+
+    def _sockaddr(self, addr):
+        sockaddr = self._addrs.get(addr)
+        if sockaddr is None:
+            sockaddr = _SockaddrIn()
+            sockaddr.sin_family = socket.AF_INET
+            sockaddr.sin_port = socket.htons(addr[1])
+            sockaddr.sin_addr[:] = socket.inet_aton(addr[0])
+            self._addrs[addr] = sockaddr
+        return sockaddr
+
+    def _flush_sendmmsg(self, pending):
+        msgs = self._msgs
+        iovecs = self._iovecs
+        # 保持缓冲区引用直到系统调用返回
+        keep = []
+        for i, (data, addr, _) in enumerate(pending):
+            if isinstance(data, bytes):
+                iovecs[i].iov_base = ctypes.cast(ctypes.c_char_p(data), ctypes.c_void_p).value
+            else:
+                if isinstance(data, memoryview) and data.readonly:
+                    # 只读 memoryview 无法取得地址, 复制一次
+                    data = bytes(data)
+                    iovecs[i].iov_base = ctypes.cast(ctypes.c_char_p(data), ctypes.c_void_p).value
+                else:
+                    # 可写缓冲区(如预加载的 bytearray)直接取地址, 不复制
+                    data = (ctypes.c_char * len(data)).from_buffer(data)
+                    iovecs[i].iov_base = ctypes.addressof(data)
+            keep.append(data)
+            iovecs[i].iov_len = len(data)
+            sockaddr = self._sockaddr(addr)
+            msgs[i].msg_hdr.msg_name = ctypes.addressof(sockaddr)
+            msgs[i].msg_hdr.msg_namelen = ctypes.sizeof(sockaddr)
+        sock = pending[0][2]
+        fileno = sock.fileno()
+        sent = 0
+        while sent < len(pending):
+            ret = self._sendmmsg(fileno, ctypes.addressof(msgs[sent]), len(pending) - sent, 0)
+            self.syscalls += 1
+            if ret <= 0:
+                if ctypes.get_errno() == errno.ENOSYS:
+                    self._sendmmsg = None
+                # 回退到逐个发送, 让 socket 模块报告错误
+                for data, addr, _ in pending[sent:]:
+                    sock.sendto(data, addr)
+                    self.syscalls += 1
+                break
+            sent += ret
+        self.datagrams += len(pending)